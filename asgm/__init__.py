@@ -0,0 +1,48 @@
+"""
+Public classes and functions are importable from the package, e.g. ``from asgm import AsyncBinaryStarGraph``.
+
+Submodules are imported on first access of one of their names, so importing ``asgm`` stays cheap
+and only the modules a process uses are loaded.
+"""
+import importlib
+
+# public name -> submodule defining it
+_exports = {
+    'AsyncBaseStarGraph': 'graphs',
+    'AsyncBinaryStarGraph': 'graphs',
+    'AsyncNonBinaryStarGraph': 'graphs',
+    'PartialScore': 'graphs',
+    'BaseABSNode': 'nodes',
+    'AsyncBinaryNode': 'nodes',
+    'AsyncPackedBinaryNode': 'nodes',
+    'AsyncNonBinaryNode': 'nodes',
+    'AsyncNonBinaryToolCallNode': 'nodes',
+    'AsyncChunkedNode': 'nodes',
+    'criterion_key': 'nodes',
+    'NearDuplicateCache': 'dedup',
+    'EvaluationJob': 'jobs',
+    'JSONLResultStore': 'jobs',
+    'SQLiteResultStore': 'jobs',
+    'ResultsTable': 'results',
+    'DistributedRunner': 'distributed',
+    'EventLog': 'instrumentation',
+    'SpanExporter': 'instrumentation',
+    'PrometheusExporter': 'instrumentation',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+    # later accesses do not go through ``__getattr__``
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_exports])
@@ -0,0 +1,47 @@
+from .models.tokens import tokenizer
+
+
+def split_chunks(content: str, max_tokens: int, overlap: int = 0) -> list[str]:
+    """
+    Splits ``content`` into chunks of at most ``max_tokens`` tokens, consecutive chunks sharing ``overlap`` tokens.
+
+    Tokens are counted with ``tokenizer`` if available. A character split across tokens at a chunk border starts
+    the next chunk, which may exceed ``max_tokens`` by the rest of the character. Otherwise, chunks are bounded
+    by the 4 characters per token estimate and end on whitespace where possible, so words are not cut.
+    """
+    if max_tokens <= overlap:
+        raise ValueError('max_tokens should be greater than overlap.')
+
+    step = max_tokens - overlap
+
+    if (encoding := tokenizer()) is not None:
+        tokens = encoding.encode(content, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return [content]
+
+        # chunks are cut at the character offsets of their first and last tokens rather than decoded from token
+        # slices, so a multibyte character split across tokens is kept whole instead of decoding to U+FFFD
+        _, offsets = encoding.decode_with_offsets(tokens)
+        offsets.append(len(content))
+        chunks = [
+            content[offsets[start]:offsets[min(start + max_tokens, len(tokens))]]
+            for start in range(0, len(tokens) - overlap, step)
+        ]
+
+        return [chunk for chunk in chunks if chunk]
+
+    max_chars, overlap_chars = max_tokens * 4, overlap * 4
+    chunks = []
+    start = 0
+    while True:
+        end = start + max_chars
+        if end >= len(content):
+            chunks.append(content[start:])
+            return chunks
+
+        # end the chunk on the last whitespace of its second half
+        if (space := max(content.rfind(char, start + max_chars // 2, end) for char in ' \n')) != -1:
+            end = space + 1
+
+        chunks.append(content[start:end])
+        start = max(start + 1, end - overlap_chars)
@@ -0,0 +1,164 @@
+import hashlib
+import random
+import re
+from collections import OrderedDict, defaultdict
+from typing import Callable
+
+from pydantic import BaseModel
+
+_PRIME = (1 << 61) - 1
+
+_VOLATILE = [
+    # UUIDs, hex ids, ISO dates and times, then any remaining number
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'), ' <id> '),
+    (re.compile(r'\b[0-9a-f]{16,}\b'), ' <id> '),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b'), ' <date> '),
+    (re.compile(r'\d+(?:[.,]\d+)*'), ' <num> '),
+]
+
+
+def normalize(content: str) -> str:
+    """Lowercases ``content``, replaces ids, dates and numbers with placeholders and collapses whitespace."""
+    content = content.lower()
+    for pattern, placeholder in _VOLATILE:
+        content = pattern.sub(placeholder, content)
+
+    return ' '.join(content.split())
+
+
+class Reused(BaseModel):
+    """Where a reused result comes from: the content it was evaluated on and the estimated similarity."""
+    source: str
+    similarity: float
+
+
+class CacheMatch(BaseModel):
+    source: str
+    similarity: float
+    results: dict[str, BaseModel]
+
+
+class NearDuplicateCache:
+    """
+    A result cache matching near-duplicate contents with MinHash and locality-sensitive hashing.
+
+    Contents are normalized first (see ``normalize``), so templated contents differing only in whitespace,
+    ids, dates or numbers are exact matches. Other contents are compared by the Jaccard similarity of their
+    word shingles, estimated from MinHash signatures; LSH buckets make a lookup independent of the cache size.
+
+    Pass it to a graph with the ``result_cache`` argument.
+
+    :param threshold: Minimum estimated similarity of a content to reuse results of.
+    :param num_perm: Length of MinHash signatures, longer signatures estimate the similarity more precisely.
+    :param bands: Number of LSH bands, ``num_perm`` should be a multiple of it. More bands find less similar
+        candidates, at the expense of more comparisons.
+    :param shingle_size: Number of words per shingle.
+    :param max_entries: Maximum number of cached contents, the oldest are evicted first.
+    :param normalizer: Function normalizing contents before hashing.
+    :param seed: Seed of the MinHash permutations.
+    """
+
+    def __init__(
+            self,
+            threshold: float = .9,
+            num_perm: int = 128,
+            bands: int = 32,
+            shingle_size: int = 3,
+            max_entries: int | None = 100_000,
+            normalizer: Callable[[str], str] = normalize,
+            seed: int = 0
+    ):
+        if num_perm % bands:
+            raise ValueError('num_perm should be a multiple of bands.')
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.normalizer = normalizer
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._entries: OrderedDict[str, tuple[tuple[int, ...], dict[str, BaseModel]]] = OrderedDict()
+        self._buckets: dict[tuple, set[str]] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+    def _signature(self, normalized: str) -> tuple[int, ...]:
+        words = normalized.split()
+        shingles = {
+            ' '.join(words[i:i + self.shingle_size])
+            for i in range(max(1, len(words) - self.shingle_size + 1))
+        }
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+            for shingle in shingles
+        ]
+
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, signature: tuple[int, ...]) -> list[tuple]:
+        return [(i, signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def lookup(self, content: str) -> CacheMatch | None:
+        """Returns the results of the most similar cached content at or above ``threshold``."""
+        normalized = self.normalizer(content)
+        digest = self._digest(normalized)
+
+        if digest in self._entries:
+            best, similarity = digest, 1.
+        else:
+            signature = self._signature(normalized)
+            candidates = set().union(*[self._buckets.get(band, ()) for band in self._bands(signature)])
+            best, similarity = None, 0.
+            for candidate in candidates:
+                other = self._entries[candidate][0]
+                estimate = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+                if estimate > similarity:
+                    best, similarity = candidate, estimate
+
+        if best is None or similarity < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best)
+        return CacheMatch(source=best, similarity=similarity, results=self._entries[best][1])
+
+    def add(self, content: str, results: dict[str, BaseModel]) -> str:
+        """
+        Caches ``results`` keyed by model name and ``criterion_key`` (see ``AsyncBaseStarGraph``),
+        returns the id of ``content`` used as provenance.
+        """
+        normalized = self.normalizer(content)
+        digest = self._digest(normalized)
+
+        if digest in self._entries:
+            self._entries[digest][1].update(results)
+            self._entries.move_to_end(digest)
+            return digest
+
+        signature = self._signature(normalized)
+        self._entries[digest] = (signature, dict(results))
+        for band in self._bands(signature):
+            self._buckets[band].add(digest)
+
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            evicted, (evicted_signature, _) = self._entries.popitem(last=False)
+            for band in self._bands(evicted_signature):
+                self._buckets[band].discard(evicted)
+                if not self._buckets[band]:
+                    del self._buckets[band]
+
+        return digest
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
@@ -0,0 +1,354 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+from pydantic import BaseModel
+
+from .graphs import AsyncBaseStarGraph
+from .models.ratelimit import RateLimitedChatModel, RateLimiter
+from .serialization import dump_output, load_output
+
+
+# ==== Queues ====
+
+class BaseWorkQueue(ABC):
+    """
+    An interface to implement work queues shared by the workers of ``DistributedRunner``.
+
+    A task is a content with its index in the corpus. Claimed tasks not completed within the lease
+    can be claimed again, so a crashed worker does not lose its tasks.
+    """
+
+    @abstractmethod
+    def put(self, contents: Iterable[str]) -> int:
+        """Enqueues ``contents`` after the existing tasks, returns the number of enqueued tasks."""
+        pass
+
+    @abstractmethod
+    def claim(self, worker: str, n: int) -> list[tuple[int, str]]:
+        """Claims up to ``n`` pending tasks, returns ``(index, content)`` pairs."""
+        pass
+
+    @abstractmethod
+    def complete(self, results: list[tuple[int, str]]) -> None:
+        """Stores serialized results of claimed tasks."""
+        pass
+
+    @abstractmethod
+    def results(self) -> list[tuple[int, str]]:
+        """Returns serialized results of completed tasks ordered by index."""
+        pass
+
+    @abstractmethod
+    def remaining(self) -> int:
+        """Returns the number of tasks not completed yet."""
+        pass
+
+
+class SQLiteWorkQueue(BaseWorkQueue):
+    """
+    A work queue stored in a SQLite file, shared by processes of one host or by hosts sharing a file system.
+
+    :param path: Path to the database file.
+    :param lease: Seconds after which a claimed but not completed task can be claimed again.
+    """
+
+    def __init__(self, path: str | Path, lease: float = 600):
+        self.path = Path(path)
+        self.lease = lease
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'idx INTEGER PRIMARY KEY, content TEXT NOT NULL, worker TEXT, claimed REAL, result TEXT)'
+        )
+        self._lock = threading.Lock()
+
+    def put(self, contents: Iterable[str]) -> int:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            start = self._conn.execute('SELECT COALESCE(MAX(idx) + 1, 0) FROM tasks').fetchone()[0]
+            cursor = self._conn.executemany(
+                'INSERT INTO tasks (idx, content) VALUES (?, ?)',
+                ((start + i, content) for i, content in enumerate(contents))
+            )
+            self._conn.execute('COMMIT')
+
+            return cursor.rowcount
+
+    def claim(self, worker: str, n: int) -> list[tuple[int, str]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = self._conn.execute(
+                'SELECT idx, content FROM tasks WHERE result IS NULL AND (claimed IS NULL OR claimed < ?) '
+                'ORDER BY idx LIMIT ?',
+                (now - self.lease, n)
+            ).fetchall()
+            self._conn.executemany(
+                'UPDATE tasks SET worker = ?, claimed = ? WHERE idx = ?',
+                ((worker, now, idx) for idx, _ in rows)
+            )
+            self._conn.execute('COMMIT')
+
+            return rows
+
+    def complete(self, results: list[tuple[int, str]]) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.executemany('UPDATE tasks SET result = ? WHERE idx = ?', ((res, idx) for idx, res in results))
+            self._conn.execute('COMMIT')
+
+    def results(self) -> list[tuple[int, str]]:
+        with self._lock:
+            return self._conn.execute('SELECT idx, result FROM tasks WHERE result IS NOT NULL ORDER BY idx').fetchall()
+
+    def remaining(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM tasks WHERE result IS NULL').fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ==== Shared rate budget ====
+
+class SQLiteTokenBucket:
+    """
+    A token bucket stored in a SQLite file, so processes and hosts sharing the file share one budget.
+    Provides the interface of ``TokenBucket``.
+
+    An existing bucket takes the configured ``rate`` and ``capacity``, its adapted rate is kept unless the
+    configured rate changed. ``reset`` starts from the configured rate, e.g. at the start of a run.
+    """
+
+    def __init__(self, path: str | Path, name: str, rate: float, capacity: float):
+        self.name = name
+        self.capacity = capacity
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'name TEXT PRIMARY KEY, tokens REAL, updated REAL, rate REAL, max_rate REAL, capacity REAL)'
+        )
+        self._conn.execute(
+            'INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET '
+            'rate = CASE WHEN max_rate = excluded.max_rate THEN rate ELSE excluded.rate END, '
+            'tokens = MIN(tokens, excluded.capacity), max_rate = excluded.max_rate, capacity = excluded.capacity',
+            (name, capacity, time.time(), rate, rate, capacity)
+        )
+        self._lock = threading.Lock()
+
+    def _update(self, change: Callable[[float, float, float], tuple[float, float]]) -> tuple[float, float]:
+        """Refills the bucket and applies ``change(tokens, rate, max_rate) -> (tokens, rate)`` atomically."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            tokens, updated, rate, max_rate, capacity = self._conn.execute(
+                'SELECT tokens, updated, rate, max_rate, capacity FROM buckets WHERE name = ?', (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(capacity, tokens + max(0., now - updated) * rate)
+            tokens, rate = change(tokens, rate, max_rate)
+            self._conn.execute(
+                'UPDATE buckets SET tokens = ?, updated = ?, rate = ? WHERE name = ?',
+                (tokens, now, rate, self.name)
+            )
+            self._conn.execute('COMMIT')
+
+            return tokens, rate
+
+    @property
+    def rate(self) -> float:
+        return self._update(lambda tokens, rate, max_rate: (tokens, rate))[1]
+
+    @property
+    def max_rate(self) -> float:
+        with self._lock:
+            return self._conn.execute('SELECT max_rate FROM buckets WHERE name = ?', (self.name,)).fetchone()[0]
+
+    def reserve(self, amount: float) -> float:
+        tokens, rate = self._update(lambda tokens, rate, max_rate: (tokens - amount, rate))
+        return max(0., -tokens / rate)
+
+    def pause(self, seconds: float) -> None:
+        self._update(lambda tokens, rate, max_rate: (min(tokens, -seconds * rate), rate))
+
+    def set_rate(self, rate: float) -> None:
+        self._update(lambda tokens, _, max_rate: (tokens, rate))
+
+    def reset(self) -> None:
+        """Refills the bucket and restores the configured rate."""
+        self._update(lambda tokens, rate, max_rate: (self.capacity, max_rate))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    A ``RateLimiter`` whose buckets are stored in a SQLite file, so all workers follow one rate budget
+    and a rate limit response seen by one worker slows down the others as well.
+
+    :param path: Path to the database file shared by the workers.
+    """
+
+    def __init__(self, path: str | Path, rpm: float | None = None, tpm: float | None = None, **kwargs):
+        super().__init__(rpm=rpm, tpm=tpm, **kwargs)
+        self.requests = SQLiteTokenBucket(path, 'requests', rpm / 60, max(1., rpm / 60)) if rpm else None
+        self.tokens = SQLiteTokenBucket(path, 'tokens', tpm / 60, max(1., tpm / 60)) if tpm else None
+
+    def reset(self) -> None:
+        """Restores the configured rates, so a new run does not start from the rates adapted by a previous one."""
+        for bucket in self._buckets:
+            bucket.reset()
+
+    def close(self) -> None:
+        for bucket in self._buckets:
+            bucket.close()
+
+
+# ==== Serialization ====
+
+def dump_results(evaluation: list[BaseModel]) -> str:
+    return json.dumps([dump_output(item) for item in evaluation])
+
+
+def load_results(dump: str) -> list[BaseModel]:
+    return [load_output(item) for item in json.loads(dump)]
+
+
+# ==== Runner ====
+
+def run_worker(
+        graph_factory: Callable[[], AsyncBaseStarGraph],
+        queue_path: str | Path,
+        max_concurrency: int = 16,
+        batch_size: int = 64,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        lease: float = 600,
+        poll_interval: float = 1
+) -> int:
+    """
+    Evaluates tasks of the queue at ``queue_path`` until all are completed, returns the number of evaluated contents.
+    While the remaining tasks are claimed by other workers, it polls the queue every ``poll_interval`` seconds,
+    so tasks of a crashed worker are evaluated once their lease expires.
+
+    Every worker runs its own event loop and graph (with its own model clients). Run it in several processes
+    or on several hosts sharing ``queue_path``. If ``rpm`` or ``tpm`` are provided, the graph model is wrapped
+    in a ``RateLimitedChatModel`` following a budget shared by all workers.
+    """
+    queue = SQLiteWorkQueue(queue_path, lease=lease)
+    graph = graph_factory()
+    if rpm or tpm:
+        limiter = SharedRateLimiter(Path(queue_path).with_suffix('.limits'), rpm=rpm, tpm=tpm)
+        graph.model = RateLimitedChatModel(graph.model, limiter=limiter)
+
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+
+    async def _run() -> int:
+        evaluated = 0
+        while queue.remaining():
+            tasks = queue.claim(worker, batch_size)
+            if not tasks:
+                await asyncio.sleep(poll_interval)
+                continue
+
+            evaluations = await graph.eval_many(
+                [content for _, content in tasks],
+                max_concurrency=max_concurrency
+            )
+            queue.complete([
+                (idx, dump_results(evaluation))
+                for (idx, _), evaluation in zip(tasks, evaluations)
+            ])
+            evaluated += len(tasks)
+
+        return evaluated
+
+    try:
+        return asyncio.run(_run())
+    finally:
+        queue.close()
+
+
+class DistributedRunner:
+    """
+    Evaluates a corpus by sharding it across a process pool through a ``SQLiteWorkQueue``.
+
+    Workers on other hosts can join a run by calling ``run_worker`` with the same queue file.
+    Results are keyed by corpus index, independently of which worker evaluated them.
+
+    :param graph_factory: A picklable callable (e.g. a module-level function) building the graph in each worker.
+    :param queue_path: Path to the queue database file.
+    :param workers: Number of worker processes.
+    :param max_concurrency: Maximum number of concurrent model calls per worker.
+    :param batch_size: Number of contents claimed by a worker at once.
+    :param rpm: Requests per minute shared by all workers.
+    :param tpm: Tokens per minute shared by all workers.
+    """
+
+    def __init__(
+            self,
+            graph_factory: Callable[[], AsyncBaseStarGraph],
+            queue_path: str | Path,
+            workers: int = os.cpu_count() or 1,
+            max_concurrency: int = 16,
+            batch_size: int = 64,
+            rpm: float | None = None,
+            tpm: float | None = None
+    ):
+        self.graph_factory = graph_factory
+        self.queue_path = Path(queue_path)
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.rpm = rpm
+        self.tpm = tpm
+
+    def run(self, contents: Iterable[str] | None = None) -> dict[int, list[BaseModel]]:
+        """
+        Enqueues ``contents`` (if provided) and evaluates the queue until every task is completed,
+        returns evaluation results keyed by corpus index. Calling it again without ``contents`` resumes
+        an interrupted run.
+        """
+        queue = SQLiteWorkQueue(self.queue_path)
+        try:
+            if contents is not None:
+                queue.put(contents)
+
+            if self.rpm or self.tpm:
+                limiter = SharedRateLimiter(self.queue_path.with_suffix('.limits'), rpm=self.rpm, tpm=self.tpm)
+                limiter.reset()
+                limiter.close()
+
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    executor.submit(
+                        run_worker,
+                        self.graph_factory,
+                        self.queue_path,
+                        self.max_concurrency,
+                        self.batch_size,
+                        self.rpm,
+                        self.tpm
+                    )
+                    for _ in range(self.workers)
+                ]
+                for future in futures:
+                    future.result()
+
+            if remaining := queue.remaining():
+                raise RuntimeError(f'{remaining} tasks of {self.queue_path} were not completed.')
+
+            return {idx: load_results(dump) for idx, dump in queue.results()}
+        finally:
+            queue.close()
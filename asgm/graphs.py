@@ -1,38 +1,527 @@
+from __future__ import annotations
+
 import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, Literal
+
+from pydantic import BaseModel
 
 from .models.base_model import BaseChatModel
-from .nodes import (
-    AsyncBinaryNode,
-    AsyncNonBinaryNode,
-    BaseABSNode
-)
+from .models.hashing import model_name
+from .models.usage import Usage, track_usage
+
+# nodes, tools, instrumentation and the result cache are imported on use, so importing graphs stays cheap
+if TYPE_CHECKING:
+    from .dedup import NearDuplicateCache, Reused
+    from .instrumentation import BaseInstrument
+    from .nodes import AsyncBinaryNode, AsyncNonBinaryNode, AsyncPackedBinaryNode, BaseABSNode, Layout
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_pid = os.getpid()
+_executor_lock = threading.Lock()
+
+
+def sync_executor(max_workers: int = 32) -> ThreadPoolExecutor:
+    """
+    Returns the thread pool running the node calls of sync evaluations (e.g. ``eval_sync``) of all graphs.
+
+    The pool is created on first use, so ``max_workers`` (the maximum number of concurrent sync node calls
+    in the process) applies to the first call only. A pool inherited from a parent process is replaced,
+    since its threads do not survive a fork.
+    """
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or os.getpid() != _executor_pid:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgm')
+            _executor_pid = os.getpid()
+
+        return _executor
+
+
+class PartialScore(BaseModel):
+    """
+    A running score of a streamed evaluation.
+
+    ``lower`` and ``upper`` bound the final score: they assume the worst and the best possible results for the
+    pending children. ``upper`` is ``None`` if a child result is unbounded. ``estimate`` extrapolates the results
+    received so far to all children.
+    """
+    estimate: float
+    lower: float
+    upper: float | None
+    evaluated: int
+    total: int
 
 
 class AsyncBaseStarGraph:
     def __init__(
             self,
             children: list[BaseABSNode],
-            model: BaseChatModel
+            model: BaseChatModel,
+            layout: Layout | None = None,
+            instruments: list[BaseInstrument] | None = None,
+            result_cache: NearDuplicateCache | None = None
     ):
+        """
+        :param layout: If provided, overrides the message layout of every child.
+            Use ``'content_first'`` to let the provider prompt cache serve the content shared by all children.
+        :param instruments: Consumers of a ``NodeCallEvent`` emitted for every node call,
+            e.g. ``EventLog``, ``SpanExporter`` or ``PrometheusExporter``.
+        :param result_cache: If provided, ``eval``, ``eval_many`` and ``iter_eval_many`` reuse the results of
+            near-duplicate contents evaluated before by the same model. Can be shared by several graphs.
+        """
         self.children = children
         self.model = model
+        self.layout = layout
+        self.instruments = instruments or []
+        self.result_cache = result_cache
         self.evaluation: list[BaseABSNode.OutputFormat] | None = None
+        # origin of the results of the last ``eval`` reused by ``result_cache``, ``None`` for evaluated children
+        self.provenance: list[Reused | None] | None = None
+        # results received so far by ``eval_stream``, ``None`` for pending children
+        self.partial: list[BaseABSNode.OutputFormat | None] | None = None
+        # token usage of the last evaluation, reported by models that record it (e.g. ``OpenAIModel``)
+        self.usage = Usage()
+
+        if layout is not None:
+            for child in children:
+                child.layout = layout
 
     # implement evaluation
     async def eval(self, root_content: str) -> list[BaseABSNode.OutputFormat]:
         """Returns evaluation result over children."""
-        self.evaluation = await asyncio.gather(
+        from .models.tools import cache_tool_results
+
+        with track_usage() as self.usage, cache_tool_results():
+            if self.result_cache is None:
+                self.evaluation = await self._eval_children(root_content)
+            else:
+                self.evaluation, self.provenance = await self._eval_children_cached(root_content)
+
+        return self.evaluation
+
+    def _cache_keys(self) -> list[str]:
+        """Returns the ``result_cache`` keys of the children, results of other models are not reused."""
+        from .nodes import criterion_key
+
+        model = model_name(self.model)
+        return [f'{model}:{criterion_key(child)}' for child in self.children]
+
+    async def _eval_children_cached(
+            self,
+            root_content: str,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> tuple[list[BaseABSNode.OutputFormat], list[Reused | None]]:
+        """Reuses results of a near-duplicate content and evaluates the children it lacks, returns their origin."""
+        from .dedup import Reused
+        from .nodes import PARSE_FAILURE
+
+        keys = self._cache_keys()
+        match = self.result_cache.lookup(root_content)
+
+        evaluation = [None] * len(self.children)
+        provenance = [None] * len(self.children)
+        if match is not None:
+            for i, key in enumerate(keys):
+                if key in match.results:
+                    evaluation[i] = match.results[key].model_copy(deep=True)
+                    provenance[i] = Reused(source=match.source, similarity=match.similarity)
+                    self._on_result(i, evaluation[i])
+
+        units = [
+            (node, indexes)
+            for node, indexes in self._units()
+            if any(evaluation[i] is None for i in indexes)
+        ]
+        results = await asyncio.gather(
             *[
-                child.eval(
-                    content=root_content,
-                    model=self.model
-                )
-                for child in self.children
+                self._eval_child(node, root_content, semaphore)
+                for node, _ in units
             ]
         )
 
+        evaluated = {}
+        for (_, indexes), res in zip(units, results):
+            for i, item in self._split(indexes, res):
+                # a packed unit may re-evaluate a reused child, keep the reused result
+                if evaluation[i] is None:
+                    evaluation[i] = item
+                    if getattr(item, 'reason', None) != PARSE_FAILURE:
+                        evaluated[keys[i]] = item.model_copy(deep=True)
+
+        # only fresh results are cached, so reused results do not drift across chains of near-duplicates,
+        # parse failures are not, so near-duplicates evaluated later retry the criteria
+        if evaluated:
+            self.result_cache.add(root_content, evaluated)
+
+        return evaluation, provenance
+
+    async def _eval_child(
+            self,
+            child: BaseABSNode,
+            root_content: str,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> BaseABSNode.OutputFormat:
+        """Evaluates a single child, holding ``semaphore`` (if provided) for the duration of the model call."""
+        if self.instruments:
+            return await self._eval_child_instrumented(child, root_content, semaphore)
+
+        if semaphore is None:
+            return await child.eval(content=root_content, model=self.model)
+
+        async with semaphore:
+            return await child.eval(content=root_content, model=self.model)
+
+    async def _eval_child_instrumented(
+            self,
+            child: BaseABSNode,
+            root_content: str,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> BaseABSNode.OutputFormat:
+        queued = time.perf_counter()
+        if semaphore is not None:
+            await semaphore.acquire()
+
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            with track_usage() as usage:
+                return await child.eval(content=root_content, model=self.model)
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+            self._emit(child, started, time.perf_counter() - start, start - queued, error, usage)
+
+    def _emit(
+            self,
+            child: BaseABSNode,
+            started: float,
+            wall_time: float,
+            queue_wait: float,
+            error: str | None,
+            usage: Usage
+    ) -> None:
+        """Passes a ``NodeCallEvent`` of a node call to the instruments."""
+        from .instrumentation import NodeCallEvent
+
+        if hasattr(child, 'criterion'):
+            criterion = child.criterion
+        else:
+            criterion = '; '.join(getattr(item, 'criterion', '') for item in getattr(child, 'children', [])) or None
+
+        event = NodeCallEvent(
+            graph=type(self).__name__,
+            node=type(child).__name__,
+            criterion=criterion,
+            started=started,
+            wall_time=wall_time,
+            queue_wait=queue_wait,
+            error=error,
+            **usage.model_dump()
+        )
+        for instrument in self.instruments:
+            instrument.on_event(event)
+
+    def _units(self) -> list[tuple[BaseABSNode, list[int]]]:
+        """
+        Returns the nodes to call, each with the indexes of the children it evaluates.
+        A node evaluating several children (e.g. ``AsyncPackedBinaryNode``) returns a list of results.
+        """
+        return [(child, [i]) for i, child in enumerate(self.children)]
+
+    def compile(self) -> 'AsyncBaseStarGraph':
+        """
+        Precomputes the static parts of the requests of every node: the messages surrounding the content and
+        what the model derives from output formats (e.g. strict JSON schemas), so evaluations reuse them.
+        Compile the graph again after editing its children or model. Returns the graph.
+        """
+        for node, _ in self._units():
+            node.compile(self.model)
+
+        return self
+
+    def _on_result(self, i: int, item: BaseABSNode.OutputFormat) -> None:
+        """Called for every result of the ``i``-th child."""
+        pass
+
+    def _split(
+            self,
+            indexes: list[int],
+            res: BaseABSNode.OutputFormat | list[BaseABSNode.OutputFormat]
+    ) -> list[tuple[int, BaseABSNode.OutputFormat]]:
+        items = list(zip(indexes, res if isinstance(res, list) else [res]))
+        for i, item in items:
+            self._on_result(i, item)
+
+        return items
+
+    async def _eval_children(
+            self,
+            root_content: str,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> list[BaseABSNode.OutputFormat]:
+        units = self._units()
+        results = await asyncio.gather(
+            *[
+                self._eval_child(node, root_content, semaphore)
+                for node, _ in units
+            ]
+        )
+
+        evaluation = [None] * len(self.children)
+        for (_, indexes), res in zip(units, results):
+            for i, item in self._split(indexes, res):
+                evaluation[i] = item
+
+        return evaluation
+
+    async def eval_stream(
+            self,
+            root_content: str
+    ) -> AsyncIterator[tuple[BaseABSNode, BaseABSNode.OutputFormat]]:
+        """
+        Evaluates children and yields ``(child, result)`` pairs as soon as each result is available.
+
+        While streaming, ``self.partial`` holds the results received so far (``None`` for pending children)
+        and ``partial_score`` gives the running score. ``self.evaluation`` is set once all children are evaluated.
+        If the consumer stops early, outstanding calls are cancelled.
+        """
+        from .models.tools import cache_tool_results
+
+        units = self._units()
+        self.partial = [None] * len(self.children)
+        self.usage = Usage()
+        tool_cache = {}
+
+        async def _eval_tracked(node: BaseABSNode):
+            with track_usage(self.usage), cache_tool_results(tool_cache):
+                return await self._eval_child(node, root_content)
+
+        tasks = {
+            asyncio.create_task(_eval_tracked(node)): indexes
+            for node, indexes in units
+        }
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for i, item in self._split(tasks[task], task.result()):
+                        self.partial[i] = item
+                        yield self.children[i], item
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        self.evaluation = list(self.partial)
+
+    @property
+    def _evaluated(self) -> list[tuple[BaseABSNode, BaseABSNode.OutputFormat]]:
+        """Returns children with their results received so far by ``eval_stream``."""
+        return [
+            (child, item)
+            for child, item in zip(self.children, self.partial or [])
+            if item is not None
+        ]
+
+    async def iter_eval_many(
+            self,
+            contents: Iterable[str],
+            max_concurrency: int = 16,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> AsyncIterator[list[BaseABSNode.OutputFormat]]:
+        """
+        Evaluates each content of ``contents`` and yields the evaluation results in input order.
+
+        All (content x child) model calls share one semaphore, so at most ``max_concurrency`` calls are in flight
+        at any time. ``contents`` is consumed lazily and at most ``max_concurrency`` contents are scheduled ahead of the
+        one being yielded, which keeps memory flat regardless of the corpus size.
+        Does not modify ``self.evaluation`` and ``self.provenance``, ``self.usage`` accumulates usage over all contents.
+        With a ``result_cache``, contents reuse the results of near-duplicates evaluated before them; near-duplicates
+        evaluated concurrently are both evaluated.
+
+        :param contents: An iterable of root contents, e.g. a generator reading documents from disk.
+        :param max_concurrency: Maximum number of concurrent model calls.
+        :param semaphore: An already existing semaphore to share the concurrency budget across several graphs.
+            If provided, ``max_concurrency`` only bounds the number of contents scheduled ahead.
+        """
+        from .models.tools import cache_tool_results
+
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be a positive integer.')
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.usage = Usage()
+        # tool results are shared by all contents
+        tool_cache = {}
+
+        async def _eval_tracked(content: str) -> list[BaseABSNode.OutputFormat]:
+            with track_usage(self.usage), cache_tool_results(tool_cache):
+                if self.result_cache is None:
+                    return await self._eval_children(content, semaphore)
+
+                evaluation, _ = await self._eval_children_cached(content, semaphore)
+                return evaluation
+
+        pending: deque[asyncio.Task] = deque()
+        try:
+            for content in contents:
+                pending.append(
+                    asyncio.create_task(_eval_tracked(content))
+                )
+
+                if len(pending) > max_concurrency:
+                    yield await pending.popleft()
+
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # cancel scheduled evaluations if the consumer stops early or an evaluation fails,
+            # and wait for them so their cleanup runs before returning
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def eval_many(
+            self,
+            contents: Iterable[str],
+            max_concurrency: int = 16,
+            semaphore: asyncio.Semaphore | None = None
+    ) -> list[list[BaseABSNode.OutputFormat]]:
+        """
+        Returns evaluation results for each content of ``contents`` in input order.
+        See ``iter_eval_many`` for the concurrency semantics.
+        """
+        return [
+            evaluation
+            async for evaluation in self.iter_eval_many(
+                contents,
+                max_concurrency=max_concurrency,
+                semaphore=semaphore
+            )
+        ]
+
+    # ==== Sync evaluation ====
+
+    def _eval_child_sync(
+            self,
+            child: BaseABSNode,
+            root_content: str,
+            semaphore: threading.Semaphore | None = None
+    ) -> BaseABSNode.OutputFormat:
+        """Sync version of ``_eval_child``, run by the threads of ``sync_executor``."""
+        queued = time.perf_counter()
+        if semaphore is not None:
+            semaphore.acquire()
+
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            with track_usage() as usage:
+                return child.eval_sync(content=root_content, model=self.model)
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+            if self.instruments:
+                self._emit(child, started, time.perf_counter() - start, start - queued, error, usage)
+
+    def _submit_children(
+            self,
+            root_content: str,
+            semaphore: threading.Semaphore | None = None
+    ) -> list[tuple[list[int], Future]]:
+        executor = sync_executor()
+        return [
+            (
+                indexes,
+                # every call runs in a copy of the current context, so usage tracking follows it into the thread
+                executor.submit(contextvars.copy_context().run, self._eval_child_sync, node, root_content, semaphore)
+            )
+            for node, indexes in self._units()
+        ]
+
+    def _collect(self, futures: list[tuple[list[int], Future]]) -> list[BaseABSNode.OutputFormat]:
+        evaluation = [None] * len(self.children)
+        try:
+            for indexes, future in futures:
+                for i, item in self._split(indexes, future.result()):
+                    evaluation[i] = item
+        finally:
+            # cancel calls not started yet if a call failed
+            for _, future in futures:
+                future.cancel()
+
+        return evaluation
+
+    def eval_sync(self, root_content: str) -> list[BaseABSNode.OutputFormat]:
+        """
+        Returns evaluation result over children, like ``eval``, without an event loop.
+
+        Children are evaluated in parallel with the sync model methods, in the thread pool shared by all graphs
+        (see ``sync_executor``). ``result_cache`` is not applied.
+        """
+        with track_usage() as self.usage:
+            self.evaluation = self._collect(self._submit_children(root_content))
+
         return self.evaluation
 
+    def iter_eval_many_sync(
+            self,
+            contents: Iterable[str],
+            max_concurrency: int = 16
+    ) -> Iterator[list[BaseABSNode.OutputFormat]]:
+        """Sync version of ``iter_eval_many``, with the same concurrency semantics."""
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be a positive integer.')
+
+        semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.usage = Usage()
+
+        pending: deque[list[tuple[list[int], Future]]] = deque()
+        try:
+            for content in contents:
+                with track_usage(self.usage):
+                    pending.append(self._submit_children(content, semaphore))
+
+                if len(pending) > max_concurrency:
+                    yield self._collect(pending.popleft())
+
+            while pending:
+                yield self._collect(pending.popleft())
+        finally:
+            for futures in pending:
+                for _, future in futures:
+                    future.cancel()
+
+    def eval_many_sync(
+            self,
+            contents: Iterable[str],
+            max_concurrency: int = 16
+    ) -> list[list[BaseABSNode.OutputFormat]]:
+        """Sync version of ``eval_many``."""
+        return list(self.iter_eval_many_sync(contents, max_concurrency=max_concurrency))
+
     # implement scoring
     def score(self, *args, **kwargs) -> float:
         raise NotImplementedError
@@ -47,14 +536,182 @@ class AsyncBinaryStarGraph(AsyncBaseStarGraph):
 
     This metric allows asynchronous evaluation of all criteria and returns a binary output indicating whether
     the content fits the defined criteria.
+
+    In packed mode criteria are evaluated in chunks by ``AsyncPackedBinaryNode``, sending the content once per chunk
+    instead of once per criterion. The results and scores keep the same shape as in the default mode.
     """
 
     def __init__(
             self,
             children: list[AsyncBinaryNode],
-            model: BaseChatModel
+            model: BaseChatModel,
+            packed: bool = False,
+            pack_size: int | None = None,
+            layout: Layout | None = None,
+            instruments: list[BaseInstrument] | None = None,
+            result_cache: NearDuplicateCache | None = None
     ):
-        super().__init__(children=children, model=model)
+        """
+        :param packed: If True, evaluates several criteria per model call.
+        :param pack_size: Maximum number of criteria per model call in packed mode. If ``None``, all criteria
+            are evaluated with a single call. Smaller chunks cost more input tokens but tend to be more accurate.
+        """
+        super().__init__(
+            children=children,
+            model=model,
+            layout=layout,
+            instruments=instruments,
+            result_cache=result_cache
+        )
+        self.packed = packed
+        self.pack_size = pack_size
+
+        if pack_size is not None and pack_size < 1:
+            raise ValueError('pack_size should be a positive integer.')
+
+        # packed nodes of the children in packed mode,
+        # rebuilt on the next evaluation once children are appended, removed or replaced
+        self._packs: list[AsyncPackedBinaryNode] = []
+
+        # per child statistics used to order criteria in the sequential short-circuit mode,
+        # extended on the first result of a child appended after the graph was created
+        self.eval_counts = [0] * len(children)
+        self.fail_counts = [0] * len(children)
+
+    @property
+    def packs(self) -> list[AsyncPackedBinaryNode]:
+        """The packed nodes evaluating the children in packed mode, empty in the default mode."""
+        if not self.packed:
+            return []
+
+        packed = [child for pack in self._packs for child in pack.children]
+        if len(packed) != len(self.children) or any(a is not b for a, b in zip(packed, self.children)):
+            self._packs = self._build_packs()
+
+        return self._packs
+
+    def _build_packs(self) -> list[AsyncPackedBinaryNode]:
+        """Packs the children in chunks of ``pack_size``, reusing the compiled packs of unchanged chunks."""
+        from .nodes import AsyncPackedBinaryNode
+
+        size = self.pack_size or len(self.children) or 1
+        packs = []
+        for i in range(0, len(self.children), size):
+            chunk = self.children[i:i + size]
+            pack = next(
+                (
+                    pack
+                    for pack in self._packs
+                    if len(pack.children) == len(chunk) and all(a is b for a, b in zip(pack.children, chunk))
+                ),
+                None
+            )
+            packs.append(pack or AsyncPackedBinaryNode(chunk, layout=self.layout or 'criterion_first'))
+
+        return packs
+
+    def _units(self) -> list[tuple[BaseABSNode, list[int]]]:
+        if not self.packed:
+            return super()._units()
+
+        units = []
+        offset = 0
+        for pack in self.packs:
+            units.append((pack, list(range(offset, offset + len(pack.children)))))
+            offset += len(pack.children)
+
+        return units
+
+    def _on_result(self, i: int, item: AsyncBinaryNode.OutputFormat) -> None:
+        if i >= len(self.eval_counts):
+            missing = len(self.children) - len(self.eval_counts)
+            self.eval_counts += [0] * missing
+            self.fail_counts += [0] * missing
+
+        self.eval_counts[i] += 1
+        self.fail_counts[i] += not item.pass_
+
+    def failure_rate(self, i: int) -> float:
+        """Returns the observed failure rate of the ``i``-th child over the evaluations made by this graph."""
+        if i >= len(self.eval_counts) or not self.eval_counts[i]:
+            return 0.
+
+        return self.fail_counts[i] / self.eval_counts[i]
+
+    async def eval_short_circuit(
+            self,
+            root_content: str,
+            mode: Literal['parallel', 'sequential'] = 'parallel',
+            key: Callable[[AsyncBinaryNode], float] | None = None
+    ) -> bool:
+        """
+        Returns the binary score, stopping the evaluation as soon as a criterion fails.
+
+        ``self.evaluation`` holds the results of the evaluated criteria only (in children order),
+        so ``binary_score`` matches the returned value while ``score`` covers the evaluated criteria only.
+        Packed mode is not applied, since a packed call cannot be stopped on a single criterion.
+
+        :param mode: ``'parallel'`` starts all calls and cancels the outstanding ones on the first failure.
+            ``'sequential'`` evaluates criteria one by one, which makes a single call for content failing
+            the first criterion, at the expense of latency.
+        :param key: Sequential mode evaluates criteria in the ascending order of ``key``, e.g. an estimated cost.
+            By default, criteria that failed most often in previous evaluations go first.
+        """
+        with track_usage() as self.usage:
+            if mode == 'parallel':
+                results = await self._eval_parallel_short_circuit(root_content)
+            elif mode == 'sequential':
+                results = await self._eval_sequential_short_circuit(root_content, key)
+            else:
+                raise ValueError(f'Unknown short-circuit mode: {mode}.')
+
+        for i, item in results.items():
+            self._on_result(i, item)
+
+        self.evaluation = [results[i] for i in sorted(results)]
+        return self.binary_score()
+
+    async def _eval_parallel_short_circuit(self, root_content: str) -> dict[int, AsyncBinaryNode.OutputFormat]:
+        tasks = {
+            asyncio.create_task(self._eval_child(child, root_content)): i
+            for i, child in enumerate(self.children)
+        }
+        results = {}
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+
+                if any(not results[tasks[task]].pass_ for task in done):
+                    break
+        finally:
+            # cancel outstanding calls, their tokens and latency are not needed anymore
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return results
+
+    async def _eval_sequential_short_circuit(
+            self,
+            root_content: str,
+            key: Callable[[AsyncBinaryNode], float] | None = None
+    ) -> dict[int, AsyncBinaryNode.OutputFormat]:
+        if key is None:
+            order = sorted(range(len(self.children)), key=lambda i: -self.failure_rate(i))
+        else:
+            order = sorted(range(len(self.children)), key=lambda i: key(self.children[i]))
+
+        results = {}
+        for i in order:
+            results[i] = await self._eval_child(self.children[i], root_content)
+            if not results[i].pass_:
+                break
+
+        return results
 
     async def eval(self, root_content: str) -> list[AsyncBinaryNode.OutputFormat]:
         return await super().eval(root_content)
@@ -67,22 +724,58 @@ class AsyncBinaryStarGraph(AsyncBaseStarGraph):
 
         return None
 
-    def binary_score(self) -> bool:
+    def binary_score(self, evaluation: list[AsyncBinaryNode.OutputFormat] | None = None) -> bool:
         """
         Returns the binary score of the evaluation.
         Returns ``True`` if all criteria are passed.
         Returns ``False`` if any of the criteria fail.
+        :param evaluation: If provided, scores it instead of ``self.evaluation``, e.g. an item of ``eval_many`` results.
+        """
+        evaluation = self.evaluation if evaluation is None else evaluation
+        return all(item.pass_ for item in evaluation)
+
+    def partial_binary_score(self) -> bool | None:
+        """
+        Returns the running binary score of ``eval_stream``: ``False`` as soon as a criterion fails,
+        ``True`` once all criteria passed, ``None`` while undecided.
         """
-        return sum(self._evaluation_bool) == len(self.evaluation)
+        evaluated = self._evaluated
+        if any(not item.pass_ for _, item in evaluated):
+            return False
+
+        if len(evaluated) == len(self.children):
+            return True
+
+        return None
+
+    def partial_score(self, norm: bool = True) -> PartialScore:
+        """
+        Returns the running score of ``eval_stream``.
+        :param norm: If True, normalizes the score to a value between 0 and 1
+        """
+        evaluated = self._evaluated
+        passed = sum(item.pass_ for _, item in evaluated)
+        pending = len(self.children) - len(evaluated)
+        total = len(self.children) if norm and self.children else 1
+
+        return PartialScore(
+            estimate=(passed / len(evaluated) * len(self.children) if evaluated else 0) / total,
+            lower=passed / total,
+            upper=(passed + pending) / total,
+            evaluated=len(evaluated),
+            total=len(self.children)
+        )
 
-    def score(self, norm: bool = True) -> float:
+    def score(self, norm: bool = True, evaluation: list[AsyncBinaryNode.OutputFormat] | None = None) -> float:
         """
         Returns the score by counting the number of criteria that passed.
         :param norm: If True, normalizes the score to a value between 0 and 1
+        :param evaluation: If provided, scores it instead of ``self.evaluation``, e.g. an item of ``eval_many`` results.
         """
-        score = sum(self._evaluation_bool)
+        evaluation = self.evaluation if evaluation is None else evaluation
+        score = sum(item.pass_ for item in evaluation)
         if norm:
-            return score / len(self.evaluation)
+            return score / len(evaluation)
 
         return score
 
@@ -91,9 +784,18 @@ class AsyncNonBinaryStarGraph(AsyncBaseStarGraph):
     def __init__(
             self,
             children: list[AsyncNonBinaryNode],
-            model: BaseChatModel
+            model: BaseChatModel,
+            layout: Layout | None = None,
+            instruments: list[BaseInstrument] | None = None,
+            result_cache: NearDuplicateCache | None = None
     ):
-        super().__init__(children=children, model=model)
+        super().__init__(
+            children=children,
+            model=model,
+            layout=layout,
+            instruments=instruments,
+            result_cache=result_cache
+        )
 
     async def eval(self, root_content: str) -> list[AsyncNonBinaryNode.OutputFormat]:
         return await super().eval(root_content)
@@ -102,13 +804,53 @@ class AsyncNonBinaryStarGraph(AsyncBaseStarGraph):
     def _eval_scores(self) -> list[float]:
         return [item.score for item in self.evaluation]
 
-    def score(self, max_score: float | None = None) -> float:
+    def partial_score(
+            self,
+            max_score: float | None = None,
+            min_node_score: float = 0,
+            max_node_score: float | None = None
+    ) -> PartialScore:
         """
-        Return the score by summing ``AsyncNonBinaryNode`` score values.
+        Returns the running score of ``eval_stream``.
         :param max_score: If provided returns normalized score, by dividing ``score / max_score``.
+        :param min_node_score: The lowest unweighted score a node can return, used by the lower bound.
+        :param max_node_score: The highest unweighted score a node can return, used by the upper bound.
+            If ``None``, the upper bound is unknown until all children are evaluated.
         """
+        evaluated = self._evaluated
+        score = sum(item.score for _, item in evaluated)
+        evaluated_weight = sum(getattr(child, 'weight', 1) for child, _ in evaluated)
+        total_weight = sum(getattr(child, 'weight', 1) for child in self.children)
+        pending_weight = total_weight - evaluated_weight
+        norm = max_score or 1
+
+        if not pending_weight:
+            upper = score
+        elif max_node_score is not None:
+            upper = score + pending_weight * max_node_score
+        else:
+            upper = None
+
+        return PartialScore(
+            estimate=(score / evaluated_weight * total_weight if evaluated_weight else 0) / norm,
+            lower=(score + pending_weight * min_node_score) / norm,
+            upper=upper / norm if upper is not None else None,
+            evaluated=len(evaluated),
+            total=len(self.children)
+        )
 
-        score = sum(self._eval_scores)
+    def score(
+            self,
+            max_score: float | None = None,
+            evaluation: list[AsyncNonBinaryNode.OutputFormat] | None = None
+    ) -> float:
+        """
+        Return the score by summing ``AsyncNonBinaryNode`` score values.
+        :param max_score: If provided returns normalized score, by dividing ``score / max_score``.
+        :param evaluation: If provided, scores it instead of ``self.evaluation``, e.g. an item of ``eval_many`` results.
+        """
+        evaluation = self.evaluation if evaluation is None else evaluation
+        score = sum(item.score for item in evaluation)
         if max_score:
             return score / max_score
 
@@ -0,0 +1,251 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+class NodeCallEvent(BaseModel):
+    """
+    Measurements of a single node call made by a graph.
+
+    ``wall_time`` covers the node call only, ``queue_wait`` is the time spent waiting for a concurrency slot.
+    Token counts, retries and parse failures are reported by models recording them (e.g. ``OpenAIModel``).
+    """
+    graph: str
+    node: str
+    criterion: str | None
+    started: float
+    wall_time: float
+    queue_wait: float
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    retries: int = 0
+    parse_failures: int = 0
+    error: str | None = None
+
+
+class BaseInstrument(ABC):
+    """
+    An interface to implement consumers of ``NodeCallEvent``, passed to graphs with the ``instruments`` argument.
+    ``on_event`` is called on the event loop, so implementations should not block.
+    """
+
+    @abstractmethod
+    def on_event(self, event: NodeCallEvent) -> None:
+        pass
+
+
+class EventLog(BaseInstrument):
+    """
+    Collects events in memory and optionally appends them to a JSONL file.
+
+    :param path: If provided, every event is appended to this file as a JSON line.
+    :param max_events: Maximum number of events kept in memory, the oldest are dropped first.
+    """
+
+    def __init__(self, path: str | Path | None = None, max_events: int | None = 100_000):
+        self.path = Path(path) if path is not None else None
+        self.max_events = max_events
+        self.events: list[NodeCallEvent] = []
+
+    def on_event(self, event: NodeCallEvent) -> None:
+        self.events.append(event)
+        if self.max_events is not None and len(self.events) > self.max_events:
+            del self.events[:len(self.events) - self.max_events]
+
+        if self.path is not None:
+            with open(self.path, 'a') as file:
+                file.write(event.model_dump_json() + '\n')
+
+
+class SpanExporter(BaseInstrument):
+    """
+    Exports events as OpenTelemetry-style spans.
+
+    Without a ``tracer``, spans are kept as dictionaries following the OTLP JSON layout in ``self.spans``
+    and passed to ``export`` if provided. With an OpenTelemetry ``tracer``, a span is started and ended
+    with the measured timestamps instead.
+
+    :param tracer: An ``opentelemetry.trace.Tracer``, optional.
+    :param export: A callable receiving every span dictionary, e.g. to send it to a collector.
+    """
+
+    def __init__(self, tracer: Any = None, export: Callable[[dict], None] | None = None):
+        self.tracer = tracer
+        self.export = export
+        self.spans: list[dict] = []
+
+    @staticmethod
+    def _attributes(event: NodeCallEvent) -> dict[str, Any]:
+        attributes = {
+            'asgm.graph': event.graph,
+            'asgm.node': event.node,
+            'asgm.queue_wait': event.queue_wait,
+            'asgm.requests': event.requests,
+            'asgm.retries': event.retries,
+            'asgm.parse_failures': event.parse_failures,
+            'gen_ai.usage.input_tokens': event.input_tokens,
+            'gen_ai.usage.cached_tokens': event.cached_tokens,
+            'gen_ai.usage.output_tokens': event.output_tokens,
+        }
+        if event.criterion is not None:
+            attributes['asgm.criterion'] = event.criterion
+        if event.error is not None:
+            attributes['error.type'] = event.error
+
+        return attributes
+
+    def on_event(self, event: NodeCallEvent) -> None:
+        start = int(event.started * 1e9)
+        end = int((event.started + event.wall_time) * 1e9)
+        name = f'{event.graph}.{event.node}'
+
+        if self.tracer is not None:
+            span = self.tracer.start_span(name, start_time=start, attributes=self._attributes(event))
+            span.end(end_time=end)
+            return
+
+        span = {
+            'traceId': os.urandom(16).hex(),
+            'spanId': os.urandom(8).hex(),
+            'name': name,
+            'startTimeUnixNano': start,
+            'endTimeUnixNano': end,
+            'attributes': self._attributes(event),
+            'status': {'code': 'ERROR' if event.error else 'OK'},
+        }
+        self.spans.append(span)
+        if self.export is not None:
+            self.export(span)
+
+
+class PrometheusExporter(BaseInstrument):
+    """
+    Aggregates events into Prometheus metrics labelled by graph, node and criterion.
+
+    ``render`` returns the metrics in the Prometheus text exposition format, ``serve`` exposes them over HTTP.
+
+    :param buckets: Upper bounds of the wall time histogram buckets in seconds.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = (.1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: dict[tuple, list[float]] = {}
+
+    @staticmethod
+    def _labels(event: NodeCallEvent) -> tuple[tuple[str, str], ...]:
+        return (
+            ('graph', event.graph),
+            ('node', event.node),
+            ('criterion', event.criterion or ''),
+        )
+
+    def on_event(self, event: NodeCallEvent) -> None:
+        labels = self._labels(event)
+        with self._lock:
+            self._counters['asgm_node_calls_total'][labels] += 1
+            self._counters['asgm_node_errors_total'][labels] += event.error is not None
+            self._counters['asgm_node_retries_total'][labels] += event.retries
+            self._counters['asgm_node_parse_failures_total'][labels] += event.parse_failures
+            self._counters['asgm_node_queue_wait_seconds_total'][labels] += event.queue_wait
+            for kind in ('input', 'cached', 'output'):
+                self._counters['asgm_node_tokens_total'][labels + (('type', kind),)] += getattr(
+                    event, f'{kind}_tokens'
+                )
+
+            # cumulative bucket counts, followed by the sum and the count
+            histogram = self._histograms.setdefault(labels, [0.] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                histogram[i] += event.wall_time <= bound
+            histogram[-2] += event.wall_time
+            histogram[-1] += 1
+
+    @staticmethod
+    def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+        def escape(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+        return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in series.items():
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+
+            name = 'asgm_node_wall_seconds'
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in self._histograms.items():
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'{name}_bucket{self._format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+                lines.append(f'{name}_bucket{self._format_labels(labels + (("le", "+Inf"),))} {histogram[-1]}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {histogram[-2]}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {histogram[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1') -> 'ThreadingHTTPServer':
+        """Serves ``render`` output at ``/metrics`` from a daemon thread, returns the server to shut it down."""
+        # imported on use, ``http.server`` pulls in the ``email`` package
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+
+def summarize(events: list[NodeCallEvent]) -> dict[str, dict[str, float]]:
+    """
+    Returns per criterion call counts, total tokens and p50/p99 wall time, to find the criteria
+    dominating cost and tail latency.
+    """
+    grouped: dict[str, list[NodeCallEvent]] = defaultdict(list)
+    for event in events:
+        grouped[event.criterion or event.node].append(event)
+
+    def percentile(values: list[float], q: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        criterion: {
+            'calls': len(items),
+            'input_tokens': sum(item.input_tokens for item in items),
+            'output_tokens': sum(item.output_tokens for item in items),
+            'p50': percentile([item.wall_time for item in items], .5),
+            'p99': percentile([item.wall_time for item in items], .99),
+        }
+        for criterion, items in grouped.items()
+    }
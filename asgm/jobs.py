@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from pydantic import BaseModel
+
+from .graphs import AsyncBaseStarGraph
+from .models.hashing import model_name
+from .models.tools import cache_tool_results
+from .models.usage import Usage, track_usage
+from .nodes import PARSE_FAILURE, BaseABSNode, criterion_key
+from .serialization import dump_output, load_output
+
+if TYPE_CHECKING:
+    from .results import ResultsTable
+
+
+class ResultRecord(BaseModel):
+    """A single node result of a document, as stored by ``ResultStore``."""
+    document_id: str
+    criterion_key: str
+    model: str
+    output: dict
+
+
+# ==== Stores ====
+
+class ResultStore(ABC):
+    """
+    An interface to implement append-only stores of ``ResultRecord``.
+    A ``(document_id, criterion_key, model)`` triple is stored once, later appends of the same triple are ignored.
+    """
+
+    @abstractmethod
+    def append(self, records: list[ResultRecord]) -> None:
+        """Durably stores ``records`` before returning. ``EvaluationJob`` calls it from worker threads."""
+        pass
+
+    @abstractmethod
+    def records(self) -> Iterator[ResultRecord]:
+        pass
+
+    def done(self, model: str) -> set[tuple[str, str]]:
+        """Returns the ``(document_id, criterion_key)`` pairs already evaluated by ``model``."""
+        return {
+            (record.document_id, record.criterion_key)
+            for record in self.records()
+            if record.model == model
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class JSONLResultStore(ResultStore):
+    """
+    Stores records as lines of a JSONL file, flushed and synced to disk after every append.
+
+    A line truncated by a crash in the middle of a write is dropped when the store is opened.
+
+    :param path: Path to the JSONL file, created if missing.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.touch()
+        self._drop_truncated_line()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def _drop_truncated_line(self) -> None:
+        with open(self.path, 'rb+') as file:
+            data = file.read()
+            if data and not data.endswith(b'\n'):
+                file.truncate(data.rfind(b'\n') + 1)
+
+    def append(self, records: list[ResultRecord]) -> None:
+        data = ''.join(record.model_dump_json() + '\n' for record in records)
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def records(self) -> Iterator[ResultRecord]:
+        seen = set()
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    break
+
+                record = ResultRecord.model_validate_json(line)
+                triple = (record.document_id, record.criterion_key, record.model)
+                if triple not in seen:
+                    seen.add(triple)
+                    yield record
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    Stores records in a SQLite table keyed by ``(document_id, criterion_key, model)``.
+
+    :param path: Path to the database file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'document_id TEXT NOT NULL, criterion_key TEXT NOT NULL, model TEXT NOT NULL, output TEXT NOT NULL, '
+            'PRIMARY KEY (document_id, criterion_key, model))'
+        )
+        self._lock = threading.Lock()
+
+    def append(self, records: list[ResultRecord]) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)',
+                (
+                    (record.document_id, record.criterion_key, record.model, json.dumps(record.output))
+                    for record in records
+                )
+            )
+            self._conn.execute('COMMIT')
+
+    def records(self) -> Iterator[ResultRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT document_id, criterion_key, model, output FROM results ORDER BY rowid'
+            ).fetchall()
+
+        for document_id, key, model, output in rows:
+            yield ResultRecord(document_id=document_id, criterion_key=key, model=model, output=json.loads(output))
+
+    def done(self, model: str) -> set[tuple[str, str]]:
+        with self._lock:
+            return set(
+                self._conn.execute(
+                    'SELECT document_id, criterion_key FROM results WHERE model = ?', (model,)
+                ).fetchall()
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ==== Job ====
+
+class EvaluationJob:
+    """
+    Evaluates a corpus with ``graph``, appending every node result to ``store`` as soon as it arrives.
+
+    Running the job again with the same store (e.g. after a crash) skips the ``(document, criterion, model)``
+    triples already stored, so no completed model call is paid twice. Parse failures (including non-retryable
+    provider errors, which models turn into unparsed responses) are not stored, so the next run retries them.
+    Results and scores are read from the store, nothing accumulates in memory.
+
+    :param graph: The graph defining the criteria and the model.
+    :param store: The store of results, e.g. ``JSONLResultStore`` or ``SQLiteResultStore``.
+    """
+
+    def __init__(self, graph: AsyncBaseStarGraph, store: ResultStore):
+        self.graph = graph
+        self.store = store
+
+    @property
+    def _keys(self) -> list[str]:
+        return [criterion_key(child) for child in self.graph.children]
+
+    async def run(self, documents: Iterable[tuple[str, str]], max_concurrency: int = 16) -> int:
+        """
+        Evaluates the pending criteria of ``documents``, returns the number of stored results.
+
+        All model calls share one semaphore of ``max_concurrency`` slots, and at most ``max_concurrency`` documents
+        are scheduled at once, see ``AsyncBaseStarGraph.iter_eval_many``. ``self.graph.usage`` accumulates usage
+        of the run.
+
+        :param documents: An iterable of ``(document_id, content)`` pairs, consumed lazily.
+        :param max_concurrency: Maximum number of concurrent model calls.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be a positive integer.')
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        model = model_name(self.graph.model)
+        keys = self._keys
+        done = self.store.done(model)
+        units = self.graph._units()
+        self.graph.usage = Usage()
+        tool_cache = {}
+        stored = 0
+
+        async def _eval_unit(document_id: str, content: str, node: BaseABSNode, indexes: list[int]) -> None:
+            nonlocal stored
+            with track_usage(self.graph.usage), cache_tool_results(tool_cache):
+                res = await self.graph._eval_child(node, content, semaphore)
+
+            records = [
+                ResultRecord(document_id=document_id, criterion_key=keys[i], model=model, output=dump_output(item))
+                for i, item in self.graph._split(indexes, res)
+                # criteria of a packed unit may be stored already
+                if (document_id, keys[i]) not in done and getattr(item, 'reason', None) != PARSE_FAILURE
+            ]
+            if records:
+                # appends wait for the disk, so they run in a thread instead of blocking the other evaluations
+                await asyncio.to_thread(self.store.append, records)
+                stored += len(records)
+
+        async def _eval_document(document_id: str, content: str) -> None:
+            await asyncio.gather(
+                *[
+                    _eval_unit(document_id, content, node, indexes)
+                    for node, indexes in units
+                    if any((document_id, keys[i]) not in done for i in indexes)
+                ]
+            )
+
+        pending: deque[asyncio.Task] = deque()
+        try:
+            for document_id, content in documents:
+                pending.append(
+                    asyncio.create_task(_eval_document(document_id, content))
+                )
+
+                if len(pending) > max_concurrency:
+                    await pending.popleft()
+
+            while pending:
+                await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return stored
+
+    def evaluations(self) -> dict[str, list[BaseABSNode.OutputFormat | None]]:
+        """
+        Returns stored results of every document in children order, ``None`` for criteria not evaluated yet.
+        Results of other models or of criteria not in the graph anymore are ignored.
+        """
+        model = model_name(self.graph.model)
+        indexes = defaultdict(list)
+        for i, key in enumerate(self._keys):
+            indexes[key].append(i)
+
+        evaluations = {}
+        for record in self.store.records():
+            if record.model != model or record.criterion_key not in indexes:
+                continue
+
+            evaluation = evaluations.setdefault(record.document_id, [None] * len(self.graph.children))
+            for i in indexes[record.criterion_key]:
+                evaluation[i] = load_output(record.output)
+
+        return evaluations
+
+    def table(self) -> 'ResultsTable':
+        """Returns the stored results as a ``ResultsTable`` (requires numpy), e.g. to aggregate a large corpus."""
+        from .results import ResultsTable
+
+        return ResultsTable.from_evaluations(self.graph, self.evaluations())
+
+    def scores(self, **kwargs) -> dict[str, float]:
+        """
+        Returns the score of every fully evaluated document, computed from the store.
+        :param kwargs: Passed to ``graph.score``, e.g. ``norm`` or ``max_score``.
+        """
+        return {
+            document_id: self.graph.score(evaluation=evaluation, **kwargs)
+            for document_id, evaluation in self.evaluations().items()
+            if None not in evaluation
+        }
@@ -0,0 +1,48 @@
+"""
+Models are importable from the package, e.g. ``from asgm.models import OpenAIModel``.
+
+Submodules are imported on first access of one of their names, so provider SDKs (e.g. ``openai``)
+are only loaded by processes using the corresponding model.
+"""
+import importlib
+
+# public name -> submodule defining it
+_exports = {
+    'BaseChatModel': 'base_model',
+    'FakeChatModel': 'fake',
+    'OpenAIModel': 'openai',
+    'SimulatedChatModel': 'simulated',
+    'CachedChatModel': 'cache',
+    'InMemoryCache': 'cache',
+    'SQLiteCache': 'cache',
+    'SingleFlightChatModel': 'singleflight',
+    'RateLimitedChatModel': 'ratelimit',
+    'RateLimiter': 'ratelimit',
+    'CascadeChatModel': 'routing',
+    'BatchRunner': 'batch',
+    'RecordingChatModel': 'recording',
+    'ReplayChatModel': 'recording',
+    'ReplayServer': 'replay_server',
+    'ToolKit': 'tools',
+    'Message': 'types',
+    'Tool': 'types',
+    'Usage': 'usage',
+    'track_usage': 'usage',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+    # later accesses do not go through ``__getattr__``
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_exports])
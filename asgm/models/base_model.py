@@ -1,9 +1,15 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Type
+from typing import Any, Awaitable, Callable, Type
 
 from pydantic import BaseModel
 
-from .types import Message, Tool
+from .types import Message, Tool, TurnCall
+
+
+async def run_turn(call_turn: TurnCall | None, input: list[Message], call: Callable[[], Awaitable[Any]]) -> Any:
+    """Runs the model call of a tool loop turn through ``call_turn``, if provided."""
+    return await call_turn(input, call) if call_turn is not None else await call()
 
 
 class BaseChatModel(ABC):
@@ -62,3 +68,79 @@ class BaseChatModel(ABC):
             **kwargs
     ) -> BaseModel | None:
         pass
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        """Sync version of ``acreate_structured_samples``, the default implementation makes ``n`` sequential calls."""
+        return [
+            self.create_structured_completion(input=input, text_format=text_format, **kwargs)
+            for _ in range(n)
+        ]
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        """
+        Returns ``n`` independent structured completions of the same input, e.g. to vote over sampled judgments.
+
+        The default implementation makes ``n`` concurrent ``acreate_structured_completion`` calls.
+        Override it for providers returning several samples from a single request.
+        """
+        return list(
+            await asyncio.gather(
+                *[
+                    self.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+                    for _ in range(n)
+                ]
+            )
+        )
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        """
+        Lets the model call tools over several turns, feeding tool outputs back, until it calls scoring tools
+        (see ``ToolKit.scoring``). Returns the results of the scoring tool calls of the final turn.
+
+        The default implementation makes a single ``acreate_tool_completion`` call and returns all of its results.
+        Override it for providers supporting multi-turn tool calling.
+
+        :param max_turns: Maximum number of model calls. The last turn only offers scoring tools.
+        :param max_tokens: Once the turns used this number of tokens, the next turn is the last one.
+        :param call_turn: Runs the model call of every turn, e.g. to rate limit and retry turns separately
+            (see ``RateLimitedChatModel``). Wrappers pass it through to the wrapped model.
+        """
+        return await run_turn(
+            call_turn,
+            input,
+            lambda: self.acreate_tool_completion(input=input, tools=tools, **kwargs)
+        )
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        """
+        Prepares what the model derives from an output format (e.g. its JSON schema) ahead of the first request,
+        see ``AsyncBaseStarGraph.compile``. The default implementation does nothing.
+        """
+        pass
+
+    def is_retryable(self, exc: Exception) -> bool:
+        """
+        Returns ``True`` if ``exc`` is a transient error (rate limit, timeout, connection error),
+        so the call can be retried. Override it to classify provider specific exceptions.
+        """
+        return isinstance(exc, (TimeoutError, ConnectionError))
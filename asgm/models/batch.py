@@ -0,0 +1,445 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Type
+
+from pydantic import BaseModel, ValidationError
+
+from .base_model import BaseChatModel
+from .hashing import request_key
+from .types import Message, Tool
+from .usage import record_parse_failure, record_usage
+
+# batch statuses after which a batch is not processed anymore
+FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+# final statuses with results, of all requests or of the requests processed before the batch ended
+RESULT_STATUSES = {'completed', 'expired', 'cancelled'}
+
+
+# ==== Endpoints ====
+
+class BaseBatchEndpoint(ABC):
+    """
+    An interface to implement batch endpoints, i.e. services processing a JSONL file of requests offline.
+    """
+
+    @abstractmethod
+    def submit(self, path: Path) -> str:
+        """Submits the requests file and returns the batch id."""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Returns the batch status, e.g. ``'in_progress'`` or one of ``FINAL_STATUSES``."""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> list[dict]:
+        """Returns result lines of a batch in one of ``RESULT_STATUSES``."""
+        pass
+
+
+class OpenAIBatchEndpoint(BaseBatchEndpoint):
+    """
+    The OpenAI Batch API processing ``/v1/responses`` requests.
+
+    :param client: A sync OpenAI client.
+    :param completion_window: The time frame within which the batch should be processed.
+    """
+
+    def __init__(self, client: Any, completion_window: str = '24h'):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, path: Path) -> str:
+        with open(path, 'rb') as file:
+            input_file = self.client.files.create(file=file, purpose='batch')
+
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/responses',
+            completion_window=self.completion_window
+        )
+
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> list[dict]:
+        batch = self.client.batches.retrieve(batch_id)
+
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                text = self.client.files.content(file_id).text
+                lines.extend(json.loads(line) for line in text.splitlines() if line.strip())
+
+        return lines
+
+
+class LocalBatchEndpoint(BaseBatchEndpoint):
+    """
+    A file-based stand-in for a batch endpoint, intended for tests and dry runs.
+
+    Submitted files are copied into ``directory`` and processed on the first status check. Each request body is
+    passed to ``responder``, which returns either the output text of the response or a full Responses API body.
+    """
+
+    def __init__(self, directory: str | Path, responder: Callable[[dict], str | dict]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.responder = responder
+        self.submitted = 0
+
+    def submit(self, path: Path) -> str:
+        self.submitted += 1
+        batch_id = f'local-batch-{len(list(self.directory.glob("*.input.jsonl")))}'
+        (self.directory / f'{batch_id}.input.jsonl').write_text(Path(path).read_text())
+
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        output = self.directory / f'{batch_id}.output.jsonl'
+        if not output.exists():
+            lines = (self.directory / f'{batch_id}.input.jsonl').read_text().splitlines()
+            with open(output, 'w') as file:
+                for line in lines:
+                    request = json.loads(line)
+                    body = self.responder(request['body'])
+                    if isinstance(body, str):
+                        body = {
+                            'output': [
+                                {'type': 'message', 'content': [{'type': 'output_text', 'text': body}]}
+                            ]
+                        }
+
+                    file.write(json.dumps({
+                        'custom_id': request['custom_id'],
+                        'response': {'status_code': 200, 'body': body},
+                        'error': None
+                    }) + '\n')
+
+        return 'completed'
+
+    def results(self, batch_id: str) -> list[dict]:
+        text = (self.directory / f'{batch_id}.output.jsonl').read_text()
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# ==== Models ====
+
+class BatchCollectModel(BaseChatModel):
+    """
+    Collects requests as Responses API batch lines instead of calling a model.
+    Every call returns an empty result, so nodes fall back to their parsing error outputs.
+
+    :param model: Name of the model used to process the batch.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.requests: dict[str, dict] = {}
+
+    def _collect(self, key: str, body: dict) -> None:
+        self.requests[key] = {
+            'custom_id': key,
+            'method': 'POST',
+            'url': '/v1/responses',
+            'body': {'model': self.model, **body}
+        }
+
+    # ==== Completions ====
+
+    def create_completion(self, input: list[Message], **kwargs) -> str:
+        self._collect(request_key(self, 'completion', input, **kwargs), {'input': input, **kwargs})
+        return ''
+
+    async def acreate_completion(self, input: list[Message], **kwargs) -> str:
+        return self.create_completion(input=input, **kwargs)
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        self._collect(
+            request_key(self, 'tool_completion', input, tools=tools, **kwargs),
+            {'input': input, 'tools': [tool['schema'] for tool in tools], **kwargs}
+        )
+        # a placeholder result, so nodes relying on the first tool call do not fail while collecting
+        return [0]
+
+    async def acreate_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        return self.create_tool_completion(input=input, tools=tools, **kwargs)
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        from .openai import text_format_param
+
+        self._collect(
+            request_key(self, 'structured_completion', input, text_format=text_format, **kwargs),
+            {'input': input, 'text': {'format': text_format_param(text_format)}, **kwargs}
+        )
+        return None
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return self.create_structured_completion(input=input, text_format=text_format, **kwargs)
+
+
+class BatchResultsModel(BaseChatModel):
+    """
+    Serves responses of a processed batch, matching requests by ``request_key``.
+    Requests missing from the batch or failed in it are handled like failed calls of ``OpenAIModel``.
+
+    :param model: Name of the model used to process the batch, it should match the one of ``BatchCollectModel``.
+    :param results: Batch result lines.
+    """
+
+    def __init__(self, model: str, results: list[dict]):
+        self.model = model
+        self.bodies: dict[str, dict] = {}
+        for line in results:
+            response = line.get('response') or {}
+            if response.get('status_code') == 200:
+                self.bodies[line['custom_id']] = response['body']
+
+    def _body(self, key: str) -> dict | None:
+        body = self.bodies.get(key)
+        if body is not None and (usage := body.get('usage')):
+            record_usage(
+                input_tokens=usage.get('input_tokens', 0),
+                cached_tokens=(usage.get('input_tokens_details') or {}).get('cached_tokens', 0),
+                output_tokens=usage.get('output_tokens', 0)
+            )
+
+        return body
+
+    @staticmethod
+    def _output_text(body: dict) -> str | None:
+        for output in body.get('output', []):
+            if output.get('type') == 'message':
+                for content in output.get('content', []):
+                    if content.get('type') == 'output_text':
+                        return content['text']
+
+        return None
+
+    # ==== Completions ====
+
+    def create_completion(self, input: list[Message], **kwargs) -> str:
+        body = self._body(request_key(self, 'completion', input, **kwargs))
+        if body is None or (text := self._output_text(body)) is None:
+            raise LookupError('The request is missing from the batch results.')
+
+        return text
+
+    async def acreate_completion(self, input: list[Message], **kwargs) -> str:
+        return self.create_completion(input=input, **kwargs)
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        body = self._body(request_key(self, 'tool_completion', input, tools=tools, **kwargs)) or {}
+
+        tool_calls = []
+        for output in body.get('output', []):
+            if output.get('type') == 'function_call':
+                arguments = json.loads(output['arguments'])
+                for tool in tools:
+                    if tool['name'] == output['name']:
+                        tool_calls.append(tool['func'](**arguments))
+
+        return tool_calls
+
+    async def acreate_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        return self.create_tool_completion(input=input, tools=tools, **kwargs)
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        body = self._body(request_key(self, 'structured_completion', input, text_format=text_format, **kwargs))
+        if body is None or (text := self._output_text(body)) is None:
+            record_parse_failure()
+            return None
+
+        try:
+            return text_format.model_validate_json(text)
+        except ValidationError:
+            record_parse_failure()
+            return None
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return self.create_structured_completion(input=input, text_format=text_format, **kwargs)
+
+
+# ==== Runner ====
+
+class BatchRunner:
+    """
+    Evaluates a corpus with a graph through a batch endpoint.
+
+    The run has three steps, each persisted in ``directory`` so an interrupted run resumes where it stopped:
+
+    1. the graph is evaluated with ``BatchCollectModel`` to write every node request into JSONL files;
+    2. the files are submitted and polled until processed, batch ids are stored in ``state.json``;
+    3. the graph is evaluated again with ``BatchResultsModel`` serving the downloaded results.
+
+    Results of expired and cancelled batches are kept, and the requests an expired batch did not process are
+    submitted again in a new batch, up to ``max_attempts`` batches per request. A failed batch raises a
+    ``RuntimeError`` and is submitted again by the next run.
+
+    :param model: Name of the model processing the batch, e.g. ``'gpt-4.1-mini'``.
+    :param endpoint: The batch endpoint, e.g. ``OpenAIBatchEndpoint`` or ``LocalBatchEndpoint``.
+    :param directory: Directory storing requests, results and the run state.
+    :param max_batch_size: Maximum number of requests per batch file (50 000 for the OpenAI Batch API).
+    :param poll_interval: Seconds between status checks.
+    :param max_attempts: Maximum number of batches a request is submitted in.
+    """
+
+    def __init__(
+            self,
+            model: str,
+            endpoint: BaseBatchEndpoint,
+            directory: str | Path,
+            max_batch_size: int = 50_000,
+            poll_interval: float = 60,
+            max_attempts: int = 3
+    ):
+        self.model = model
+        self.endpoint = endpoint
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_batch_size = max_batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+    @property
+    def _state_path(self) -> Path:
+        return self.directory / 'state.json'
+
+    def _load_state(self) -> dict:
+        if self._state_path.exists():
+            return json.loads(self._state_path.read_text())
+
+        return {'batches': []}
+
+    def _save_state(self, state: dict) -> None:
+        # write and rename, so a crash never leaves a truncated state file
+        tmp = self._state_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(state, indent=2))
+        tmp.replace(self._state_path)
+
+    def _write_requests(self, requests: list[dict]) -> list[Path]:
+        paths = []
+        for i in range(0, len(requests), self.max_batch_size):
+            path = self.directory / f'requests-{i // self.max_batch_size}.jsonl'
+            with open(path, 'w') as file:
+                for request in requests[i:i + self.max_batch_size]:
+                    file.write(json.dumps(request) + '\n')
+
+            paths.append(path)
+
+        return paths
+
+    async def _process(self, requests: list[dict]) -> list[dict]:
+        """Submits the requests unless already submitted, waits for the batches and returns their results."""
+        state = self._load_state()
+
+        if not state['batches']:
+            for path in self._write_requests(requests):
+                state['batches'].append({'file': path.name, 'id': None, 'status': None})
+            self._save_state(state)
+
+        for batch in state['batches']:
+            self._submit(state, batch)
+
+        results = []
+        # batches resubmitting the requests of expired batches are appended, and processed by the same loop
+        for batch in state['batches']:
+            self._submit(state, batch)
+            while batch['status'] not in FINAL_STATUSES:
+                batch['status'] = self.endpoint.status(batch['id'])
+                self._save_state(state)
+
+                if batch['status'] not in FINAL_STATUSES:
+                    await asyncio.sleep(self.poll_interval)
+
+            if batch['status'] not in RESULT_STATUSES:
+                batch_id, batch['id'], batch['status'] = batch['id'], None, None
+                self._save_state(state)
+                raise RuntimeError(f'Batch {batch_id} of {batch["file"]} failed, the next run submits it again.')
+
+            results_path = self.directory / f'results-{batch["id"]}.jsonl'
+            if not results_path.exists():
+                lines = self.endpoint.results(batch['id'])
+                # write and rename, a resumed run takes an existing results file as complete
+                tmp = results_path.with_suffix('.tmp')
+                tmp.write_text(''.join(json.dumps(line) + '\n' for line in lines))
+                tmp.replace(results_path)
+
+            lines = [json.loads(line) for line in results_path.read_text().splitlines() if line.strip()]
+            results.extend(lines)
+
+            if batch['status'] == 'expired' and not batch.get('resubmitted'):
+                self._resubmit_missing(state, batch, lines)
+
+        return results
+
+    def _submit(self, state: dict, batch: dict) -> None:
+        if batch['id'] is None:
+            batch['id'] = self.endpoint.submit(self.directory / batch['file'])
+            self._save_state(state)
+
+    def _resubmit_missing(self, state: dict, batch: dict, lines: list[dict]) -> None:
+        """Appends a batch of the requests an expired ``batch`` did not process, within ``max_attempts``."""
+        processed = {line['custom_id'] for line in lines if (line.get('response') or {}).get('status_code') == 200}
+        with open(self.directory / batch['file']) as file:
+            missing = [line for line in file if line.strip() and json.loads(line)['custom_id'] not in processed]
+
+        attempt = batch.get('attempt', 1) + 1
+        if missing and attempt <= self.max_attempts:
+            path = self.directory / f'{Path(batch["file"]).stem.split(".")[0]}.{attempt}.jsonl'
+            path.write_text(''.join(missing))
+            state['batches'].append({'file': path.name, 'id': None, 'status': None, 'attempt': attempt})
+
+        batch['resubmitted'] = True
+        self._save_state(state)
+
+    async def run(self, graph: Any, contents: list[str]) -> list[list[BaseModel]]:
+        """
+        Returns evaluation results of ``graph`` for each content in input order.
+        ``graph.model`` is swapped during the run and restored afterwards.
+        """
+        model = graph.model
+        collector = BatchCollectModel(self.model)
+        try:
+            graph.model = collector
+            await graph.eval_many(contents)
+
+            results = await self._process(list(collector.requests.values()))
+
+            graph.model = BatchResultsModel(self.model, results)
+            return await graph.eval_many(contents)
+        finally:
+            graph.model = model
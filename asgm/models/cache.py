@@ -0,0 +1,316 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Type
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel
+from .hashing import request_key
+from .types import Message, Tool, TurnCall
+
+
+# ==== Backends ====
+
+class BaseCache(ABC):
+    """
+    An interface to implement storages for ``CachedChatModel``.
+
+    Values are serialized JSON strings, so every call to ``get`` returns a fresh object after deserialization
+    and callers mutating a result (e.g. ``AsyncNonBinaryNode`` applying its weight) do not alter the cache.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+
+class InMemoryCache(BaseCache):
+    """
+    An in-memory LRU cache.
+
+    :param max_size: Maximum number of stored entries, the least recently used entry is evicted first.
+    :param ttl: Time to live of an entry in seconds. If ``None``, entries never expire.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            created, value = item
+            if self.ttl is not None and time.monotonic() - created > self.ttl:
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(BaseCache):
+    """
+    An on-disk cache backed by SQLite that persists between runs.
+
+    :param path: Path to the database file.
+    :param ttl: Time to live of an entry in seconds. If ``None``, entries never expire.
+    """
+
+    def __init__(self, path: str | Path, ttl: float | None = None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute('SELECT value, created FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            value, created = row
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)',
+                (key, value, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ==== Model ====
+
+class CachedChatModel(BaseChatModel):
+    """
+    A wrapper around any ``BaseChatModel`` that stores responses in a content-addressed cache.
+
+    Requests are keyed by ``request_key``, so re-running a metric suite over unchanged content with deterministic
+    settings (e.g. ``temperature=0``) does not call the wrapped model again.
+    Failed structured completions (``None``) and tool results that are not JSON serializable are not cached.
+    """
+
+    def __init__(
+            self,
+            model: BaseChatModel,
+            cache: BaseCache | None = None
+    ):
+        self.model = model
+        self.cache = cache if cache is not None else InMemoryCache()
+        self.hits = 0
+        self.misses = 0
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.model.is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        self.model.compile_format(text_format)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def _get(self, key: str) -> str | None:
+        value = self.cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def _set(self, key: str, value: Any) -> None:
+        try:
+            self.cache.set(key, json.dumps(value))
+        except TypeError:
+            # value is not JSON serializable, skip caching
+            pass
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        key = request_key(self.model, 'completion', input, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return json.loads(cached)
+
+        res = self.model.create_completion(input=input, **kwargs)
+        self._set(key, res)
+        return res
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        key = request_key(self.model, 'completion', input, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return json.loads(cached)
+
+        res = await self.model.acreate_completion(input=input, **kwargs)
+        self._set(key, res)
+        return res
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        key = request_key(self.model, 'tool_completion', input, tools=tools, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return json.loads(cached)
+
+        res = self.model.create_tool_completion(input=input, tools=tools, **kwargs)
+        self._set(key, res)
+        return res
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        key = request_key(self.model, 'tool_completion', input, tools=tools, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return json.loads(cached)
+
+        res = await self.model.acreate_tool_completion(input=input, tools=tools, **kwargs)
+        self._set(key, res)
+        return res
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        key = request_key(
+            self.model, 'tool_loop', input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, **kwargs
+        )
+        if (cached := self._get(key)) is not None:
+            return json.loads(cached)
+
+        res = await self.model.arun_tool_loop(
+            input=input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, call_turn=call_turn, **kwargs
+        )
+        self._set(key, res)
+        return res
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        key = request_key(self.model, 'structured_completion', input, text_format=text_format, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return text_format.model_validate_json(cached)
+
+        res = self.model.create_structured_completion(input=input, text_format=text_format, **kwargs)
+        if res is not None:
+            self.cache.set(key, res.model_dump_json())
+
+        return res
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        key = request_key(self.model, 'structured_completion', input, text_format=text_format, **kwargs)
+        if (cached := self._get(key)) is not None:
+            return text_format.model_validate_json(cached)
+
+        res = await self.model.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+        if res is not None:
+            self.cache.set(key, res.model_dump_json())
+
+        return res
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        return self.model.create_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        # samples are meant to differ, so they are never served from the cache
+        return await self.model.acreate_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
@@ -4,6 +4,7 @@ from pydantic import BaseModel
 
 from .base_model import BaseChatModel
 from .types import Message, Tool
+from .usage import record_parse_failure
 
 
 class FakeChatModel(BaseChatModel):
@@ -29,6 +30,7 @@ class FakeChatModel(BaseChatModel):
             **kwargs
     ) -> BaseModel | None:
         if self.kwargs.get('parsing_error'):
+            record_parse_failure()
             return None
 
         return text_format(**self.kwargs)
@@ -40,8 +42,7 @@ class FakeChatModel(BaseChatModel):
             **kwargs
     ) -> BaseModel | None:
         if self.kwargs.get('parsing_error'):
+            record_parse_failure()
             return None
 
         return text_format(**self.kwargs)
-
-
@@ -0,0 +1,61 @@
+import hashlib
+import json
+from typing import Any, Type
+from weakref import WeakKeyDictionary
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel
+from .types import Message, Tool
+
+
+# JSON schemas of output formats, generated once instead of on every request
+_schemas: WeakKeyDictionary[type, dict] = WeakKeyDictionary()
+
+
+def format_schema(text_format: Type[BaseModel]) -> dict:
+    """Returns the JSON schema of ``text_format``, generated on first use."""
+    schema = _schemas.get(text_format)
+    if schema is None:
+        schema = _schemas[text_format] = text_format.model_json_schema()
+
+    return schema
+
+
+def model_name(model: BaseChatModel) -> str:
+    """Returns the name of the underlying LLM if the wrapper exposes one, otherwise the class name."""
+    name = getattr(model, 'model', None)
+
+    # unwrap wrappers around other models, e.g. ``CachedChatModel(OpenAIModel(...))``
+    if isinstance(name, BaseChatModel):
+        return model_name(name)
+
+    return str(name or type(model).__name__)
+
+
+def request_key(
+        model: BaseChatModel,
+        method: str,
+        input: list[Message],
+        text_format: Type[BaseModel] | None = None,
+        tools: list[Tool] | None = None,
+        **kwargs
+) -> str:
+    """
+    Returns a stable hash of a model request.
+
+    The hash covers the model name, the called ``method``, the messages, the JSON schema of ``text_format``,
+    the schemas of ``tools`` and the remaining keyword arguments, so two requests share a key only if the provider
+    would receive the same payload.
+    """
+    payload: dict[str, Any] = {
+        'model': model_name(model),
+        'method': method,
+        'input': input,
+        'text_format': format_schema(text_format) if text_format else None,
+        'tools': [[tool['name'], tool['schema']] for tool in tools] if tools is not None else None,
+        'kwargs': kwargs,
+    }
+    dump = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+
+    return hashlib.sha256(dump.encode()).hexdigest()
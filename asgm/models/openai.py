@@ -1,13 +1,269 @@
+import asyncio
 import json
-from typing import Any, Type
+import os
+import threading
+from typing import Any, Awaitable, Mapping, Type
+from weakref import WeakKeyDictionary
 
-from openai import OpenAI, AsyncOpenAI
-from pydantic import BaseModel
+import httpx
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    APIConnectionError,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    RateLimitError,
+    pydantic_function_tool
+)
+from pydantic import BaseModel, ValidationError
 from openai.types.responses.response_output_item import ResponseFunctionToolCall
 from openai.types.shared.chat_model import ChatModel
 
-from .base_model import BaseChatModel
-from .types import Tool, Message
+from .base_model import BaseChatModel, run_turn
+from .ratelimit import record_rate_limit_headers
+from .tools import ToolKit
+from .types import Tool, Message, TurnCall
+from .usage import record_parse_failure, record_usage
+
+
+def _record_usage(res: Any) -> None:
+    """Records the ``usage`` block of a Responses API response, including prompt cache hits."""
+    usage = getattr(res, 'usage', None)
+    if usage is None:
+        return
+
+    details = getattr(usage, 'input_tokens_details', None)
+    record_usage(
+        input_tokens=usage.input_tokens,
+        cached_tokens=getattr(details, 'cached_tokens', 0) or 0,
+        output_tokens=usage.output_tokens
+    )
+
+
+def _record_chat_usage(res: Any) -> None:
+    """Records the ``usage`` block of a Chat Completions response."""
+    usage = getattr(res, 'usage', None)
+    if usage is None:
+        return
+
+    details = getattr(usage, 'prompt_tokens_details', None)
+    record_usage(
+        input_tokens=usage.prompt_tokens,
+        cached_tokens=getattr(details, 'cached_tokens', 0) or 0,
+        output_tokens=usage.completion_tokens
+    )
+
+
+def _parse(raw: Any) -> Any:
+    """
+    Records the rate limit headers of a raw response (see ``with_raw_response``) and parses it,
+    so a ``RateLimitedChatModel`` slows down before the provider rejects requests.
+    """
+    record_rate_limit_headers(raw.headers)
+    return raw.parse()
+
+
+async def _aparse(request: Awaitable[Any]) -> Any:
+    """Async version of ``_parse``, awaits the raw response of ``request``."""
+    return _parse(await request)
+
+
+# strict JSON schema parameters of output formats, converted once instead of on every request
+_text_formats: WeakKeyDictionary[type, dict] = WeakKeyDictionary()
+_response_formats: WeakKeyDictionary[type, dict] = WeakKeyDictionary()
+
+
+def strict_json_schema(text_format: Type[BaseModel]) -> dict:
+    """
+    Returns the strict JSON schema of ``text_format`` required by structured outputs, converted on every call.
+    ``pydantic_function_tool`` is the public helper of the SDK applying the strict mode rules to a model schema.
+    """
+    return pydantic_function_tool(text_format)['function']['parameters']
+
+
+def text_format_param(text_format: Type[BaseModel]) -> dict:
+    """Returns the Responses API ``text.format`` parameter of ``text_format``, converted on first use."""
+    param = _text_formats.get(text_format)
+    if param is None:
+        param = _text_formats[text_format] = {
+            'type': 'json_schema',
+            'strict': True,
+            'name': text_format.__name__,
+            'schema': strict_json_schema(text_format),
+        }
+
+    return param
+
+
+def response_format_param(text_format: Type[BaseModel]) -> dict:
+    """Returns the Chat Completions ``response_format`` parameter of ``text_format``, converted on first use."""
+    param = _response_formats.get(text_format)
+    if param is None:
+        param = _response_formats[text_format] = {
+            'type': 'json_schema',
+            'json_schema': {
+                'schema': text_format_param(text_format)['schema'],
+                'name': text_format.__name__,
+                'strict': True,
+            },
+        }
+
+    return param
+
+
+def _parse_choices(res: Any, text_format: Type[BaseModel]) -> list[BaseModel | None]:
+    """Validates every choice of a Chat Completions response, ``None`` for refusals and invalid outputs."""
+    parsed = []
+    for choice in res.choices:
+        try:
+            parsed.append(text_format.model_validate_json(choice.message.content or ''))
+        except ValidationError:
+            record_parse_failure()
+            parsed.append(None)
+
+    return parsed
+
+
+def _function_calls(res: Any, toolkit: ToolKit) -> list[ResponseFunctionToolCall]:
+    """Returns the function calls of a response that match a tool of ``toolkit``."""
+    return [
+        output
+        for output in res.output
+        if isinstance(output, ResponseFunctionToolCall) and output.name in toolkit.by_name
+    ]
+
+
+def _tool_calls(res: Any, toolkit: ToolKit) -> list[tuple[str, dict]]:
+    """Returns ``(name, arguments)`` of the function calls of a response that match a tool of ``toolkit``."""
+    return [(output.name, json.loads(output.arguments)) for output in _function_calls(res, toolkit)]
+
+
+def _custom_headers(client: OpenAI | AsyncOpenAI) -> dict[str, str]:
+    """Returns the headers passed to ``client``, its ``default_headers`` also hold the headers set by the SDK."""
+    sdk_headers = client.copy(set_default_headers={}).default_headers
+    return {
+        name: value
+        for name, value in client.default_headers.items()
+        # unset headers (e.g. without a project) are ``Omit`` markers
+        if isinstance(value, str) and sdk_headers.get(name) != value
+    }
+
+
+class ClientPool:
+    """
+    A lazily created sync client and one async client per event loop, sharing a connection configuration.
+
+    ``httpx.AsyncClient`` connections are bound to the event loop they were opened in, so each loop gets its
+    own async client. Close it with ``aclose`` (e.g. through ``OpenAIModel.aclose``) before the loop ends, otherwise
+    its connections stay open until they are garbage collected. Pools are shared by every ``OpenAIModel`` with
+    the same configuration (see ``get_pool``), so graphs and nodes reuse warm connections.
+    """
+
+    def __init__(
+            self,
+            api_key: str | None = None,
+            base_url: str | None = None,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30,
+            http2: bool = False,
+            max_retries: int = 2,
+            organization: str | None = None,
+            project: str | None = None,
+            default_headers: Mapping[str, str] | None = None
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.organization = organization
+        self.project = project
+        self.default_headers = dict(default_headers) if default_headers else None
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.max_retries = max_retries
+        self._sync: OpenAI | None = None
+        self._async: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI] = WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def sync_client(self) -> OpenAI:
+        with self._lock:
+            if self._sync is None:
+                self._sync = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    organization=self.organization,
+                    project=self.project,
+                    default_headers=self.default_headers,
+                    max_retries=self.max_retries,
+                    # http2 requires the optional ``h2`` package
+                    http_client=DefaultHttpxClient(limits=self.limits, http2=self.http2)
+                )
+
+            return self._sync
+
+    def async_client(self) -> AsyncOpenAI:
+        """Returns the async client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async.get(loop)
+            if client is None:
+                client = self._async[loop] = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    organization=self.organization,
+                    project=self.project,
+                    default_headers=self.default_headers,
+                    max_retries=self.max_retries,
+                    http_client=DefaultAsyncHttpxClient(limits=self.limits, http2=self.http2)
+                )
+
+            return client
+
+    async def aclose(self) -> None:
+        """Closes the async client of the running event loop, the next call of the loop creates a new one."""
+        with self._lock:
+            client = self._async.pop(asyncio.get_running_loop(), None)
+
+        if client is not None:
+            await client.close()
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._sync = self._sync, None
+
+        if client is not None:
+            client.close()
+
+
+_pools: dict[tuple, ClientPool] = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def get_pool(**config) -> ClientPool:
+    """
+    Returns the shared ``ClientPool`` of ``config`` (keyword arguments of ``ClientPool``).
+    Pools inherited from a parent process are dropped, since connections cannot be shared across a fork.
+    """
+    global _pools_pid
+
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _pools.clear()
+            _pools_pid = os.getpid()
+
+        key = tuple(sorted(
+            (name, tuple(sorted(value.items())) if isinstance(value, Mapping) else value)
+            for name, value in config.items()
+        ))
+        if key not in _pools:
+            _pools[key] = ClientPool(**config)
+
+        return _pools[key]
 
 
 class OpenAIModel(BaseChatModel):
@@ -15,18 +271,115 @@ class OpenAIModel(BaseChatModel):
     A wrapper around the OpenAI client that implements ``BaseModel``.
 
     Consider this class an example of how to implement ``BaseModel`` for an LLM provider.
+
+    If ``client`` is not provided, the model uses a shared ``ClientPool``: a sync client for sync calls and
+    one async client per event loop for async calls, created lazily. A provided ``OpenAI`` client serves sync calls
+    and a provided ``AsyncOpenAI`` client serves async calls, the other kind is taken from a pool configured with
+    the same API key, base URL, organization, project and default headers. The pool is resolved per process,
+    so a model created before a fork does not reuse the connections of the parent process. Close the pooled async
+    client of an event loop with ``aclose`` (or ``async with model:``) before the loop ends.
+
+    :param client: An optional ``OpenAI`` or ``AsyncOpenAI`` client.
+    :param model: Name of the model, e.g. ``'gpt-4.1-mini'``.
+    :param timeout: Timeout of a request in seconds.
+    :param api_key: API key of pooled clients, defaults to the ``OPENAI_API_KEY`` environment variable.
+    :param base_url: Base URL of pooled clients, e.g. of an OpenAI-compatible server.
+    :param max_connections: Maximum number of connections of a pooled client.
+    :param max_keepalive_connections: Maximum number of idle connections kept alive by a pooled client.
+    :param keepalive_expiry: Seconds an idle connection is kept alive.
+    :param http2: If True, pooled clients use HTTP/2, which requires the ``h2`` package.
+    :param max_retries: Retries made by pooled clients on connection errors.
     """
 
     def __init__(
             self,
-            client: OpenAI | AsyncOpenAI,
-            model: ChatModel,
-            timeout: float = 180
+            client: OpenAI | AsyncOpenAI | None = None,
+            model: ChatModel | None = None,
+            timeout: float = 180,
+            api_key: str | None = None,
+            base_url: str | None = None,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30,
+            http2: bool = False,
+            max_retries: int = 2
     ):
+        if model is None:
+            raise ValueError('model should be provided.')
+
         self.client = client
         self.model = model
         self.timeout = timeout
 
+        self._pool_config = {
+            'api_key': api_key,
+            'base_url': base_url,
+            'max_connections': max_connections,
+            'max_keepalive_connections': max_keepalive_connections,
+            'keepalive_expiry': keepalive_expiry,
+            'http2': http2,
+            'max_retries': max_retries,
+        }
+        if client is not None:
+            self._pool_config.update(
+                api_key=api_key or client.api_key,
+                base_url=base_url or str(client.base_url),
+                organization=client.organization,
+                project=client.project,
+                default_headers=_custom_headers(client) or None
+            )
+
+        self._pool: ClientPool | None = None
+        self._pool_pid: int | None = None
+
+    @property
+    def pool(self) -> ClientPool:
+        """The shared ``ClientPool`` of the model configuration in the current process, see ``get_pool``."""
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = get_pool(**self._pool_config)
+            self._pool_pid = os.getpid()
+
+        return self._pool
+
+    async def aclose(self) -> None:
+        """
+        Closes the pooled async client of the running event loop, e.g. at the end of the coroutine passed to
+        ``asyncio.run``. A provided client is left open. Models sharing the pool open a new client on their next call.
+        """
+        await self.pool.aclose()
+
+    def close(self) -> None:
+        """Closes the pooled sync client, a provided client is left open."""
+        self.pool.close()
+
+    async def __aenter__(self) -> 'OpenAIModel':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    @property
+    def sync_client(self) -> OpenAI:
+        if isinstance(self.client, OpenAI):
+            return self.client
+
+        return self.pool.sync_client()
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if isinstance(self.client, AsyncOpenAI):
+            return self.client
+
+        return self.pool.async_client()
+
+    def is_retryable(self, exc: Exception) -> bool:
+        # APITimeoutError is a subclass of APIConnectionError
+        return isinstance(exc, (APIConnectionError, InternalServerError, RateLimitError)) or super().is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        text_format_param(text_format)
+        response_format_param(text_format)
+
     # ==== Completions ====
 
     def create_completion(
@@ -34,24 +387,28 @@ class OpenAIModel(BaseChatModel):
             input: list[Message],
             **kwargs
     ) -> str:
-        return self.client.responses.create(
+        res = _parse(self.sync_client.responses.with_raw_response.create(
             input=input,
             model=self.model,
             timeout=self.timeout,
             **kwargs
-        ).output[0].content[0].text
+        ))
+        _record_usage(res)
+
+        return res.output[0].content[0].text
 
     async def acreate_completion(
             self,
             input: list[Message],
             **kwargs
     ) -> str:
-        res = await self.client.responses.create(
+        res = await _aparse(self.async_client.responses.with_raw_response.create(
             input=input,
             model=self.model,
             timeout=self.timeout,
             **kwargs
-        )
+        ))
+        _record_usage(res)
 
         return res.output[0].content[0].text
 
@@ -63,29 +420,20 @@ class OpenAIModel(BaseChatModel):
             tools: list[Tool],
             **kwargs
     ) -> list[Any]:
-        res = self.client.responses.create(
+        res = _parse(self.sync_client.responses.with_raw_response.create(
             input=input,
             tools=[tool['schema'] for tool in tools],
             model=self.model,
             timeout=self.timeout,
             **kwargs
-        )
-
-        tool_calls = []
-        for output in res.output:
-
-            # if output is a function call
-            if isinstance(output, ResponseFunctionToolCall):
-                kwargs = json.loads(output.arguments)
-
-                # find relevant tool name and call a tool
-                for tool in tools:
-                    if tool['name'] == output.name:
-                        tool_calls.append(
-                            tool['func'](**kwargs)
-                        )
+        ))
+        _record_usage(res)
 
-        return tool_calls
+        toolkit = ToolKit.of(tools)
+        return [
+            toolkit.call(name, arguments)
+            for name, arguments in _tool_calls(res, toolkit)
+        ]
 
     async def acreate_tool_completion(
             self,
@@ -93,29 +441,71 @@ class OpenAIModel(BaseChatModel):
             tools: list[Tool],
             **kwargs
     ) -> list[Any]:
-        res = await self.client.responses.create(
+        res = await _aparse(self.async_client.responses.with_raw_response.create(
             input=input,
             tools=[tool['schema'] for tool in tools],
             model=self.model,
             timeout=self.timeout,
             **kwargs
-        )
+        ))
+        _record_usage(res)
 
-        tool_calls = []
-        for output in res.output:
+        toolkit = ToolKit.of(tools)
+        # coroutine tools run concurrently, blocking tools run in the toolkit executor
+        return await toolkit.acall_many(_tool_calls(res, toolkit))
 
-            # if output is a function call
-            if isinstance(output, ResponseFunctionToolCall):
-                kwargs = json.loads(output.arguments)
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        toolkit = ToolKit.of(tools)
+        scoring = {tool['name'] for tool in toolkit.scoring}
+        items = list(input)
+        used_tokens = 0
 
-                # find relevant tool name and call a tool
-                for tool in tools:
-                    if tool['name'] == output.name:
-                        tool_calls.append(
-                            tool['func'](**kwargs)
-                        )
+        for turn in range(max_turns):
+            # the last turn only offers scoring tools, and requires a call if the loop was cut short
+            last = turn == max_turns - 1 or (max_tokens is not None and used_tokens >= max_tokens)
+            res = await run_turn(
+                call_turn,
+                items,
+                lambda: _aparse(self.async_client.responses.with_raw_response.create(
+                    input=items,
+                    tools=[tool['schema'] for tool in (toolkit.scoring if last else toolkit)],
+                    model=self.model,
+                    timeout=self.timeout,
+                    **({'tool_choice': 'required'} if last and turn else {}),
+                    **kwargs
+                ))
+            )
+            _record_usage(res)
+            if res.usage is not None:
+                used_tokens += res.usage.input_tokens + res.usage.output_tokens
 
-        return tool_calls
+            calls = _function_calls(res, toolkit)
+            if not calls:
+                return []
+
+            results = await toolkit.acall_many([(call.name, json.loads(call.arguments)) for call in calls])
+            if scores := [result for call, result in zip(calls, results) if call.name in scoring]:
+                return scores
+
+            if last:
+                return []
+
+            # feed the tool outputs back, along with the output items they answer
+            items += [output.model_dump(exclude_none=True) for output in res.output]
+            items += [
+                {'type': 'function_call_output', 'call_id': call.call_id, 'output': json.dumps(result, default=str)}
+                for call, result in zip(calls, results)
+            ]
+
+        return []
 
     # ==== Structured Completions ====
 
@@ -126,14 +516,23 @@ class OpenAIModel(BaseChatModel):
             **kwargs
     ) -> BaseModel | None:
         try:
-            return self.client.responses.parse(
+            # ``responses.parse`` would convert ``text_format`` to a JSON schema on every request
+            res = _parse(self.sync_client.responses.with_raw_response.create(
                 input=input,
                 model=self.model,
-                text_format=text_format,
+                text={'format': text_format_param(text_format)},
                 timeout=self.timeout,
                 **kwargs
-            ).output_parsed
-        except:
+            ))
+            _record_usage(res)
+
+            return text_format.model_validate_json(res.output_text)
+        except Exception as exc:
+            # transient errors are raised to be retried, e.g. by ``RateLimitedChatModel``
+            if self.is_retryable(exc):
+                raise
+
+            record_parse_failure()
             return
 
     async def acreate_structured_completion(
@@ -143,14 +542,72 @@ class OpenAIModel(BaseChatModel):
             **kwargs
     ) -> BaseModel | None:
         try:
-            res = await self.client.responses.parse(
+            res = await _aparse(self.async_client.responses.with_raw_response.create(
                 input=input,
                 model=self.model,
-                text_format=text_format,
+                text={'format': text_format_param(text_format)},
                 timeout=self.timeout,
                 **kwargs
-            )
+            ))
+            _record_usage(res)
+
+            return text_format.model_validate_json(res.output_text)
+        except Exception as exc:
+            if self.is_retryable(exc):
+                raise
 
-            return res.output_parsed
-        except:
+            record_parse_failure()
             return
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        try:
+            res = _parse(self.sync_client.chat.completions.with_raw_response.create(
+                messages=input,
+                model=self.model,
+                response_format=response_format_param(text_format),
+                n=n,
+                timeout=self.timeout,
+                **kwargs
+            ))
+        except Exception as exc:
+            if self.is_retryable(exc):
+                raise
+
+            record_parse_failure()
+            return [None] * n
+
+        _record_chat_usage(res)
+        return _parse_choices(res, text_format)
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        # the Responses API returns a single output, Chat Completions return ``n`` choices of one request
+        try:
+            res = await _aparse(self.async_client.chat.completions.with_raw_response.create(
+                messages=input,
+                model=self.model,
+                response_format=response_format_param(text_format),
+                n=n,
+                timeout=self.timeout,
+                **kwargs
+            ))
+        except Exception as exc:
+            if self.is_retryable(exc):
+                raise
+
+            record_parse_failure()
+            return [None] * n
+
+        _record_chat_usage(res)
+        return _parse_choices(res, text_format)
@@ -0,0 +1,418 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Mapping, Type
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel, run_turn
+from .tokens import estimate_input_tokens
+from .types import Message, Tool, TurnCall
+from .usage import record_retry
+
+
+def parse_duration(value: str) -> float | None:
+    """
+    Parses a duration from rate limit headers into seconds.
+    Supports plain seconds (``'1.5'``) and the compound format used by OpenAI (``'6m0s'``, ``'20ms'``).
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {'h': 3600., 'm': 60., 's': 1., 'ms': .001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+
+    Acquisitions are reservations: the bucket may go into debt, and the caller waits the returned delay.
+    That keeps the waiting callers in FIFO order and allows the same bucket to be shared by sync and async code.
+
+    :param rate: Refill rate in tokens per second.
+    :param capacity: Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes ``amount`` tokens and returns the delay in seconds the caller should wait before proceeding.
+        Amounts above ``capacity`` are charged in full, the bucket goes into debt for the following callers.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.
+
+            return -self._tokens / self.rate
+
+    def limit(self, tokens: float) -> None:
+        """Caps the available tokens, e.g. to the remaining budget reported by the provider."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket, so the next acquisition waits at least ``seconds``."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+
+class RateLimiter:
+    """
+    Enforces requests-per-minute and tokens-per-minute limits with two token buckets.
+
+    The rate adapts with AIMD: it is multiplied by ``decrease_factor`` on every rate limit response
+    and increases additively by ``increase_step`` of the configured rate on every successful call.
+    Rate limit headers (``retry-after``, ``x-ratelimit-remaining-*``, ``x-ratelimit-reset-*``) of rate limit
+    responses and of successful responses (see ``record_rate_limit_headers``) cap the buckets to the remaining
+    budget of the provider, and pause them until the provider resets its limits once it is exhausted.
+    One limiter can be shared by several models to enforce a common budget.
+
+    :param rpm: Requests per minute. If ``None``, requests are not limited.
+    :param tpm: Tokens per minute. If ``None``, tokens are not limited.
+    :param decrease_factor: Multiplier applied to the rate after a rate limit response.
+    :param increase_step: Fraction of the configured rate restored after a successful call.
+    :param min_fraction: The rate never drops below this fraction of the configured rate.
+    """
+
+    def __init__(
+            self,
+            rpm: float | None = None,
+            tpm: float | None = None,
+            decrease_factor: float = .5,
+            increase_step: float = .05,
+            min_fraction: float = .05
+    ):
+        self.requests = TokenBucket(rate=rpm / 60, capacity=max(1., rpm / 60)) if rpm else None
+        self.tokens = TokenBucket(rate=tpm / 60, capacity=max(1., tpm / 60)) if tpm else None
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_fraction = min_fraction
+
+    @property
+    def _buckets(self) -> list[TokenBucket]:
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserves one request and ``tokens`` tokens, returns the delay in seconds before the call can be made."""
+        delay = self.requests.reserve(1) if self.requests else 0.
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+
+        return delay
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if delay := self.reserve(tokens):
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, tokens: int = 0) -> None:
+        if delay := self.reserve(tokens):
+            time.sleep(delay)
+
+    def on_success(self) -> None:
+        for bucket in self._buckets:
+            if bucket.rate < bucket.max_rate:
+                bucket.set_rate(min(bucket.max_rate, bucket.rate + bucket.max_rate * self.increase_step))
+
+    def on_rate_limit(self, headers: Mapping[str, str] | None = None) -> None:
+        for bucket in self._buckets:
+            bucket.set_rate(max(bucket.max_rate * self.min_fraction, bucket.rate * self.decrease_factor))
+
+        self.update_from_headers(headers or {})
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Caps or pauses the buckets according to the rate limit headers of a provider response."""
+        if retry_after := retry_after_from_headers(headers):
+            for bucket in self._buckets:
+                bucket.pause(retry_after)
+
+        for name, bucket in (('requests', self.requests), ('tokens', self.tokens)):
+            remaining = headers.get(f'x-ratelimit-remaining-{name}')
+            reset = headers.get(f'x-ratelimit-reset-{name}')
+            if bucket is None or remaining is None or reset is None:
+                continue
+
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+
+            if remaining > 0:
+                bucket.limit(remaining)
+            elif seconds := parse_duration(reset):
+                bucket.pause(seconds)
+
+
+def retry_after_from_headers(headers: Mapping[str, str]) -> float | None:
+    if (value := headers.get('retry-after-ms')) is not None:
+        if (seconds := parse_duration(value)) is not None:
+            return seconds / 1000
+
+    if (value := headers.get('retry-after')) is not None:
+        return parse_duration(value)
+
+    return None
+
+
+# limiters of the ``RateLimitedChatModel`` calls in progress in the current context
+_limiters: ContextVar[tuple[RateLimiter, ...]] = ContextVar('asgm_rate_limiters', default=())
+
+
+@contextmanager
+def _receive_headers(limiter: RateLimiter) -> Iterator[None]:
+    """Passes the rate limit headers recorded within the context to ``limiter``."""
+    token = _limiters.set(_limiters.get() + (limiter,))
+    try:
+        yield
+    finally:
+        _limiters.reset(token)
+
+
+def record_rate_limit_headers(headers: Mapping[str, str]) -> None:
+    """
+    Records the headers of a successful response, so the limiters of the calls in progress slow down before
+    the provider rejects requests. Intended to be called by ``BaseChatModel`` implementations.
+    """
+    for limiter in _limiters.get():
+        limiter.update_from_headers(headers)
+
+
+def _error_headers(exc: Exception) -> Mapping[str, str]:
+    """Returns response headers of a provider error (e.g. ``openai.RateLimitError``) if it has any."""
+    return getattr(getattr(exc, 'response', None), 'headers', None) or {}
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    A wrapper around any ``BaseChatModel`` that enforces rate limits and retries transient errors.
+
+    Every call, and every turn of a tool loop, acquires the ``RateLimiter`` first, and passes it the rate limit headers
+    of its response if the model records them (e.g. ``OpenAIModel``). Errors classified as transient
+    by ``model.is_retryable`` are retried with full-jitter exponential backoff, honouring ``retry-after`` headers
+    of rate limit responses.
+    Once ``max_retries`` is exhausted the error is raised, so rate limits never turn into failed verdicts.
+
+    :param model: The wrapped model.
+    :param rpm: Requests per minute, ignored if ``limiter`` is provided.
+    :param tpm: Tokens per minute, ignored if ``limiter`` is provided. Tokens are estimated from the input messages
+        and the ``max_output_tokens`` keyword argument.
+    :param limiter: An existing limiter to share the budget with other models.
+    :param max_retries: Maximum number of retries per call.
+    :param base_delay: Backoff delay of the first retry in seconds, doubled on every retry.
+    :param max_delay: Upper bound of the backoff delay in seconds.
+    """
+
+    def __init__(
+            self,
+            model: BaseChatModel,
+            rpm: float | None = None,
+            tpm: float | None = None,
+            limiter: RateLimiter | None = None,
+            max_retries: int = 5,
+            base_delay: float = .5,
+            max_delay: float = 60
+    ):
+        self.model = model
+        self.limiter = limiter if limiter is not None else RateLimiter(rpm=rpm, tpm=tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.model.is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        self.model.compile_format(text_format)
+
+    def _backoff(self, exc: Exception, attempt: int) -> float:
+        """Updates the limiter after a failed call and returns the delay before the next attempt."""
+        self.retries += 1
+        record_retry()
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+        if getattr(exc, 'status_code', None) == 429:
+            headers = _error_headers(exc)
+            self.limiter.on_rate_limit(headers)
+            delay = max(delay, retry_after_from_headers(headers) or 0.)
+
+        return delay
+
+    @staticmethod
+    def _tokens(input: list[Message], **kwargs) -> int:
+        return estimate_input_tokens(input) + kwargs.get('max_output_tokens', 0)
+
+    async def _acall(self, tokens: int, call: Callable[[], Awaitable[Any]]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            try:
+                with _receive_headers(self.limiter):
+                    res = await call()
+            except Exception as exc:
+                if attempt == self.max_retries or not self.is_retryable(exc):
+                    raise
+
+                await asyncio.sleep(self._backoff(exc, attempt))
+            else:
+                self.limiter.on_success()
+                return res
+
+    def _call(self, tokens: int, call: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire_sync(tokens)
+            try:
+                with _receive_headers(self.limiter):
+                    res = call()
+            except Exception as exc:
+                if attempt == self.max_retries or not self.is_retryable(exc):
+                    raise
+
+                time.sleep(self._backoff(exc, attempt))
+            else:
+                self.limiter.on_success()
+                return res
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return self._call(
+            self._tokens(input, **kwargs),
+            lambda: self.model.create_completion(input=input, **kwargs)
+        )
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return await self._acall(
+            self._tokens(input, **kwargs),
+            lambda: self.model.acreate_completion(input=input, **kwargs)
+        )
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return self._call(
+            self._tokens(input, **kwargs),
+            lambda: self.model.create_tool_completion(input=input, tools=tools, **kwargs)
+        )
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return await self._acall(
+            self._tokens(input, **kwargs),
+            lambda: self.model.acreate_tool_completion(input=input, tools=tools, **kwargs)
+        )
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        async def _call_turn(turn_input: list[Message], call: Callable[[], Awaitable[Any]]) -> Any:
+            # every turn acquires its own budget, and a retry only repeats the failed turn
+            return await self._acall(
+                self._tokens(turn_input, **kwargs),
+                lambda: run_turn(call_turn, turn_input, call)
+            )
+
+        return await self.model.arun_tool_loop(
+            input=input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, call_turn=_call_turn, **kwargs
+        )
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return self._call(
+            self._tokens(input, **kwargs),
+            lambda: self.model.create_structured_completion(input=input, text_format=text_format, **kwargs)
+        )
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return await self._acall(
+            self._tokens(input, **kwargs),
+            lambda: self.model.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+        )
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        return self._call(
+            self._tokens(input, **kwargs),
+            lambda: self.model.create_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+        )
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        return await self._acall(
+            self._tokens(input, **kwargs),
+            lambda: self.model.acreate_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+        )
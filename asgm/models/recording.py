@@ -0,0 +1,467 @@
+import asyncio
+import hashlib
+import inspect
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Literal, Type
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel
+from .hashing import model_name
+from .tools import ToolKit
+from .types import Message, Tool, TurnCall
+from .usage import record_parse_failure, record_usage, track_usage
+
+Kind = Literal['completion', 'tool', 'structured', 'samples']
+
+
+class Recording(BaseModel):
+    """
+    A model call saved by ``RecordingChatModel``.
+
+    ``format`` is the name of the output format of structured calls, or the sorted tool names of tool calls.
+    ``calls`` holds the ``(name, arguments)`` tool calls made by the model, ``output`` the returned value
+    (tool results, or the JSON dump of structured outputs, ``None`` for parse failures).
+    ``latency`` is the wall time of the call in seconds.
+    """
+    kind: Kind
+    model: str
+    format: str | None = None
+    input: list[dict]
+    output: Any = None
+    calls: list[tuple[str, dict]] = []
+    latency: float
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def key(self) -> str:
+        return match_key(self.kind, self.format, self.input)
+
+
+def match_key(kind: Kind, format: str | None, input: list) -> str:
+    """
+    Returns the key matching a request to its recordings: the kind of call, the output format or tools
+    and the messages. Other arguments (e.g. ``temperature``) are not part of the key.
+    """
+    dump = json.dumps([kind, format, input], sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def tools_format(names: Iterable[str]) -> str:
+    return ','.join(sorted(names))
+
+
+def load_recordings(path: str | Path) -> list[Recording]:
+    """Returns the recordings of a JSONL file written by ``RecordingChatModel``."""
+    with open(path, encoding='utf-8') as file:
+        return [Recording.model_validate_json(line) for line in file if line.strip()]
+
+
+class RecordingIndex:
+    """
+    Looks up recordings by request.
+
+    A request matching no recording exactly is served, if ``strict`` is False, by the recordings of the same kind
+    and format in turn, so a load test can evaluate new content with the outputs and latencies of a recorded run.
+    Identical requests recorded several times are also served in turn.
+
+    :param recordings: The recordings.
+    :param strict: If True, requests without an exact match raise ``KeyError``.
+    """
+
+    def __init__(self, recordings: Iterable[Recording], strict: bool = False):
+        self.strict = strict
+        self._exact: dict[str, list[Recording]] = {}
+        self._similar: dict[tuple[Kind, str | None], list[Recording]] = {}
+        for recording in recordings:
+            self._exact.setdefault(recording.key, []).append(recording)
+            self._similar.setdefault((recording.kind, recording.format), []).append(recording)
+
+        self._turns: dict[Any, Iterator[int]] = {}
+        self._lock = threading.Lock()
+
+    def _next(self, key: Any, recordings: list[Recording]) -> Recording:
+        with self._lock:
+            turns = self._turns.setdefault(key, itertools.count())
+            return recordings[next(turns) % len(recordings)]
+
+    def lookup(self, kind: Kind, format: str | None, input: list) -> Recording:
+        key = match_key(kind, format, input)
+        if key in self._exact:
+            return self._next(key, self._exact[key])
+
+        if not self.strict and (kind, format) in self._similar:
+            return self._next((kind, format), self._similar[(kind, format)])
+
+        raise KeyError(f'No recording of a {kind} call with format {format!r}.')
+
+
+# ==== Recording ====
+
+class RecordingChatModel(BaseChatModel):
+    """
+    A wrapper around any ``BaseChatModel`` saving every call with its output, latency and usage,
+    to be served again by ``ReplayChatModel`` or ``ReplayServer``.
+
+    Recordings are appended to ``self.recordings`` and, if ``path`` is provided, to a JSONL file.
+    Failed calls are not recorded.
+    Tool calls are captured by wrapping the tool functions, so ``ToolKit`` tool results are not shared
+    across calls while recording.
+
+    :param model: The recorded model.
+    :param path: Path to the JSONL file recordings are appended to.
+    """
+
+    def __init__(self, model: BaseChatModel, path: str | Path | None = None):
+        self.model = model
+        self.path = Path(path) if path is not None else None
+        self.recordings: list[Recording] = []
+        self._lock = threading.Lock()
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.model.is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        self.model.compile_format(text_format)
+
+    def _save(self, recording: Recording) -> None:
+        with self._lock:
+            self.recordings.append(recording)
+            if self.path is not None:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.write(recording.model_dump_json() + '\n')
+
+    @contextmanager
+    def _record(self, kind: Kind, format: str | None, input: list[Message]) -> Iterator[dict]:
+        """Measures the call made within the context and saves it with the ``output`` and ``calls`` it sets."""
+        call = {'output': None, 'calls': []}
+        start = time.perf_counter()
+        with track_usage() as usage:
+            yield call
+
+        self._save(
+            Recording(
+                kind=kind,
+                model=model_name(self.model),
+                format=format,
+                input=list(input),
+                latency=time.perf_counter() - start,
+                input_tokens=usage.input_tokens,
+                cached_tokens=usage.cached_tokens,
+                output_tokens=usage.output_tokens,
+                **call
+            )
+        )
+
+    @staticmethod
+    def _capture(tools: list[Tool], calls: list[tuple[str, dict]]) -> list[Tool]:
+        """Returns ``tools`` with functions appending their ``(name, arguments)`` to ``calls``."""
+
+        def wrap(tool: Tool) -> Tool:
+            func = tool['func']
+            if inspect.iscoroutinefunction(func):
+                async def captured(**arguments):
+                    calls.append((tool['name'], arguments))
+                    return await func(**arguments)
+            else:
+                def captured(**arguments):
+                    calls.append((tool['name'], arguments))
+                    return func(**arguments)
+
+            return Tool(**{**tool, 'func': captured})
+
+        if isinstance(tools, ToolKit):
+            return ToolKit(
+                [wrap(tool) for tool in tools],
+                executor=tools.executor,
+                timeout=tools.timeout,
+                max_concurrency=tools.max_concurrency
+            )
+
+        return [wrap(tool) for tool in tools]
+
+    @staticmethod
+    def _dump(res: BaseModel | None) -> dict | None:
+        return res.model_dump(mode='json') if res is not None else None
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        with self._record('completion', None, input) as call:
+            call['output'] = self.model.create_completion(input=input, **kwargs)
+
+        return call['output']
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        with self._record('completion', None, input) as call:
+            call['output'] = await self.model.acreate_completion(input=input, **kwargs)
+
+        return call['output']
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        with self._record('tool', tools_format(tool['name'] for tool in tools), input) as call:
+            call['output'] = self.model.create_tool_completion(
+                input=input,
+                tools=self._capture(tools, call['calls']),
+                **kwargs
+            )
+
+        return call['output']
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        with self._record('tool', tools_format(tool['name'] for tool in tools), input) as call:
+            call['output'] = await self.model.acreate_tool_completion(
+                input=input,
+                tools=self._capture(tools, call['calls']),
+                **kwargs
+            )
+
+        return call['output']
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        # the loop is saved as a single call, with the tool calls of all turns
+        with self._record('tool', tools_format(tool['name'] for tool in tools), input) as call:
+            call['output'] = await self.model.arun_tool_loop(
+                input=input,
+                tools=self._capture(tools, call['calls']),
+                max_turns=max_turns,
+                max_tokens=max_tokens,
+                call_turn=call_turn,
+                **kwargs
+            )
+
+        return call['output']
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        with self._record('structured', text_format.__name__, input) as call:
+            res = self.model.create_structured_completion(input=input, text_format=text_format, **kwargs)
+            call['output'] = self._dump(res)
+
+        return res
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        with self._record('structured', text_format.__name__, input) as call:
+            res = await self.model.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+            call['output'] = self._dump(res)
+
+        return res
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        with self._record('samples', text_format.__name__, input) as call:
+            res = self.model.create_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+            call['output'] = [self._dump(item) for item in res]
+
+        return res
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        with self._record('samples', text_format.__name__, input) as call:
+            res = await self.model.acreate_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+            call['output'] = [self._dump(item) for item in res]
+
+        return res
+
+
+# ==== Replay ====
+
+class ReplayChatModel(BaseChatModel):
+    """
+    A ``BaseChatModel`` serving recordings of ``RecordingChatModel`` without calling a provider.
+
+    Every call waits for the recorded latency (multiplied by ``latency_scale``) and records the recorded usage,
+    so graphs, wrappers and instruments behave as in the recorded run. Requests are matched by ``RecordingIndex``.
+    Tool calls return the recorded tool results, tools are not called.
+
+    :param recordings: Recordings, or the path to a JSONL file of recordings.
+    :param strict: If True, requests without an exact match raise ``KeyError``, see ``RecordingIndex``.
+    :param latency_scale: Factor of the recorded latencies, 0 serves recordings immediately.
+    """
+
+    def __init__(
+            self,
+            recordings: Iterable[Recording] | str | Path,
+            strict: bool = False,
+            latency_scale: float = 1
+    ):
+        if isinstance(recordings, (str, Path)):
+            recordings = load_recordings(recordings)
+
+        recordings = list(recordings)
+        self.model = recordings[0].model if recordings else 'replay'
+        self.index = RecordingIndex(recordings, strict=strict)
+        self.latency_scale = latency_scale
+
+    def _replay(self, recording: Recording) -> None:
+        record_usage(
+            input_tokens=recording.input_tokens,
+            cached_tokens=recording.cached_tokens,
+            output_tokens=recording.output_tokens
+        )
+
+    @staticmethod
+    def _load(output: dict | None, text_format: Type[BaseModel]) -> BaseModel | None:
+        if output is None:
+            record_parse_failure()
+            return None
+
+        return text_format.model_validate(output)
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        recording = self.index.lookup('completion', None, input)
+        time.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return recording.output
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        recording = self.index.lookup('completion', None, input)
+        await asyncio.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return recording.output
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        recording = self.index.lookup('tool', tools_format(tool['name'] for tool in tools), input)
+        time.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return list(recording.output)
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        recording = self.index.lookup('tool', tools_format(tool['name'] for tool in tools), input)
+        await asyncio.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return list(recording.output)
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        recording = self.index.lookup('structured', text_format.__name__, input)
+        time.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return self._load(recording.output, text_format)
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        recording = self.index.lookup('structured', text_format.__name__, input)
+        await asyncio.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return self._load(recording.output, text_format)
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        recording = self.index.lookup('samples', text_format.__name__, input)
+        time.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return [self._load(recording.output[i % len(recording.output)], text_format) for i in range(n)]
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        recording = self.index.lookup('samples', text_format.__name__, input)
+        await asyncio.sleep(recording.latency * self.latency_scale)
+        self._replay(recording)
+
+        return [self._load(recording.output[i % len(recording.output)], text_format) for i in range(n)]
@@ -0,0 +1,294 @@
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterable
+
+from .recording import Recording, RecordingIndex, load_recordings, tools_format
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 resets connections of load tests opening many connections at once
+    request_queue_size = 1024
+
+
+class ReplayServer:
+    """
+    A local HTTP server speaking the subset of the OpenAI API used by ``OpenAIModel``, serving recordings
+    of ``RecordingChatModel`` with their recorded latency and usage.
+
+    Unlike ``ReplayChatModel``, requests go through the real client stack (HTTP connections, client pools,
+    retries, rate limit wrappers), so load tests measure the whole pipeline without a provider:
+
+        with ReplayServer('recordings.jsonl') as server:
+            model = OpenAIModel(model='gpt-4.1-mini', base_url=server.url, api_key='replay')
+
+    ``POST /v1/responses`` serves completions, tool completions (the recorded tool calls, run by the client)
+    and structured completions. ``POST /v1/chat/completions`` serves structured samples. Requests without
+    a recording get a 404 response. ``GET /stats`` returns the request counters, ``GET /stats?reset=1``
+    also starts a new ``max_in_flight`` peak.
+
+    Run it in its own process for load tests, so the server does not compete with the client for the GIL:
+
+        python -m asgm.models.replay_server recordings.jsonl --port 8000
+
+    :param recordings: Recordings, or the path to a JSONL file of recordings.
+    :param strict: If True, requests without an exact match are not served, see ``RecordingIndex``.
+    :param latency_scale: Factor of the recorded latencies, 0 serves recordings immediately.
+    :param host: Host to listen on.
+    :param port: Port to listen on, 0 picks a free port.
+    """
+
+    def __init__(
+            self,
+            recordings: Iterable[Recording] | str | Path,
+            strict: bool = False,
+            latency_scale: float = 1,
+            host: str = '127.0.0.1',
+            port: int = 0
+    ):
+        if isinstance(recordings, (str, Path)):
+            recordings = load_recordings(recordings)
+
+        self.index = RecordingIndex(recordings, strict=strict)
+        self.latency_scale = latency_scale
+        self.host = host
+        self.port = port
+        self.server: ThreadingHTTPServer | None = None
+
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, to pass to ``OpenAIModel`` as ``base_url``."""
+        return f'http://{self.host}:{self.port}/v1'
+
+    def start(self) -> str:
+        """Serves requests from a daemon thread, returns the base URL."""
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keeps connections alive, so client connection pooling is exercised
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, Nagle's algorithm would delay the body
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, response = replay.handle(self.path, json.loads(body or b'{}'))
+
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                if path.rstrip('/') != '/stats':
+                    self.send_error(404)
+                    return
+
+                data = json.dumps(replay.stats(reset='reset=1' in query)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _Server((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return self.url
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self) -> 'ReplayServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def stats(self, reset: bool = False) -> dict[str, int]:
+        """
+        Returns the number of requests served, in flight and the most in flight at once.
+
+        :param reset: If True, starts a new ``max_in_flight`` peak, e.g. between load test runs.
+        """
+        with self._lock:
+            stats = {'requests': self.requests, 'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight}
+            if reset:
+                self.max_in_flight = self.in_flight
+
+        return stats
+
+    # ==== Requests ====
+
+    def handle(self, path: str, payload: dict) -> tuple[int, dict]:
+        """Returns the status and body of the response to a request, after the recorded latency."""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            path = path.rstrip('/')
+            if path.endswith('/responses'):
+                recording, response = self._responses_request(payload)
+            elif path.endswith('/chat/completions'):
+                recording, response = self._chat_request(payload)
+            else:
+                return 404, _error(f'Unknown endpoint {path}.')
+
+            time.sleep(recording.latency * self.latency_scale)
+            return 200, response
+        except KeyError as exc:
+            return 404, _error(str(exc))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _id(self, prefix: str) -> str:
+        return f'{prefix}_{next(self._ids)}'
+
+    def _responses_request(self, payload: dict) -> tuple[Recording, dict]:
+        input = payload.get('input', [])
+        if isinstance(input, str):
+            input = [{'role': 'user', 'content': input}]
+
+        text_format = (payload.get('text') or {}).get('format') or {}
+        if payload.get('tools'):
+            recording = self.index.lookup('tool', tools_format(tool['name'] for tool in payload['tools']), input)
+            # the client runs the recorded tool calls
+            output = [
+                {
+                    'type': 'function_call',
+                    'id': self._id('fc'),
+                    'call_id': self._id('call'),
+                    'name': name,
+                    'arguments': json.dumps(arguments),
+                    'status': 'completed',
+                }
+                for name, arguments in recording.calls
+            ]
+        elif text_format.get('type') == 'json_schema':
+            recording = self.index.lookup('structured', text_format['name'], input)
+            # a parse failure is replayed as an output that does not validate
+            output = [self._message(json.dumps(recording.output) if recording.output is not None else '')]
+        else:
+            recording = self.index.lookup('completion', None, input)
+            output = [self._message(recording.output)]
+
+        return recording, self._response(payload, recording, output)
+
+    def _chat_request(self, payload: dict) -> tuple[Recording, dict]:
+        name = payload['response_format']['json_schema']['name']
+        recording = self.index.lookup('samples', name, payload['messages'])
+        outputs = recording.output or [None]
+
+        return recording, {
+            'id': self._id('chatcmpl'),
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', recording.model),
+            'choices': [
+                {
+                    'index': i,
+                    'message': {
+                        'role': 'assistant',
+                        'content': json.dumps(output) if (output := outputs[i % len(outputs)]) is not None else '',
+                        'refusal': None,
+                    },
+                    'finish_reason': 'stop',
+                    'logprobs': None,
+                }
+                for i in range(payload.get('n') or 1)
+            ],
+            'usage': {
+                'prompt_tokens': recording.input_tokens,
+                'completion_tokens': recording.output_tokens,
+                'total_tokens': recording.input_tokens + recording.output_tokens,
+                'prompt_tokens_details': {'cached_tokens': recording.cached_tokens},
+            },
+        }
+
+    def _message(self, text: str) -> dict:
+        return {
+            'type': 'message',
+            'id': self._id('msg'),
+            'role': 'assistant',
+            'status': 'completed',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+        }
+
+    def _response(self, payload: dict, recording: Recording, output: list[dict]) -> dict:
+        return {
+            'id': self._id('resp'),
+            'object': 'response',
+            'created_at': int(time.time()),
+            'model': payload.get('model', recording.model),
+            'status': 'completed',
+            'output': output,
+            'parallel_tool_calls': True,
+            'tool_choice': payload.get('tool_choice', 'auto'),
+            'tools': payload.get('tools', []),
+            'usage': {
+                'input_tokens': recording.input_tokens,
+                'input_tokens_details': {'cached_tokens': recording.cached_tokens},
+                'output_tokens': recording.output_tokens,
+                'output_tokens_details': {'reasoning_tokens': 0},
+                'total_tokens': recording.input_tokens + recording.output_tokens,
+            },
+        }
+
+
+def _error(message: str) -> dict:
+    return {'error': {'message': message, 'type': 'invalid_request_error', 'param': None, 'code': None}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serves recordings of RecordingChatModel over the OpenAI API.')
+    parser.add_argument('recordings', type=Path, help='JSONL file written by RecordingChatModel.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help='0 picks a free port.')
+    parser.add_argument('--latency-scale', type=float, default=1, help='Factor of the recorded latencies.')
+    parser.add_argument('--strict', action='store_true', help='Serve exact matches only.')
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        args.recordings,
+        strict=args.strict,
+        latency_scale=args.latency_scale,
+        host=args.host,
+        port=args.port
+    )
+    # the first line of the output is the base URL, e.g. for scripts starting the server
+    print(server.start(), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+from collections import Counter
+from typing import Any, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from .base_model import BaseChatModel
+from .hashing import model_name
+from .types import Message, Tool, TurnCall
+
+CONFIDENCE_PROMPT = """Additionally, provide your confidence that your answer is correct in the `confidence` field,
+as a number between 0 (a guess) and 1 (certain)."""
+
+
+class CascadeChatModel(BaseChatModel):
+    """
+    A ``BaseChatModel`` routing structured completions to a ``cheap`` model first,
+    and escalating them to a ``strong`` model on low confidence.
+
+    The cheap model answers an extended ``text_format`` with a self-reported ``confidence`` field. The request is
+    escalated if the confidence is below the route threshold or the response could not be parsed. Otherwise,
+    the cheap response is returned as the original ``text_format``, so nodes are unaware of the routing.
+    Structured samples are routed per sample, escalated samples are drawn from the strong model in one request.
+    Plain and tool completions (including tool loops) carry no confidence signal and are served by the strong model.
+
+    Routes are keyed by node classes (e.g. ``AsyncBinaryNode``) or output formats:
+
+        CascadeChatModel(cheap, strong, routes={AsyncBinaryNode: .6, AsyncNonBinaryNode: .9})
+
+    :param cheap: The model called first.
+    :param strong: The model called on escalation.
+    :param threshold: Minimum confidence of cheap responses of output formats without a route.
+    :param routes: Per node type thresholds. A threshold of ``None`` sends requests to the strong model directly,
+        a threshold of 0 keeps every parsed cheap response.
+    """
+
+    def __init__(
+            self,
+            cheap: BaseChatModel,
+            strong: BaseChatModel,
+            threshold: float = .7,
+            routes: dict[type, float | None] | None = None
+    ):
+        self.cheap = cheap
+        self.strong = strong
+        self.model = f'cascade({model_name(cheap)}, {model_name(strong)})'
+        self.threshold = threshold
+        self.routes = {
+            getattr(key, 'OutputFormat', key): value
+            for key, value in (routes or {}).items()
+        }
+        self.calls: Counter[str] = Counter()
+        self.escalations: Counter[str] = Counter()
+        self._formats: dict[Type[BaseModel], Type[BaseModel]] = {}
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.cheap.is_retryable(exc) or self.strong.is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        self.cheap.compile_format(self._confidence_format(text_format))
+        self.strong.compile_format(text_format)
+
+    def escalation_rate(self, text_format: Type[BaseModel] | str | None = None) -> float:
+        """Returns the share of escalated structured completions, overall or of a single output format."""
+        if text_format is None:
+            calls, escalations = self.calls.total(), self.escalations.total()
+        else:
+            name = text_format if isinstance(text_format, str) else text_format.__qualname__
+            calls, escalations = self.calls[name], self.escalations[name]
+
+        return escalations / calls if calls else 0.
+
+    def _threshold(self, text_format: Type[BaseModel]) -> float | None:
+        return self.routes.get(text_format, self.threshold)
+
+    def _confidence_format(self, text_format: Type[BaseModel]) -> Type[BaseModel]:
+        """Returns ``text_format`` extended with a ``confidence`` field, created once per output format."""
+        if text_format not in self._formats:
+            self._formats[text_format] = create_model(
+                text_format.__name__,
+                __base__=text_format,
+                confidence=(float, Field(ge=0, le=1))
+            )
+
+        return self._formats[text_format]
+
+    def _cheap_request(self, input: list[Message], text_format: Type[BaseModel]) -> dict[str, Any]:
+        return {
+            'input': [*input, Message(role='developer', content=CONFIDENCE_PROMPT)],
+            'text_format': self._confidence_format(text_format),
+        }
+
+    def _accept(self, res: BaseModel | None, text_format: Type[BaseModel], threshold: float) -> BaseModel | None:
+        """Returns the cheap response as ``text_format`` if it is confident enough, otherwise counts an escalation."""
+        if res is not None and res.confidence >= threshold:
+            return text_format.model_validate(res.model_dump(exclude={'confidence'}))
+
+        self.escalations[text_format.__qualname__] += 1
+        return None
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return self.strong.create_completion(input=input, **kwargs)
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return await self.strong.acreate_completion(input=input, **kwargs)
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return self.strong.create_tool_completion(input=input, tools=tools, **kwargs)
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return await self.strong.acreate_tool_completion(input=input, tools=tools, **kwargs)
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        return await self.strong.arun_tool_loop(
+            input=input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, call_turn=call_turn, **kwargs
+        )
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        self.calls[text_format.__qualname__] += 1
+        if (threshold := self._threshold(text_format)) is not None:
+            res = self.cheap.create_structured_completion(**self._cheap_request(input, text_format), **kwargs)
+            if (res := self._accept(res, text_format, threshold)) is not None:
+                return res
+        else:
+            self.escalations[text_format.__qualname__] += 1
+
+        return self.strong.create_structured_completion(input=input, text_format=text_format, **kwargs)
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        self.calls[text_format.__qualname__] += 1
+        if (threshold := self._threshold(text_format)) is not None:
+            res = await self.cheap.acreate_structured_completion(**self._cheap_request(input, text_format), **kwargs)
+            if (res := self._accept(res, text_format, threshold)) is not None:
+                return res
+        else:
+            self.escalations[text_format.__qualname__] += 1
+
+        return await self.strong.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+
+    def _merge_samples(
+            self,
+            samples: list[BaseModel | None],
+            escalated: list[BaseModel | None]
+    ) -> list[BaseModel | None]:
+        """Fills the rejected cheap ``samples`` (``None``) with the ``escalated`` strong samples."""
+        escalated = iter(escalated)
+        return [sample if sample is not None else next(escalated, None) for sample in samples]
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        self.calls[text_format.__qualname__] += n
+        if (threshold := self._threshold(text_format)) is None:
+            self.escalations[text_format.__qualname__] += n
+            return self.strong.create_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+
+        samples = [
+            self._accept(res, text_format, threshold)
+            for res in self.cheap.create_structured_samples(**self._cheap_request(input, text_format), n=n, **kwargs)
+        ]
+        if missing := samples.count(None):
+            escalated = self.strong.create_structured_samples(input=input, text_format=text_format, n=missing, **kwargs)
+            samples = self._merge_samples(samples, escalated)
+
+        return samples
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        self.calls[text_format.__qualname__] += n
+        if (threshold := self._threshold(text_format)) is None:
+            self.escalations[text_format.__qualname__] += n
+            return await self.strong.acreate_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+
+        samples = [
+            self._accept(res, text_format, threshold)
+            for res in await self.cheap.acreate_structured_samples(
+                **self._cheap_request(input, text_format), n=n, **kwargs
+            )
+        ]
+        if missing := samples.count(None):
+            escalated = await self.strong.acreate_structured_samples(
+                input=input, text_format=text_format, n=missing, **kwargs
+            )
+            samples = self._merge_samples(samples, escalated)
+
+        return samples
@@ -0,0 +1,214 @@
+import asyncio
+import random
+import threading
+import time
+import types
+import typing
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Type
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel
+from .tokens import estimate_input_tokens
+from .types import Message, Tool
+from .usage import record_usage
+
+
+# ==== Latency distributions ====
+
+def constant(seconds: float) -> Callable[[random.Random], float]:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Callable[[random.Random], float]:
+    return lambda rng: rng.uniform(low, high)
+
+
+def exponential(mean: float) -> Callable[[random.Random], float]:
+    return lambda rng: rng.expovariate(1 / mean)
+
+
+def lognormal(median: float, sigma: float = .5) -> Callable[[random.Random], float]:
+    """A long-tailed distribution, close to the latency profile of LLM providers."""
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+# ==== Errors ====
+
+class SimulatedRateLimitError(Exception):
+    """Mimics a provider 429 response, including its ``retry-after`` header."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__('Simulated rate limit.')
+        self.response = types.SimpleNamespace(headers={'retry-after': str(retry_after)})
+
+
+class SimulatedServerError(Exception):
+    status_code = 500
+
+
+# ==== Model ====
+
+class SimulatedChatModel(BaseChatModel):
+    """
+    A ``BaseChatModel`` simulating a remote provider, intended for benchmarks and load tests.
+
+    Unlike ``FakeChatModel``, every call takes time drawn from ``latency``, may fail and is subject to a
+    provider-side concurrency limit, so scheduling and overhead issues of graphs become measurable.
+    Structured outputs are synthesized from the field types of ``text_format`` unless ``outputs`` are provided.
+
+    :param latency: A latency distribution in seconds, e.g. ``lognormal(.5)``.
+    :param error_rate: Probability of a call failing with ``SimulatedServerError``.
+    :param rate_limit_rate: Probability of a call failing with ``SimulatedRateLimitError``.
+    :param max_concurrency: Calls above this number of concurrent calls fail with ``SimulatedRateLimitError``.
+    :param pass_rate: Probability of a synthesized boolean field being True.
+    :param retry_after: The ``retry-after`` value of simulated rate limit errors.
+    :param seed: Seed of the random generator, for reproducible runs.
+    :param outputs: Fixed values of structured outputs, like the keyword arguments of ``FakeChatModel``.
+    """
+
+    def __init__(
+            self,
+            latency: Callable[[random.Random], float] = constant(0),
+            error_rate: float = 0,
+            rate_limit_rate: float = 0,
+            max_concurrency: int | None = None,
+            pass_rate: float = .5,
+            retry_after: float = .01,
+            seed: int | None = None,
+            **outputs
+    ):
+        self.model = 'simulated'
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrency = max_concurrency
+        self.pass_rate = pass_rate
+        self.retry_after = retry_after
+        self.outputs = outputs
+        self.rng = random.Random(seed)
+
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, (SimulatedRateLimitError, SimulatedServerError)) or super().is_retryable(exc)
+
+    @contextmanager
+    def _call(self) -> Iterator[float]:
+        """Holds a provider-side slot for the duration of the call, yields the call latency."""
+        latency = self._enter()
+        try:
+            yield latency
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _enter(self) -> float:
+        """Registers a call and returns its latency, or raises a simulated error."""
+        with self._lock:
+            self.calls += 1
+            roll = self.rng.random()
+
+            if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+                self.errors += 1
+                raise SimulatedRateLimitError(self.retry_after)
+
+            if roll < self.rate_limit_rate:
+                self.errors += 1
+                raise SimulatedRateLimitError(self.retry_after)
+
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                raise SimulatedServerError('Simulated server error.')
+
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return max(0., self.latency(self.rng))
+
+    @staticmethod
+    def _record(input: list[Message], output: str) -> None:
+        record_usage(input_tokens=estimate_input_tokens(input), output_tokens=max(1, len(output) // 4))
+
+    def _synthesize(self, annotation: Any) -> Any:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return {
+                name: self._synthesize(field.annotation)
+                for name, field in annotation.model_fields.items()
+            }
+
+        # take the first type of unions, e.g. ``int | float``
+        if isinstance(annotation, types.UnionType) or typing.get_origin(annotation) is typing.Union:
+            annotation = typing.get_args(annotation)[0]
+
+        if annotation is bool:
+            return self.rng.random() < self.pass_rate
+        if annotation in (int, float):
+            return self.rng.randint(0, 10)
+
+        return 'simulated'
+
+    def _structured(self, text_format: Type[BaseModel]) -> BaseModel:
+        if self.outputs:
+            return text_format(**self.outputs)
+
+        return text_format(**self._synthesize(text_format))
+
+    # ==== Completions ====
+
+    def create_completion(self, input: list[Message], **kwargs) -> str:
+        with self._call() as latency:
+            time.sleep(latency)
+        self._record(input, 'simulated response')
+        return 'simulated response'
+
+    async def acreate_completion(self, input: list[Message], **kwargs) -> str:
+        with self._call() as latency:
+            await asyncio.sleep(latency)
+        self._record(input, 'simulated response')
+        return 'simulated response'
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        with self._call() as latency:
+            time.sleep(latency)
+        self._record(input, '')
+        return [tool['func'](**self.outputs) for tool in tools]
+
+    async def acreate_tool_completion(self, input: list[Message], tools: list[Tool], **kwargs) -> list[Any]:
+        with self._call() as latency:
+            await asyncio.sleep(latency)
+        self._record(input, '')
+        return [tool['func'](**self.outputs) for tool in tools]
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        with self._call() as latency:
+            time.sleep(latency)
+        res = self._structured(text_format)
+        self._record(input, res.model_dump_json())
+        return res
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        with self._call() as latency:
+            await asyncio.sleep(latency)
+        res = self._structured(text_format)
+        self._record(input, res.model_dump_json())
+        return res
@@ -0,0 +1,168 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Type
+
+from pydantic import BaseModel
+
+from .base_model import BaseChatModel
+from .hashing import request_key
+from .types import Message, Tool, TurnCall
+
+
+class _Flight:
+    """An in-flight call and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlightChatModel(BaseChatModel):
+    """
+    A wrapper around any ``BaseChatModel`` that merges identical concurrent async requests into one call.
+
+    Requests are keyed by ``request_key``. While a request is in flight, every identical request awaits the same
+    call instead of calling the wrapped model again. The call runs as its own task: it goes on while any caller
+    awaits it, a cancelled caller only stops waiting. Each caller receives its own deep copy of the result,
+    so in-place changes (e.g. ``AsyncNonBinaryNode`` applying its weight) do not leak to other callers.
+    Sync calls are passed through to the wrapped model.
+    """
+
+    def __init__(self, model: BaseChatModel):
+        self.model = model
+        self.merged = 0
+        self._in_flight: dict[str, _Flight] = {}
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.model.is_retryable(exc)
+
+    def compile_format(self, text_format: Type[BaseModel]) -> None:
+        self.model.compile_format(text_format)
+
+    async def _single_flight(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.merged += 1
+        else:
+            # the call runs as its own task, so a cancelled caller does not cancel it for the other callers
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+
+        flight.waiters += 1
+        try:
+            res = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # the call is cancelled once nobody awaits it anymore
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+        return copy.deepcopy(res)
+
+    def _done(self, key: str, flight: '_Flight') -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        # mark the exception as retrieved if every caller was cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    # ==== Completions ====
+
+    def create_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return self.model.create_completion(input=input, **kwargs)
+
+    async def acreate_completion(
+            self,
+            input: list[Message],
+            **kwargs
+    ) -> str:
+        return await self._single_flight(
+            request_key(self.model, 'completion', input, **kwargs),
+            lambda: self.model.acreate_completion(input=input, **kwargs)
+        )
+
+    # ==== Tool Completions ====
+
+    def create_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return self.model.create_tool_completion(input=input, tools=tools, **kwargs)
+
+    async def acreate_tool_completion(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            **kwargs
+    ) -> list[Any]:
+        return await self._single_flight(
+            request_key(self.model, 'tool_completion', input, tools=tools, **kwargs),
+            lambda: self.model.acreate_tool_completion(input=input, tools=tools, **kwargs)
+        )
+
+    async def arun_tool_loop(
+            self,
+            input: list[Message],
+            tools: list[Tool],
+            max_turns: int = 5,
+            max_tokens: int | None = None,
+            call_turn: TurnCall | None = None,
+            **kwargs
+    ) -> list[Any]:
+        # the merged loop runs its turns through the ``call_turn`` of the first caller
+        return await self._single_flight(
+            request_key(
+                self.model, 'tool_loop', input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, **kwargs
+            ),
+            lambda: self.model.arun_tool_loop(
+                input=input, tools=tools, max_turns=max_turns, max_tokens=max_tokens, call_turn=call_turn, **kwargs
+            )
+        )
+
+    # ==== Structured Completions ====
+
+    def create_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return self.model.create_structured_completion(input=input, text_format=text_format, **kwargs)
+
+    async def acreate_structured_completion(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            **kwargs
+    ) -> BaseModel | None:
+        return await self._single_flight(
+            request_key(self.model, 'structured_completion', input, text_format=text_format, **kwargs),
+            lambda: self.model.acreate_structured_completion(input=input, text_format=text_format, **kwargs)
+        )
+
+    def create_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        return self.model.create_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
+
+    async def acreate_structured_samples(
+            self,
+            input: list[Message],
+            text_format: Type[BaseModel],
+            n: int,
+            **kwargs
+    ) -> list[BaseModel | None]:
+        # samples are meant to differ, so identical sampling requests are not merged
+        return await self.model.acreate_structured_samples(input=input, text_format=text_format, n=n, **kwargs)
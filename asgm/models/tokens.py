@@ -0,0 +1,36 @@
+import functools
+from typing import Any
+
+from .types import Message
+
+
+def estimate_tokens(text: str) -> int:
+    """Returns a rough token count of ``text`` (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def estimate_input_tokens(input: list[Message]) -> int:
+    """Returns a rough token count of ``input`` messages, including a small per-message overhead."""
+    return sum(estimate_tokens(str(message.get('content', ''))) + 4 for message in input)
+
+
+@functools.cache
+def tokenizer() -> Any:
+    """
+    Returns the ``o200k_base`` tiktoken encoding, or ``None`` if tiktoken is not installed
+    or its encoding cannot be loaded (e.g. offline without a cached encoding file).
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Returns the token count of ``text`` with ``tokenizer``, falling back to ``estimate_tokens``."""
+    if (encoding := tokenizer()) is None:
+        return estimate_tokens(text)
+
+    return len(encoding.encode(text, disallowed_special=()))
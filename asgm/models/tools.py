@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import inspect
+import json
+from concurrent.futures import Executor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator
+
+from .types import Tool
+
+# tool results shared by the calls made in the current context, e.g. by a graph evaluation
+_tool_cache: ContextVar[dict | None] = ContextVar('asgm_tool_cache', default=None)
+
+
+@contextmanager
+def cache_tool_results(cache: dict | None = None) -> Iterator[dict]:
+    """
+    Shares results of ``ToolKit`` calls made within the context, so a tool called twice with the same arguments
+    (e.g. by several nodes evaluating the same content) runs once. Concurrent identical calls share one execution.
+    Tools with ``cacheable=False`` are always called.
+    """
+    cache = cache if cache is not None else {}
+    token = _tool_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _tool_cache.reset(token)
+
+
+class ToolKit(list):
+    """
+    A list of ``Tool`` with a name index, dispatching tool calls without blocking the event loop.
+
+    Coroutine tools run on the event loop, concurrently with each other. Other tools are considered blocking
+    and run in ``executor``. A ``ProcessPoolExecutor`` suits CPU-bound tools, in which case tool functions
+    should be picklable (e.g. module-level functions). A tool ``timeout`` overrides the toolkit ``timeout``.
+
+    Build it once, e.g. per node, and pass it wherever a list of tools is expected.
+
+    :param tools: The tools.
+    :param executor: Executor of blocking tools. If ``None``, the default thread pool of the event loop is used.
+    :param timeout: Seconds after which a tool call raises ``TimeoutError``. If ``None``, calls are not limited.
+    :param max_concurrency: Maximum number of tool calls of one ``acall_many`` running at once.
+    """
+
+    def __init__(
+            self,
+            tools: Iterable[Tool] = (),
+            executor: Executor | None = None,
+            timeout: float | None = None,
+            max_concurrency: int | None = None
+    ):
+        super().__init__(tools)
+        self.executor = executor
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.by_name = {tool['name']: tool for tool in self}
+
+    @classmethod
+    def of(cls, tools: list[Tool]) -> 'ToolKit':
+        """Returns ``tools`` if it is already a ``ToolKit``, otherwise indexes it."""
+        return tools if isinstance(tools, ToolKit) else cls(tools)
+
+    @property
+    def scoring(self) -> list[Tool]:
+        """Returns the tools marked with ``scoring=True``, or all tools if none is marked."""
+        marked = [tool for tool in self if tool.get('scoring')]
+        return marked or list(self)
+
+    def call(self, name: str, arguments: dict) -> Any:
+        """Calls the tool ``name`` in the calling thread."""
+        tool = self.by_name[name]
+        if inspect.iscoroutinefunction(tool['func']):
+            return asyncio.run(
+                asyncio.wait_for(tool['func'](**arguments), tool.get('timeout', self.timeout))
+            )
+
+        return tool['func'](**arguments)
+
+    async def _acall(self, tool: Tool, arguments: dict) -> Any:
+        func = tool['func']
+
+        if inspect.iscoroutinefunction(func):
+            call = func(**arguments)
+        else:
+            call = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, **arguments))
+
+        return await asyncio.wait_for(call, tool.get('timeout', self.timeout))
+
+    async def acall(self, name: str, arguments: dict) -> Any:
+        tool = self.by_name[name]
+        cache = _tool_cache.get()
+        if cache is None or not tool.get('cacheable', True):
+            return await self._acall(tool, arguments)
+
+        key = (id(tool['func']), json.dumps(arguments, sort_keys=True, default=repr))
+        if key not in cache:
+            cache[key] = asyncio.ensure_future(self._acall(tool, arguments))
+
+        try:
+            # shielded, so a cancelled caller does not cancel the call shared with other callers
+            return await asyncio.shield(cache[key])
+        except Exception:
+            cache.pop(key, None)
+            raise
+
+    async def acall_many(self, calls: list[tuple[str, dict]]) -> list[Any]:
+        """Runs ``(name, arguments)`` calls concurrently, returns their results in ``calls`` order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def _acall(name: str, arguments: dict) -> Any:
+            async with semaphore or nullcontext():
+                return await self.acall(name, arguments)
+
+        return list(
+            await asyncio.gather(*[_acall(name, arguments) for name, arguments in calls])
+        )
@@ -1,4 +1,4 @@
-from typing import TypedDict, Literal, Callable
+from typing import Any, Awaitable, TypedDict, Literal, Callable, NotRequired
 
 
 class Message(TypedDict):
@@ -10,3 +10,13 @@ class Tool(TypedDict):
     name: str
     schema: dict
     func: Callable
+    # seconds after which a call of the tool is cancelled, overrides the ``ToolKit`` timeout
+    timeout: NotRequired[float]
+    # marks tools returning the final score of a tool loop, other tools gather evidence
+    scoring: NotRequired[bool]
+    # if False, results of the tool are never shared, e.g. for tools with side effects
+    cacheable: NotRequired[bool]
+
+
+# runs the model call of a tool loop turn, given the input of the turn and the call
+TurnCall = Callable[[list[Message], Callable[[], Awaitable[Any]]], Awaitable[Any]]
@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from pydantic import BaseModel
+
+
+class Usage(BaseModel):
+    """
+    Token usage accumulated over model calls.
+    ``cached_tokens`` is the part of ``input_tokens`` served from the provider prompt cache.
+    ``retries`` and ``parse_failures`` count retried calls and responses that could not be parsed.
+    """
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    retries: int = 0
+    parse_failures: int = 0
+
+    @property
+    def cached_ratio(self) -> float:
+        """Returns the share of input tokens served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.
+
+
+# usage objects collecting the calls made in the current context, e.g. by a graph evaluation
+_trackers: ContextVar[tuple[Usage, ...]] = ContextVar('asgm_usage_trackers', default=())
+# usage objects are updated from several threads by sync evaluations
+_lock = threading.Lock()
+
+
+@contextmanager
+def track_usage(usage: Usage | None = None) -> Iterator[Usage]:
+    """
+    Collects usage of every model call made within the context into ``usage``.
+
+    Tasks created within the context inherit it, so ``asyncio.gather`` over nodes is tracked as well.
+    Nested contexts are all updated.
+    """
+    usage = usage if usage is not None else Usage()
+    token = _trackers.set(_trackers.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _trackers.reset(token)
+
+
+def record_usage(
+        input_tokens: int = 0,
+        cached_tokens: int = 0,
+        output_tokens: int = 0
+) -> None:
+    """Records usage of a single model call. Intended to be called by ``BaseChatModel`` implementations."""
+    with _lock:
+        for usage in _trackers.get():
+            usage.requests += 1
+            usage.input_tokens += input_tokens
+            usage.cached_tokens += cached_tokens
+            usage.output_tokens += output_tokens
+
+
+def record_retry() -> None:
+    """Records a retried model call. Intended to be called by ``BaseChatModel`` implementations and wrappers."""
+    with _lock:
+        for usage in _trackers.get():
+            usage.retries += 1
+
+
+def record_parse_failure() -> None:
+    """Records a response that could not be parsed. Intended to be called by ``BaseChatModel`` implementations."""
+    with _lock:
+        for usage in _trackers.get():
+            usage.parse_failures += 1
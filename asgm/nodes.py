@@ -1,20 +1,136 @@
-from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
+import statistics
+from typing import Any, Callable, Literal
 
+from pydantic import BaseModel, create_model
+
+from .chunking import split_chunks
 from .models.base_model import BaseChatModel
+from .models.cache import BaseCache, InMemoryCache
+from .models.hashing import model_name
+from .models.tokens import count_tokens
+from .models.tools import ToolKit
 from .models.types import Message, Tool
+from .serialization import dump_output, load_output
+
+# ``criterion_first`` places criterion messages before the content.
+# ``content_first`` places the content right after the system prompt, so requests of all nodes evaluating the same
+# content share a prefix, which providers can serve from their prompt cache.
+Layout = Literal['criterion_first', 'content_first']
+
+# reason of the results returned when a model response cannot be parsed
+PARSE_FAILURE = 'Unable to parse model response.'
 
 
 class BaseABSNode:
     # implement system prompt
     sys_prompt = None
 
+    layout: Layout = 'criterion_first'
+
     # implement model response structure output format
     class OutputFormat(BaseModel):
         pass
 
+    # implement criterion messages
+    def _criterion_messages(self) -> list[Message]:
+        raise NotImplementedError
+
+    # messages surrounding the content, built once by ``compile`` as ``(layout, before, after)``
+    _compiled: tuple[Layout, list[Message], list[Message]] | None = None
+
+    def _surrounding_messages(self) -> tuple[list[Message], list[Message]]:
+        """Returns the messages placed before and after the content according to the node ``layout``."""
+        system = Message(role='system', content=self.sys_prompt)
+
+        if self.layout == 'content_first':
+            return [system], self._criterion_messages()
+
+        return [system, *self._criterion_messages()], []
+
+    def compile(self, model: BaseChatModel | None = None) -> None:
+        """
+        Builds the messages surrounding the content once, so requests reuse them instead of formatting them again,
+        and lets ``model`` prepare the output format (see ``BaseChatModel.compile_format``).
+        Compile the node again after editing it, e.g. its criterion.
+        """
+        self._compiled = (self.layout, *self._surrounding_messages())
+        if model is not None:
+            model.compile_format(self.OutputFormat)
+
+    def _messages(self, content: str) -> list[Message]:
+        """Builds the model input, from the compiled messages if the node was compiled with its current layout."""
+        if self._compiled is not None and self._compiled[0] == self.layout:
+            _, before, after = self._compiled
+        else:
+            before, after = self._surrounding_messages()
+
+        return [*before, Message(role='user', content=content), *after]
+
     async def eval(self, content: str, model: BaseChatModel) -> OutputFormat:
         raise NotImplementedError
 
+    # implement synchronous evaluation with the sync model methods
+    def eval_sync(self, content: str, model: BaseChatModel) -> OutputFormat:
+        raise NotImplementedError
+
+    # ==== Sampling ====
+
+    # sampling mode is enabled when ``samples`` is above 1
+    samples: int = 1
+    initial_samples: int = 3
+    sample_temperature: float = 1
+
+    def _agree(self, samples: list[OutputFormat], remaining: int) -> bool:
+        """Returns True once ``remaining`` more samples are not needed to settle the result."""
+        raise NotImplementedError
+
+    async def _sample(self, content: str, model: BaseChatModel) -> list[OutputFormat]:
+        """
+        Draws up to ``samples`` judgments, ``initial_samples`` per request, and stops as soon as they agree,
+        so only ambiguous content pays for extra samples. Returns the parsed samples.
+        """
+        input = self._messages(content)
+        samples = []
+        drawn = 0
+        while drawn < self.samples:
+            n = min(self.initial_samples, self.samples - drawn)
+            res = await model.acreate_structured_samples(
+                input=input,
+                text_format=self.OutputFormat,
+                n=n,
+                temperature=self.sample_temperature
+            )
+            drawn += n
+            samples += [item for item in res if item is not None]
+
+            if samples and self._agree(samples, self.samples - drawn):
+                break
+
+        return samples
+
+    def _sample_sync(self, content: str, model: BaseChatModel) -> list[OutputFormat]:
+        input = self._messages(content)
+        samples = []
+        drawn = 0
+        while drawn < self.samples:
+            n = min(self.initial_samples, self.samples - drawn)
+            res = model.create_structured_samples(
+                input=input,
+                text_format=self.OutputFormat,
+                n=n,
+                temperature=self.sample_temperature
+            )
+            drawn += n
+            samples += [item for item in res if item is not None]
+
+            if samples and self._agree(samples, self.samples - drawn):
+                break
+
+        return samples
+
 
 class AsyncBinaryNode(BaseABSNode):
     """
@@ -31,28 +147,149 @@ Additionally, provide reasoning behind your answer in the `reason` field."""
         pass_: bool
         reason: str
 
-    def __init__(self, criterion: str):
+    def __init__(
+            self,
+            criterion: str,
+            layout: Layout = 'criterion_first',
+            samples: int = 1,
+            initial_samples: int = 3,
+            sample_temperature: float = 1
+    ):
+        """
+        :param samples: If above 1, the result is the majority vote of up to ``samples`` sampled judgments.
+        :param initial_samples: Number of samples drawn per request. Drawing stops once the samples are unanimous
+            or the majority cannot change anymore.
+        :param sample_temperature: Temperature of sampled judgments.
+        """
         self.criterion = criterion
+        self.layout = layout
+        self.samples = samples
+        self.initial_samples = initial_samples
+        self.sample_temperature = sample_temperature
 
-    async def eval(self, content: str, model: BaseChatModel) -> OutputFormat:
-        res = await model.acreate_structured_completion(
-            input=[
-                Message(role='system', content=self.sys_prompt),
-                Message(role='developer', content=f'Evaluation critieria: {self.criterion}'),
-                Message(role='user', content=content)
-            ],
-            text_format=self.OutputFormat,
-            temperature=0
+    def _criterion_messages(self) -> list[Message]:
+        return [Message(role='developer', content=f'Evaluation critieria: {self.criterion}')]
+
+    def _agree(self, samples: list[OutputFormat], remaining: int) -> bool:
+        passed = sum(item.pass_ for item in samples)
+        failed = len(samples) - passed
+
+        return not passed or not failed or abs(passed - failed) > remaining
+
+    def _vote(self, samples: list[OutputFormat]) -> OutputFormat:
+        """Returns the majority result, ties fail."""
+        passed = [item for item in samples if item.pass_]
+        pass_ = len(passed) > len(samples) / 2
+        majority = passed if pass_ else [item for item in samples if not item.pass_]
+
+        return self.OutputFormat(
+            pass_=pass_,
+            reason=f'{majority[0].reason} ({len(majority)} of {len(samples)} samples agree)'
         )
 
+    def _result(self, res: OutputFormat | None) -> OutputFormat:
         if not res:
             return self.OutputFormat(
                 pass_=False,
-                reason='Unable to parse model response.'
+                reason=PARSE_FAILURE
             )
 
         return res
 
+    async def eval(self, content: str, model: BaseChatModel) -> OutputFormat:
+        if self.samples > 1:
+            samples = await self._sample(content, model)
+            return self._vote(samples) if samples else self._result(None)
+
+        res = await model.acreate_structured_completion(
+            input=self._messages(content),
+            text_format=self.OutputFormat,
+            temperature=0
+        )
+
+        return self._result(res)
+
+    def eval_sync(self, content: str, model: BaseChatModel) -> OutputFormat:
+        if self.samples > 1:
+            samples = self._sample_sync(content, model)
+            return self._vote(samples) if samples else self._result(None)
+
+        res = model.create_structured_completion(
+            input=self._messages(content),
+            text_format=self.OutputFormat,
+            temperature=0
+        )
+
+        return self._result(res)
+
+
+class AsyncPackedBinaryNode(BaseABSNode):
+    """
+    Evaluates several ``AsyncBinaryNode`` criteria with a single model call.
+
+    The system prompt and the content are sent once, and the structured output holds one ``pass_``/``reason`` pair
+    per criterion. The response is split back into the ``AsyncBinaryNode.OutputFormat`` of each child.
+    """
+
+    sys_prompt = """You are a helpful judging assistant.
+Evaluate whether the provided content passes each of the numbered criteria independently.
+For each criterion, fill the output field named after its number (e.g. `criterion_1`).
+Your output for a criterion is boolean and should be provided in its `pass_` field.
+Use True if it passes, False if it does not.
+Additionally, provide reasoning behind your answer in its `reason` field."""
+
+    def __init__(self, children: list[AsyncBinaryNode], layout: Layout = 'criterion_first'):
+        self.children = children
+        self.layout = layout
+        self.OutputFormat = create_model(
+            'PackedOutputFormat',
+            **{
+                f'criterion_{i}': (AsyncBinaryNode.OutputFormat, ...)
+                for i in range(1, len(children) + 1)
+            }
+        )
+
+    def _criterion_messages(self) -> list[Message]:
+        criteria = '\n'.join(
+            f'{i}. {child.criterion}'
+            for i, child in enumerate(self.children, start=1)
+        )
+        return [Message(role='developer', content=f'Evaluation criteria:\n{criteria}')]
+
+    async def eval(self, content: str, model: BaseChatModel) -> list[AsyncBinaryNode.OutputFormat]:
+        res = await model.acreate_structured_completion(
+            input=self._messages(content),
+            text_format=self.OutputFormat,
+            temperature=0
+        )
+
+        return self._result(res)
+
+    def eval_sync(self, content: str, model: BaseChatModel) -> list[AsyncBinaryNode.OutputFormat]:
+        res = model.create_structured_completion(
+            input=self._messages(content),
+            text_format=self.OutputFormat,
+            temperature=0
+        )
+
+        return self._result(res)
+
+    def _result(self, res: BaseModel | None) -> list[AsyncBinaryNode.OutputFormat]:
+        """Splits the packed response into the results of the children."""
+        if not res:
+            return [
+                AsyncBinaryNode.OutputFormat(
+                    pass_=False,
+                    reason=PARSE_FAILURE
+                )
+                for _ in self.children
+            ]
+
+        return [
+            getattr(res, f'criterion_{i}')
+            for i in range(1, len(self.children) + 1)
+        ]
+
 
 class AsyncNonBinaryNode(BaseABSNode):
     """
@@ -73,28 +310,84 @@ Additionally, provide reasoning behind your answer in the `reason` field."""
             self,
             criterion: str,
             verdicts: list[str],
-            weight: float = 1
+            weight: float = 1,
+            layout: Layout = 'criterion_first',
+            samples: int = 1,
+            initial_samples: int = 3,
+            sample_temperature: float = 1,
+            sample_aggregate: Literal['mean', 'median'] = 'median',
+            tolerance: float = 0
     ):
+        """
+        :param samples: If above 1, the score aggregates up to ``samples`` sampled judgments.
+        :param initial_samples: Number of samples drawn per request. Drawing stops once the sampled scores
+            are within ``tolerance`` of each other.
+        :param sample_temperature: Temperature of sampled judgments.
+        :param sample_aggregate: Aggregation of sampled scores.
+        :param tolerance: Maximum spread of sampled scores considered an agreement.
+        """
         self.criterion = criterion
         self.verdicts = verdicts
         self.weight = weight
+        self.layout = layout
+        self.samples = samples
+        self.initial_samples = initial_samples
+        self.sample_temperature = sample_temperature
+        self.sample_aggregate = sample_aggregate
+        self.tolerance = tolerance
 
-    async def eval(self, content: str, model: BaseChatModel) -> OutputFormat:
-        res = await model.acreate_structured_completion(
-            input=[
-                Message(role='system', content=self.sys_prompt),
-                Message(role='developer', content=f'Evaluation criterion: {self.criterion}'),
-                Message(role='developer', content=f'Possible verdicts: {self.verdicts}'),
-                Message(role='user', content=content)
-            ],
-            text_format=self.OutputFormat,
-            temperature=0
+    def _criterion_messages(self) -> list[Message]:
+        return [
+            Message(role='developer', content=f'Evaluation criterion: {self.criterion}'),
+            Message(role='developer', content=f'Possible verdicts: {self.verdicts}')
+        ]
+
+    def _agree(self, samples: list[OutputFormat], remaining: int) -> bool:
+        scores = [item.score for item in samples]
+        return max(scores) - min(scores) <= self.tolerance
+
+    def _aggregate(self, samples: list[OutputFormat]) -> OutputFormat:
+        """Returns the aggregated score with the reason of the closest sample."""
+        scores = [item.score for item in samples]
+        score = statistics.mean(scores) if self.sample_aggregate == 'mean' else statistics.median(scores)
+        closest = min(samples, key=lambda item: abs(item.score - score))
+
+        return self.OutputFormat(
+            score=score,
+            reason=f'{closest.reason} ({self.sample_aggregate} of {len(samples)} samples)'
         )
 
+    async def eval(self, content: str, model: BaseChatModel) -> OutputFormat:
+        if self.samples > 1:
+            samples = await self._sample(content, model)
+            res = self._aggregate(samples) if samples else None
+        else:
+            res = await model.acreate_structured_completion(
+                input=self._messages(content),
+                text_format=self.OutputFormat,
+                temperature=0
+            )
+
+        return self._result(res)
+
+    def eval_sync(self, content: str, model: BaseChatModel) -> OutputFormat:
+        if self.samples > 1:
+            samples = self._sample_sync(content, model)
+            res = self._aggregate(samples) if samples else None
+        else:
+            res = model.create_structured_completion(
+                input=self._messages(content),
+                text_format=self.OutputFormat,
+                temperature=0
+            )
+
+        return self._result(res)
+
+    def _result(self, res: OutputFormat | None) -> OutputFormat:
         if not res:
             return self.OutputFormat(
                 score=0,
-                reason='Unable to parse model response.'
+                reason=PARSE_FAILURE
             )
 
         # apply weight to the score
@@ -107,32 +400,226 @@ class AsyncNonBinaryToolCallNode(BaseABSNode):
     Defines criterion when the output is not binary and numeric score is retrieved by function calling.
 
     A possible criterion could be a description for the model specifying the cases in which the tool should be called.
+    ``tools`` are indexed once into a ``ToolKit``; pass a ``ToolKit`` to configure the executor of blocking tools
+    and tool timeouts.
+
+    With ``max_turns`` above 1, the model can call evidence tools first: their outputs are fed back until it calls
+    the tools marked with ``scoring=True`` (see ``BaseChatModel.arun_tool_loop``). Tool calls of a turn run
+    concurrently, and tool results are shared for the duration of the graph run.
     """
     sys_prompt = """You are a helpful judging assistant.
 Evaluate whether the provided content passes the criterion determined by function calling."""
 
+    aggregations: dict[str, Callable[[list[float]], float]] = {
+        'first': lambda scores: scores[0],
+        'sum': sum,
+        'mean': lambda scores: sum(scores) / len(scores),
+        'max': max,
+        'min': min,
+    }
+
     def __init__(
             self,
             criterion,
             tools: list[Tool],
-            weight: float = 1
+            weight: float = 1,
+            layout: Layout = 'criterion_first',
+            max_turns: int = 1,
+            max_tokens: int | None = None,
+            aggregate: Literal['first', 'sum', 'mean', 'max', 'min'] | Callable[[list[float]], float] = 'first'
     ):
+        """
+        :param max_turns: Maximum number of model calls of the tool loop.
+        :param max_tokens: Token budget of the tool loop, after which the model has to call a scoring tool.
+        :param aggregate: Combines the results of several scoring tool calls into the node score.
+        """
         self.criterion = criterion
-        self.tools = tools
+        self.tools = ToolKit.of(tools)
         self.weight = weight
+        self.layout = layout
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.aggregate = self.aggregations[aggregate] if isinstance(aggregate, str) else aggregate
+
+    def _criterion_messages(self) -> list[Message]:
+        return [Message(role='developer', content=self.criterion)]
+
+    def compile(self, model: BaseChatModel | None = None) -> None:
+        # tool completions request no output format
+        super().compile()
 
     async def eval(self, content: str, model: BaseChatModel) -> AsyncNonBinaryNode.OutputFormat:
-        res = await model.acreate_tool_completion(
-            input=[
-                Message(role='system', content=self.sys_prompt),
-                Message(role='developer', content=self.criterion),
-                Message(role='user', content=content),
-            ],
+        res = await model.arun_tool_loop(
+            input=self._messages(content),
+            tools=self.tools,
+            max_turns=self.max_turns,
+            max_tokens=self.max_tokens,
+            temperature=0
+        )
+
+        return self._result(res)
+
+    def eval_sync(self, content: str, model: BaseChatModel) -> AsyncNonBinaryNode.OutputFormat:
+        """Evaluates with a single tool completion, the multi-turn tool loop is only available in ``eval``."""
+        res = model.create_tool_completion(
+            input=self._messages(content),
             tools=self.tools,
             temperature=0
         )
 
+        return self._result(res)
+
+    def _result(self, res: list[Any]) -> AsyncNonBinaryNode.OutputFormat:
+        if not res:
+            return AsyncNonBinaryNode.OutputFormat(
+                score=0,
+                reason='No scoring tool call.'
+            )
+
         return AsyncNonBinaryNode.OutputFormat(
-            score=res[0] * self.weight,  # for now, retrieve the first entry in tool calls results
+            score=self.aggregate(res) * self.weight,
             reason='Tool call'
         )
+
+
+class AsyncChunkedNode(BaseABSNode):
+    """
+    Evaluates long contents with ``node`` chunk by chunk (map) and combines the chunk results (reduce).
+
+    Contents are split into chunks of at most ``max_tokens`` tokens (see ``split_chunks``), evaluated concurrently.
+    Binary results are combined with ``'all'`` (every chunk passes) or ``'any'`` (a chunk passes),
+    numeric results with ``'max'``, ``'mean'`` or ``'weighted'`` (mean weighted by chunk token counts).
+    The reason of the result names the chunk it comes from.
+
+    Chunk results are cached by criterion, model and chunk text, so chunks shared by several contents
+    (e.g. boilerplate sections) are evaluated once. Parse failures are not cached.
+    Other attributes (e.g. ``criterion`` or ``weight``) are those of ``node``.
+
+    :param node: The node evaluating every chunk.
+    :param max_tokens: Maximum number of tokens per chunk.
+    :param overlap: Number of tokens shared by consecutive chunks, so statements cut by a chunk border are kept.
+    :param aggregate: Combination of chunk results, defaults to ``'all'`` for binary and ``'max'`` for numeric results.
+    :param cache: Cache of chunk results.
+    """
+
+    def __init__(
+            self,
+            node: BaseABSNode,
+            max_tokens: int = 4000,
+            overlap: int = 0,
+            aggregate: Literal['all', 'any', 'max', 'mean', 'weighted'] | None = None,
+            cache: BaseCache | None = None
+    ):
+        self.node = node
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.aggregate = aggregate
+        self.cache = cache if cache is not None else InMemoryCache()
+
+    def __getattr__(self, name: str):
+        # called only for attributes missing on the wrapper, e.g. ``criterion``
+        if name == 'node':
+            raise AttributeError(name)
+
+        return getattr(self.node, name)
+
+    @property
+    def layout(self) -> Layout:
+        return self.node.layout
+
+    @layout.setter
+    def layout(self, layout: Layout) -> None:
+        self.node.layout = layout
+
+    def compile(self, model: BaseChatModel | None = None) -> None:
+        self.node.compile(model)
+
+    def _chunk_key(self, chunk: str, model: BaseChatModel) -> str:
+        payload = json.dumps([criterion_key(self.node), model_name(model), chunk], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cache_chunk(self, key: str, res: BaseModel) -> None:
+        if getattr(res, 'reason', None) != PARSE_FAILURE:
+            self.cache.set(key, json.dumps(dump_output(res)))
+
+    async def _eval_chunk(self, chunk: str, model: BaseChatModel) -> BaseModel:
+        key = self._chunk_key(chunk, model)
+        if (cached := self.cache.get(key)) is not None:
+            return load_output(json.loads(cached))
+
+        res = await self.node.eval(content=chunk, model=model)
+        self._cache_chunk(key, res)
+        return res
+
+    def _eval_chunk_sync(self, chunk: str, model: BaseChatModel) -> BaseModel:
+        key = self._chunk_key(chunk, model)
+        if (cached := self.cache.get(key)) is not None:
+            return load_output(json.loads(cached))
+
+        res = self.node.eval_sync(content=chunk, model=model)
+        self._cache_chunk(key, res)
+        return res
+
+    def _reduce(self, results: list[BaseModel], tokens: list[int]) -> BaseModel:
+        output_format = type(results[0])
+        binary = 'pass_' in output_format.model_fields
+        aggregate = self.aggregate or ('all' if binary else 'max')
+
+        def label(i: int) -> str:
+            return f'Chunk {i + 1} of {len(results)}: {results[i].reason}'
+
+        if binary:
+            if aggregate not in ('all', 'any'):
+                raise ValueError(f'Unknown aggregation of binary results: {aggregate}.')
+
+            # the first chunk deciding the result, e.g. the first failing chunk with ``'all'``
+            decisive = [i for i, item in enumerate(results) if item.pass_ == (aggregate == 'any')]
+            pass_ = bool(decisive) == (aggregate == 'any')
+            return output_format(pass_=pass_, reason=label(decisive[0] if decisive else 0))
+
+        scores = [item.score for item in results]
+        if aggregate == 'max':
+            score = max(scores)
+        elif aggregate == 'mean':
+            score = statistics.mean(scores)
+        elif aggregate == 'weighted':
+            score = sum(score * count for score, count in zip(scores, tokens)) / (sum(tokens) or 1)
+        else:
+            raise ValueError(f'Unknown aggregation of numeric results: {aggregate}.')
+
+        closest = min(range(len(results)), key=lambda i: abs(scores[i] - score))
+        return output_format(score=score, reason=label(closest))
+
+    async def eval(self, content: str, model: BaseChatModel) -> BaseModel:
+        chunks = split_chunks(content, self.max_tokens, self.overlap)
+        if len(chunks) == 1:
+            return await self._eval_chunk(content, model)
+
+        results = await asyncio.gather(*[self._eval_chunk(chunk, model) for chunk in chunks])
+        return self._reduce(list(results), [count_tokens(chunk) for chunk in chunks])
+
+    def eval_sync(self, content: str, model: BaseChatModel) -> BaseModel:
+        """Evaluates chunks one after another, so chunked nodes do not hold several threads of a shared pool."""
+        chunks = split_chunks(content, self.max_tokens, self.overlap)
+        results = [self._eval_chunk_sync(chunk, model) for chunk in chunks]
+        if len(results) == 1:
+            return results[0]
+
+        return self._reduce(results, [count_tokens(chunk) for chunk in chunks])
+
+
+def criterion_key(node: BaseABSNode) -> str:
+    """
+    Returns a stable hash of a node definition (class, criterion, verdicts, weight and tool names),
+    so stored results stay valid if children are reordered, and become stale if a criterion is edited.
+    """
+    payload = {
+        'node': type(node).__name__,
+        'criterion': getattr(node, 'criterion', None),
+        'verdicts': getattr(node, 'verdicts', None),
+        'weight': getattr(node, 'weight', None),
+        'tools': [tool['name'] for tool in getattr(node, 'tools', [])],
+    }
+    dump = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+
+    return hashlib.sha256(dump.encode()).hexdigest()
@@ -0,0 +1,213 @@
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+try:
+    import numpy as np
+except ImportError as exc:
+    raise ImportError('ResultsTable requires numpy, install it with `pip install "asgm[results]"`.') from exc
+
+from .graphs import AsyncBaseStarGraph
+from .nodes import BaseABSNode, criterion_key
+
+COLUMNS = ('document_id', 'criterion', 'criterion_key', 'passed', 'score', 'weight', 'reason')
+
+
+class ResultsTable:
+    """
+    Results of a corpus as columns of NumPy arrays, one row per document and criterion.
+
+    Columns are ``document_id``, ``criterion``, ``criterion_key`` (see ``criterion_key``), ``passed``
+    (1 or 0 for binary results, NaN for numeric ones), ``score`` (1 or 0 for binary results, the weighted node
+    score for numeric ones), ``weight`` (1 for nodes without weight) and ``reason``. Further columns
+    (e.g. a corpus split) can be added with ``table['split'] = values`` and used to group rows.
+
+    Aggregations run over whole columns, so they scale to millions of rows.
+
+    :param columns: Arrays of equal length keyed by column name, including ``COLUMNS``.
+    """
+
+    def __init__(self, columns: Mapping[str, Any]):
+        missing = set(COLUMNS) - set(columns)
+        if missing:
+            raise ValueError(f'Missing columns: {sorted(missing)}.')
+
+        self.columns: dict[str, np.ndarray] = {}
+        # unique values and row codes of grouped columns, sorting a column once for all aggregations
+        self._groups: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for name, values in columns.items():
+            self[name] = values
+
+    @classmethod
+    def from_evaluations(
+            cls,
+            graph: AsyncBaseStarGraph,
+            evaluations: Mapping[str, list[BaseABSNode.OutputFormat]] | list[list[BaseABSNode.OutputFormat]]
+    ) -> 'ResultsTable':
+        """
+        Builds the table of ``graph`` results, e.g. of ``graph.eval_many`` (documents are identified by their index)
+        or of ``EvaluationJob.evaluations`` (documents are identified by their id, missing results are skipped).
+        """
+        if not isinstance(evaluations, Mapping):
+            evaluations = {str(i): evaluation for i, evaluation in enumerate(evaluations)}
+
+        children = [
+            (getattr(child, 'criterion', None) or '', criterion_key(child), getattr(child, 'weight', 1))
+            for child in graph.children
+        ]
+        rows = [
+            (document_id, *children[i], item)
+            for document_id, evaluation in evaluations.items()
+            for i, item in enumerate(evaluation)
+            if item is not None
+        ]
+
+        return cls({
+            'document_id': [row[0] for row in rows],
+            'criterion': [row[1] for row in rows],
+            'criterion_key': [row[2] for row in rows],
+            'passed': [float(item.pass_) if hasattr(item, 'pass_') else np.nan for *_, item in rows],
+            'score': [float(item.pass_) if hasattr(item, 'pass_') else item.score for *_, item in rows],
+            'weight': [row[3] for row in rows],
+            'reason': [item.reason for *_, item in rows],
+        })
+
+    # ==== Columns ====
+
+    def __len__(self) -> int:
+        return len(self.columns['document_id'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values: Any) -> None:
+        if name == 'reason':
+            # reasons are long and rarely compared, object arrays avoid padding them to the longest one
+            array = np.empty(len(values), dtype=object)
+            array[:] = list(values)
+        elif name in ('passed', 'score', 'weight'):
+            array = np.asarray(values, dtype=float)
+        elif name in ('document_id', 'criterion', 'criterion_key'):
+            # fixed-width strings group and sort much faster than objects
+            array = np.asarray(values, dtype=str)
+        else:
+            array = np.asarray(values)
+
+        if self.columns and len(array) != len(self):
+            raise ValueError(f'Column {name!r} has {len(array)} values, the table has {len(self)} rows.')
+
+        self.columns[name] = array
+        self._groups.pop(name, None)
+
+    def _group(self, by: str) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the sorted unique values of the ``by`` column and the index of every row value among them."""
+        if by not in self._groups:
+            self._groups[by] = np.unique(self[by], return_inverse=True)
+
+        return self._groups[by]
+
+    def _group_sums(
+            self,
+            by: str,
+            *values: np.ndarray,
+            mask: np.ndarray | None = None
+    ) -> tuple[list, list[np.ndarray]]:
+        """Returns the values of the ``by`` column and the sum of every array of ``values`` per value."""
+        unique, inverse = self._group(by)
+        if mask is not None:
+            inverse = inverse[mask]
+            values = [value[mask] for value in values]
+
+        sums = [np.bincount(inverse, weights=value, minlength=len(unique)) for value in values]
+        if mask is not None:
+            # values of the column without selected rows
+            present = np.bincount(inverse, minlength=len(unique)) > 0
+            unique, sums = unique[present], [value[present] for value in sums]
+
+        return unique.tolist(), sums
+
+    def filter(self, mask: np.ndarray) -> 'ResultsTable':
+        """Returns the rows selected by a boolean ``mask``, e.g. ``table.filter(table['passed'] == 0)``."""
+        return ResultsTable({name: values[mask] for name, values in self.columns.items()})
+
+    def groupby(self, by: str) -> dict[Any, 'ResultsTable']:
+        """Returns the rows of every value of the ``by`` column."""
+        unique, inverse = self._group(by)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+
+        return {
+            key.item(): self.filter(order[start:end])
+            for key, start, end in zip(unique, bounds[:-1], bounds[1:])
+        }
+
+    # ==== Aggregations ====
+
+    def pass_rates(self, by: str = 'criterion') -> dict[Any, float]:
+        """Returns the share of passed binary results per value of the ``by`` column."""
+        passed = self['passed']
+        keys, (passed, counts) = self._group_sums(by, passed, np.ones(len(self)), mask=~np.isnan(passed))
+
+        return dict(zip(keys, (passed / counts).tolist()))
+
+    def scores(self, by: str = 'document_id', norm: bool = False, max_score: float | None = None) -> dict[Any, float]:
+        """
+        Returns the score per value of the ``by`` column: the number of passed binary criteria plus the sum of
+        numeric scores, like ``graph.score``.
+
+        :param norm: If True, divides scores by the total weight of their rows, i.e. returns pass rates of binary
+            results and weighted means of numeric results.
+        :param max_score: If provided, divides scores by it.
+        """
+        keys, (scores, weights) = self._group_sums(by, self['score'], self['weight'])
+        if norm:
+            scores = np.divide(scores, weights, out=np.zeros_like(scores), where=weights != 0)
+        if max_score:
+            scores = scores / max_score
+
+        return dict(zip(keys, scores.tolist()))
+
+    def binary_scores(self, by: str = 'document_id') -> dict[Any, bool]:
+        """Returns ``True`` per value of the ``by`` column if all of its binary results passed."""
+        keys, (failed,) = self._group_sums(by, self['passed'] == 0)
+        return dict(zip(keys, (failed == 0).tolist()))
+
+    # ==== Export ====
+
+    def to_arrow(self) -> Any:
+        """Returns the table as a ``pyarrow.Table``, ``passed`` becomes a boolean column with nulls."""
+        import pyarrow as pa
+
+        arrays = {name: pa.array(values) for name, values in self.columns.items() if name != 'passed'}
+        passed = self['passed']
+        arrays['passed'] = pa.array(passed == 1, mask=np.isnan(passed))
+
+        return pa.table({name: arrays[name] for name in self.columns})
+
+    def to_parquet(self, path: str | Path, **kwargs) -> None:
+        """Writes the table to a Parquet file, ``kwargs`` are passed to ``pyarrow.parquet.write_table``."""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+    @classmethod
+    def from_parquet(cls, path: str | Path) -> 'ResultsTable':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        return cls({
+            name: (
+                # nulls of the boolean column become NaN
+                table.column(name).cast(pa.float64()) if name == 'passed' else table.column(name)
+            ).to_numpy(zero_copy_only=False)
+            for name in table.column_names
+        })
+
+
+def concat(tables: Iterable[ResultsTable]) -> ResultsTable:
+    """Returns the rows of ``tables`` in a single table, e.g. to merge results of several runs."""
+    tables = list(tables)
+    return ResultsTable({
+        name: np.concatenate([table[name] for table in tables])
+        for name in tables[0].columns
+    })
@@ -0,0 +1,20 @@
+import importlib
+
+from pydantic import BaseModel
+
+
+def dump_output(item: BaseModel) -> dict:
+    """Serializes a node result, keeping the path of its output format class to load it back."""
+    return {
+        'type': f'{type(item).__module__}:{type(item).__qualname__}',
+        'data': item.model_dump(mode='json')
+    }
+
+
+def load_output(dump: dict) -> BaseModel:
+    module, qualname = dump['type'].split(':')
+    output_format = importlib.import_module(module)
+    for name in qualname.split('.'):
+        output_format = getattr(output_format, name)
+
+    return output_format.model_validate(dump['data'])
@@ -0,0 +1,84 @@
+"""
+Microbenchmark of the per-request CPU work saved by ``AsyncBaseStarGraph.compile``.
+
+Compares, per node request, building the messages from scratch with reusing the compiled ones, converting
+output formats to strict JSON schemas with reusing the converted parameters, and hashing requests (as
+``CachedChatModel`` and ``SingleFlightChatModel`` do) with and without cached schemas.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_compile
+    python -m benchmarks.bench_compile --number 20000
+"""
+import argparse
+import timeit
+from typing import Callable
+
+from asgm.models.fake import FakeChatModel
+from asgm.models.hashing import request_key
+from asgm.models.openai import strict_json_schema, text_format_param
+from asgm.nodes import AsyncBinaryNode, AsyncNonBinaryNode, AsyncPackedBinaryNode
+
+CONTENT = 'fake content ' * 200
+
+
+def per_call(func: Callable[[], object], number: int) -> float:
+    """Returns the best per-call time in microseconds over 5 repeats."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def uncached_request_key(model, input, text_format) -> str:
+    # the schema used to be generated on every request
+    text_format.model_json_schema()
+    return request_key(model, 'acreate_structured_completion', input, text_format=text_format, temperature=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=5000, help='calls per measurement')
+    args = parser.parse_args()
+
+    model = FakeChatModel()
+    nodes = {
+        'binary': AsyncBinaryNode(criterion='The content is polite.'),
+        'non-binary': AsyncNonBinaryNode(
+            criterion='The content is polite.',
+            verdicts=['0 rude', '5 neutral', '10 kind']
+        ),
+        'packed x8': AsyncPackedBinaryNode([AsyncBinaryNode(criterion=f'criterion {i}') for i in range(8)]),
+    }
+
+    print(f'{"node":<12}{"step":<14}{"before (us)":>14}{"after (us)":>14}{"saved":>8}')
+    for name, node in nodes.items():
+        text_format = node.OutputFormat
+        node._compiled = None
+        input = node._messages(CONTENT)
+
+        def key() -> str:
+            return request_key(model, 'acreate_structured_completion', input, text_format=text_format, temperature=0)
+
+        cases = {
+            'messages': (
+                lambda: node._messages(CONTENT),
+                lambda: node._messages(CONTENT),
+            ),
+            'text format': (
+                lambda: strict_json_schema(text_format),
+                lambda: text_format_param(text_format),
+            ),
+            'request key': (
+                lambda: uncached_request_key(model, input, text_format),
+                key,
+            ),
+        }
+
+        for step, (before, after) in cases.items():
+            node._compiled = None
+            before_us = per_call(before, args.number)
+            node.compile(model)
+            after_us = per_call(after, args.number)
+            print(f'{name:<12}{step:<14}{before_us:>14.2f}{after_us:>14.2f}{1 - after_us / before_us:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
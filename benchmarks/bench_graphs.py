@@ -0,0 +1,155 @@
+"""
+Offline benchmarks of graph evaluation against ``SimulatedChatModel``.
+
+Measures throughput, p50/p99 node call latency (including the wait for a concurrency slot), scheduling overhead
+and peak memory of ``AsyncBinaryStarGraph`` and ``AsyncNonBinaryStarGraph`` across graph sizes, corpus sizes
+and concurrency settings. Results are stored in ``benchmarks/results/<commit>.json`` to compare commits.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_graphs --quick
+    python -m benchmarks.bench_graphs --compare <commit>
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+from asgm.graphs import AsyncBinaryStarGraph, AsyncNonBinaryStarGraph
+from asgm.instrumentation import EventLog
+from asgm.models.ratelimit import RateLimitedChatModel
+from asgm.models.simulated import SimulatedChatModel, lognormal
+from asgm.nodes import AsyncBinaryNode, AsyncNonBinaryNode
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def build_graph(kind: str, size: int, model) -> AsyncBinaryStarGraph | AsyncNonBinaryStarGraph:
+    if kind == 'binary':
+        return AsyncBinaryStarGraph(
+            children=[AsyncBinaryNode(criterion=f'criterion {i}') for i in range(size)],
+            model=model
+        )
+
+    return AsyncNonBinaryStarGraph(
+        children=[AsyncNonBinaryNode(criterion=f'criterion {i}', verdicts=['0', '10']) for i in range(size)],
+        model=model
+    )
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.
+
+
+async def run_case(
+        kind: str,
+        graph_size: int,
+        corpus_size: int,
+        concurrency: int,
+        latency: float,
+        rate_limit_rate: float,
+        seed: int = 0
+) -> dict:
+    simulated = SimulatedChatModel(latency=lognormal(latency, .3), rate_limit_rate=rate_limit_rate, seed=seed)
+    model = RateLimitedChatModel(simulated, base_delay=.001) if rate_limit_rate else simulated
+    log = EventLog(max_events=None)
+    graph = build_graph(kind, graph_size, model)
+    graph.instruments = [log]
+    contents = (f'document {i} ' * 50 for i in range(corpus_size))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    async for _ in graph.iter_eval_many(contents, max_concurrency=concurrency):
+        pass
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = corpus_size * graph_size
+    latencies = [event.wall_time + event.queue_wait for event in log.events]
+    # the lowest possible run time given the simulated latencies and the concurrency bound
+    ideal = sum(event.wall_time for event in log.events) / concurrency
+
+    return {
+        'graph': kind,
+        'graph_size': graph_size,
+        'corpus_size': corpus_size,
+        'concurrency': concurrency,
+        'latency': latency,
+        'rate_limit_rate': rate_limit_rate,
+        'elapsed': elapsed,
+        'docs_per_second': corpus_size / elapsed,
+        'calls_per_second': calls / elapsed,
+        'p50': percentile(latencies, .5),
+        'p99': percentile(latencies, .99),
+        'overhead_ratio': elapsed / ideal if ideal else 0.,
+        'max_in_flight': simulated.max_in_flight,
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def case_key(result: dict) -> tuple:
+    return tuple(result[key] for key in ('graph', 'graph_size', 'corpus_size', 'concurrency', 'rate_limit_rate'))
+
+
+def compare(results: list[dict], baseline: list[dict]) -> None:
+    baseline = {case_key(result): result for result in baseline}
+    for result in results:
+        if (base := baseline.get(case_key(result))) is None:
+            continue
+
+        throughput = result['calls_per_second'] / base['calls_per_second'] - 1
+        p99 = result['p99'] / base['p99'] - 1 if base['p99'] else 0.
+        print(f'{case_key(result)}: throughput {throughput:+.1%}, p99 {p99:+.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='Run a reduced grid.')
+    parser.add_argument('--latency', type=float, default=.005, help='Median simulated latency in seconds.')
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='Share of simulated 429 responses.')
+    parser.add_argument('--compare', help='Commit of stored results to compare against.')
+    parser.add_argument('--output', type=Path, default=RESULTS_DIR, help='Directory of stored results.')
+    args = parser.parse_args()
+
+    if args.quick:
+        grid = itertools.product(['binary', 'non_binary'], [1, 10], [100], [8, 64])
+    else:
+        grid = itertools.product(['binary', 'non_binary'], [1, 5, 20], [100, 1000], [8, 64, 256])
+
+    results = []
+    for kind, graph_size, corpus_size, concurrency in grid:
+        result = asyncio.run(
+            run_case(kind, graph_size, corpus_size, concurrency, args.latency, args.rate_limit_rate)
+        )
+        results.append(result)
+        print(
+            f'{kind:>10} size={graph_size:<3} corpus={corpus_size:<5} concurrency={concurrency:<4} '
+            f'{result["calls_per_second"]:>9.0f} calls/s  p50={result["p50"] * 1000:.1f}ms  '
+            f'p99={result["p99"] * 1000:.1f}ms  overhead={result["overhead_ratio"]:.2f}x  '
+            f'peak={result["peak_memory_mb"]:.1f}MB'
+        )
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    path = args.output / f'{commit()}.json'
+    path.write_text(json.dumps(results, indent=2))
+    print(f'Results stored in {path}')
+
+    if args.compare:
+        compare(results, json.loads((args.output / f'{args.compare}.json').read_text()))
+
+
+if __name__ == '__main__':
+    main()
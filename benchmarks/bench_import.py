@@ -0,0 +1,87 @@
+"""
+Cold import time of the common entry points, measured with ``python -X importtime`` in fresh interpreters.
+
+For every entry point, reports the median cumulative import time over ``--runs`` interpreters and the heaviest
+modules it pulls in. Modules already loaded at interpreter startup (e.g. by ``site``) are not counted.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --runs 20 asgm.graphs asgm.models.openai
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    'asgm',
+    'asgm.models',
+    'asgm.nodes',
+    'asgm.graphs',
+    'asgm.jobs',
+    'asgm.models.fake',
+    'asgm.models.openai',
+]
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_times(module: str) -> tuple[int, dict[str, int]]:
+    """
+    Imports ``module`` in a fresh interpreter, returns the cumulative import time in microseconds
+    and the cumulative time of every top-level package imported on the way.
+    """
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # the ``-c`` import runs last, its modules follow the last module imported at startup
+    lines = [match.groups() for line in res.stderr.splitlines() if (match := LINE.match(line))]
+    startup = [i for i, (*_, name) in enumerate(lines) if name in ('site', 'sitecustomize', 'usercustomize')]
+    lines = lines[max(startup, default=-1) + 1:]
+
+    total = sum(int(cumulative) for _, cumulative, indent, _ in lines if not indent)
+    packages: dict[str, int] = {}
+    # lines are printed after the modules they import, reversed they list importers first
+    stack: list[tuple[int, str]] = []
+    for _, cumulative, indent, name in reversed(lines):
+        while stack and stack[-1][0] >= len(indent):
+            stack.pop()
+
+        package = name.split('.')[0]
+        # count a package where it is entered, not again for its own submodules
+        if package != 'asgm' and (not stack or stack[-1][1] != package):
+            packages[package] = packages.get(package, 0) + int(cumulative)
+
+        stack.append((len(indent), package))
+
+    return total, packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS, help='entry points to import')
+    parser.add_argument('--runs', type=int, default=10, help='interpreters per entry point')
+    parser.add_argument('--top', type=int, default=3, help='heaviest dependencies to report')
+    args = parser.parse_args()
+
+    print(f'{"entry point":<22}{"median (ms)":>12}  heaviest dependencies (ms)')
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        median = statistics.median(total for total, _ in runs)
+        packages = runs[len(runs) // 2][1]
+        heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+        print(
+            f'{module:<22}{median / 1000:>12.1f}  '
+            + ', '.join(f'{name} {time / 1000:.1f}' for name, time in heaviest)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+End-to-end load test of graph evaluation through ``OpenAIModel`` against a local ``ReplayServer``.
+
+Requests go through the real client stack (HTTP connections, client pools, retries), and the server answers
+with the outputs, usage and latencies of recordings. The server runs in its own process, so it does not compete
+with the client for the GIL. Without ``--recordings``, a run of ``SimulatedChatModel`` with a lognormal latency
+profile is recorded first, so the benchmark runs on an offline machine.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_replay
+    python -m benchmarks.bench_replay --recordings recordings.jsonl --corpus 2000 --concurrency 16 64 256
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from asgm.instrumentation import EventLog
+from asgm.models.openai import OpenAIModel
+from asgm.models.recording import RecordingChatModel
+from asgm.models.simulated import SimulatedChatModel, lognormal
+
+from .bench_graphs import build_graph, percentile
+
+
+def record(path: Path, graph_size: int, latency: float) -> None:
+    recorder = RecordingChatModel(SimulatedChatModel(latency=lognormal(latency, .3), seed=0), path=path)
+    graph = build_graph('binary', graph_size, recorder)
+    asyncio.run(graph.eval_many([f'recorded document {i} ' * 50 for i in range(20)], max_concurrency=64))
+
+
+def stats(url: str, reset: bool = False) -> dict[str, int]:
+    with urllib.request.urlopen(url.removesuffix('/v1') + '/stats' + ('?reset=1' if reset else '')) as res:
+        return json.load(res)
+
+
+async def run_case(
+        url: str,
+        graph_size: int,
+        corpus_size: int,
+        concurrency: int,
+        max_connections: int
+) -> dict:
+    model = OpenAIModel(
+        model='replay',
+        base_url=url,
+        api_key='replay',
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections
+    )
+    log = EventLog(max_events=None)
+    graph = build_graph('binary', graph_size, model)
+    graph.instruments = [log]
+    documents = (f'document {i} ' * 50 for i in range(corpus_size))
+    before = stats(url, reset=True)
+
+    start = time.perf_counter()
+    async for _ in graph.iter_eval_many(documents, max_concurrency=concurrency):
+        pass
+    elapsed = time.perf_counter() - start
+    await model.aclose()
+
+    after = stats(url)
+    latencies = [event.wall_time + event.queue_wait for event in log.events]
+    return {
+        'calls_per_second': (after['requests'] - before['requests']) / elapsed,
+        'p50': percentile(latencies, .5),
+        'p99': percentile(latencies, .99),
+        'errors': sum(event.error is not None for event in log.events),
+        'max_in_flight': after['max_in_flight'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recordings', type=Path, help='JSONL file written by RecordingChatModel.')
+    parser.add_argument('--latency', type=float, default=.05, help='Median latency of the recorded simulated run.')
+    parser.add_argument('--latency-scale', type=float, default=1, help='Factor of the recorded latencies.')
+    parser.add_argument('--graph-size', type=int, default=5)
+    parser.add_argument('--corpus', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256])
+    parser.add_argument('--max-connections', type=int, nargs='+', default=[20, 100])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = args.recordings
+        if recordings is None:
+            recordings = Path(tmp) / 'recordings.jsonl'
+            record(recordings, args.graph_size, args.latency)
+
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'asgm.models.replay_server', str(recordings),
+                '--port', '0', '--latency-scale', str(args.latency_scale),
+            ],
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        try:
+            # the server prints its base URL once it listens
+            url = server.stdout.readline().strip()
+            for max_connections in args.max_connections:
+                for concurrency in args.concurrency:
+                    result = asyncio.run(run_case(url, args.graph_size, args.corpus, concurrency, max_connections))
+                    print(
+                        f'connections={max_connections:<4} concurrency={concurrency:<4} '
+                        f'{result["calls_per_second"]:>8.0f} calls/s  p50={result["p50"] * 1000:.1f}ms  '
+                        f'p99={result["p99"] * 1000:.1f}ms  server in flight={result["max_in_flight"]:<4} '
+                        f'errors={result["errors"]}'
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from asgm.dedup import NearDuplicateCache
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.batch import BatchRunner, LocalBatchEndpoint
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import AsyncBinaryNode
+
+
+def responder(body: dict) -> str:
+    # passes the criterion if the content is 'good content'
+    content = body['input'][-1]['content']
+    return json.dumps({'pass_': content == 'good content', 'reason': 'batch'})
+
+
+async def test_batch_runner_maps_batch_results_to_graph_scores(tmp_path):
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        model=FakeChatModel(pass_=False, reason='fake')
+    )
+    endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+    runner = BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run', poll_interval=0)
+
+    res = await runner.run(graph, ['good content', 'bad content'])
+
+    assert [graph.binary_score(evaluation) for evaluation in res] == [True, False]
+    assert res[0][0] == AsyncBinaryNode.OutputFormat(pass_=True, reason='batch')
+    assert endpoint.submitted == 1
+    # the original model is restored
+    assert isinstance(graph.model, FakeChatModel)
+
+
+async def test_batch_runner_resumes_without_resubmitting(tmp_path):
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion')],
+        model=FakeChatModel(pass_=False, reason='fake')
+    )
+    endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+    await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run', poll_interval=0).run(
+        graph, ['good content']
+    )
+
+    # a new runner over the same directory, e.g. after a crash
+    resumed_endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+    res = await BatchRunner('fake-model', endpoint=resumed_endpoint, directory=tmp_path / 'run').run(
+        graph, ['good content']
+    )
+
+    assert resumed_endpoint.submitted == 0
+    assert graph.binary_score(res[0]) is True
+
+
+async def test_batch_runner_does_not_reuse_placeholders_of_the_collect_pass(tmp_path):
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion')],
+        model=FakeChatModel(pass_=False, reason='fake'),
+        result_cache=NearDuplicateCache()
+    )
+    endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+
+    res = await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run', poll_interval=0).run(
+        graph, ['good content']
+    )
+
+    assert res == [[AsyncBinaryNode.OutputFormat(pass_=True, reason='batch')]]
+
+
+class ExpiringBatchEndpoint(LocalBatchEndpoint):
+    """Processes the first request of the first batch only, then reports it as expired."""
+
+    def status(self, batch_id: str) -> str:
+        super().status(batch_id)
+        if batch_id != 'local-batch-0':
+            return 'completed'
+
+        output = self.directory / f'{batch_id}.output.jsonl'
+        output.write_text(output.read_text().splitlines(keepends=True)[0])
+        return 'expired'
+
+
+async def test_batch_runner_keeps_partial_results_of_expired_batches_and_resubmits_the_rest(tmp_path):
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        model=FakeChatModel(pass_=False, reason='fake')
+    )
+    endpoint = ExpiringBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+
+    res = await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run', poll_interval=0).run(
+        graph, ['good content']
+    )
+
+    assert res == [[AsyncBinaryNode.OutputFormat(pass_=True, reason='batch')] * 2]
+    # the second batch only holds the request the first one did not process
+    assert endpoint.submitted == 2
+    assert len((tmp_path / 'endpoint' / 'local-batch-1.input.jsonl').read_text().splitlines()) == 1
+
+
+async def test_batch_runner_raises_on_failed_batches_and_resubmits_them(tmp_path):
+    class FailingBatchEndpoint(LocalBatchEndpoint):
+        def status(self, batch_id: str) -> str:
+            return 'failed'
+
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion')],
+        model=FakeChatModel(pass_=False, reason='fake')
+    )
+    with pytest.raises(RuntimeError):
+        await BatchRunner(
+            'fake-model',
+            endpoint=FailingBatchEndpoint(tmp_path / 'endpoint', responder=responder),
+            directory=tmp_path / 'run',
+            poll_interval=0
+        ).run(graph, ['good content'])
+
+    endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+    res = await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run').run(graph, ['good content'])
+
+    assert endpoint.submitted == 1
+    assert graph.binary_score(res[0]) is True
+
+
+async def test_batch_runner_does_not_keep_interrupted_results_files(tmp_path, monkeypatch):
+    write_text = Path.write_text
+
+    def interrupted_write_text(self, data, *args, **kwargs):
+        if self.name.startswith('results-'):
+            write_text(self, data[:len(data) // 2])
+            raise OSError('No space left on device')
+
+        return write_text(self, data, *args, **kwargs)
+
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        model=FakeChatModel(pass_=False, reason='fake')
+    )
+    endpoint = LocalBatchEndpoint(tmp_path / 'endpoint', responder=responder)
+    monkeypatch.setattr(Path, 'write_text', interrupted_write_text)
+    with pytest.raises(OSError):
+        await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run', poll_interval=0).run(
+            graph, ['good content']
+        )
+
+    monkeypatch.setattr(Path, 'write_text', write_text)
+    res = await BatchRunner('fake-model', endpoint=endpoint, directory=tmp_path / 'run').run(graph, ['good content'])
+
+    assert res == [[AsyncBinaryNode.OutputFormat(pass_=True, reason='batch')] * 2]
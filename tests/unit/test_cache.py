@@ -0,0 +1,72 @@
+from asgm.graphs import AsyncNonBinaryStarGraph
+from asgm.models.cache import CachedChatModel, InMemoryCache, SQLiteCache
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import AsyncNonBinaryNode
+
+
+class CountingFakeChatModel(FakeChatModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        self.calls += 1
+        return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+
+async def test_cached_model_returns_cached_weighted_results():
+    fake_model = CountingFakeChatModel(score=1, reason='fake')
+    cached_model = CachedChatModel(fake_model)
+    graph = AsyncNonBinaryStarGraph(
+        children=[AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict'], weight=2)],
+        model=cached_model
+    )
+
+    await graph.eval('fake content')
+    res = await graph.eval('fake content')
+
+    # the weight is applied to a fresh copy, not to the cached entry
+    assert res == [AsyncNonBinaryNode.OutputFormat(score=2, reason='fake')]
+    assert fake_model.calls == 1
+    assert (cached_model.hits, cached_model.misses) == (1, 1)
+
+    await graph.eval('other fake content')
+    assert fake_model.calls == 2
+
+
+async def test_cached_model_does_not_cache_parsing_errors():
+    fake_model = CountingFakeChatModel(parsing_error=True)
+    cached_model = CachedChatModel(fake_model)
+    graph = AsyncNonBinaryStarGraph(
+        children=[AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict'])],
+        model=cached_model
+    )
+
+    await graph.eval('fake content')
+    await graph.eval('fake content')
+
+    assert fake_model.calls == 2
+
+
+def test_in_memory_cache_evicts_least_recently_used_and_expired_entries():
+    cache = InMemoryCache(max_size=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.get('a')
+    cache.set('c', '3')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == '1'
+
+    expiring_cache = InMemoryCache(ttl=0)
+    expiring_cache.set('a', '1')
+    assert expiring_cache.get('a') is None
+
+
+def test_sqlite_cache_persists_between_instances(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    cache = SQLiteCache(path)
+    cache.set('a', '1')
+    cache.close()
+
+    assert SQLiteCache(path).get('a') == '1'
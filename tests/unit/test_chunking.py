@@ -0,0 +1,86 @@
+import pytest
+
+from asgm.chunking import split_chunks
+from asgm.graphs import AsyncBinaryStarGraph, AsyncNonBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.models.tokens import count_tokens
+from asgm.nodes import AsyncBinaryNode, AsyncChunkedNode, AsyncNonBinaryNode
+
+
+class ChunkFakeChatModel(FakeChatModel):
+    """Fails binary criteria and scores 10 on chunks mentioning ``'violation'``."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        self.calls += 1
+        flagged = 'violation' in input[-1]['content']
+        if 'pass_' in text_format.model_fields:
+            return text_format(pass_=not flagged, reason='flagged' if flagged else 'fine')
+
+        return text_format(score=10 if flagged else 0, reason='flagged' if flagged else 'fine')
+
+
+def test_split_chunks_bounds_tokens_and_keeps_words():
+    content = ' '.join(f'word{i}' for i in range(1000))
+
+    chunks = split_chunks(content, max_tokens=100, overlap=10)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.split()[-1].startswith('word') for chunk in chunks)
+    assert split_chunks('short content', max_tokens=100) == ['short content']
+
+
+async def test_chunked_binary_node_fails_on_any_failing_chunk_and_caches_chunks():
+    model = ChunkFakeChatModel()
+    node = AsyncChunkedNode(AsyncBinaryNode(criterion='fake criterion'), max_tokens=50)
+    graph = AsyncBinaryStarGraph(children=[node], model=model)
+    boilerplate = 'boilerplate ' * 50
+
+    res = await graph.eval(boilerplate + 'a violation ' + 'fine ' * 30)
+    await graph.eval(boilerplate + 'fine ' * 40)
+
+    assert res[0] == AsyncBinaryNode.OutputFormat(pass_=False, reason='Chunk 4 of 4: flagged')
+    assert graph.evaluation[0].pass_
+    # 9 chunks, the repeated boilerplate chunk is evaluated once
+    assert model.calls == 4
+
+
+async def test_chunked_non_binary_node_aggregates_scores():
+    content = 'fine ' * 100 + 'violation ' + 'fine ' * 100
+    scores = {}
+    for aggregate in ('max', 'mean', 'weighted'):
+        node = AsyncChunkedNode(
+            AsyncNonBinaryNode(criterion='fake criterion', verdicts=['0', '10']),
+            max_tokens=50,
+            aggregate=aggregate
+        )
+        graph = AsyncNonBinaryStarGraph(children=[node], model=ChunkFakeChatModel())
+        scores[aggregate] = graph.score(evaluation=await graph.eval(content))
+
+    assert scores['max'] == 10
+    assert 0 < scores['mean'] < 10 and 0 < scores['weighted'] < 10
+
+
+def test_split_chunks_keeps_multibyte_characters_split_across_tokens(monkeypatch):
+    tiktoken = pytest.importorskip('tiktoken')
+    # one token per byte, so every non-ASCII character is split across tokens
+    encoding = tiktoken.Encoding(
+        name='bytes',
+        pat_str=r'.',
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={}
+    )
+    monkeypatch.setattr('asgm.chunking.tokenizer', lambda: encoding)
+    content = 'déjà vu, 日本語 😀 ' * 20
+
+    chunks = split_chunks(content, max_tokens=7, overlap=2)
+
+    assert '�' not in ''.join(chunks)
+    # a character split at a chunk border starts the next chunk, which takes at most 3 more bytes
+    assert all(len(chunk.encode()) <= 7 + 3 for chunk in chunks)
+    # without overlap, the chunks are the content
+    assert ''.join(split_chunks(content, max_tokens=7)) == content
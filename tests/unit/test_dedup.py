@@ -0,0 +1,107 @@
+from asgm.dedup import NearDuplicateCache, Reused, normalize
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import AsyncBinaryNode
+
+TEMPLATE = 'Order {id} was shipped on {date} to the customer. ' + ' '.join(f'word{i}' for i in range(200))
+
+
+class CountingChatModel(FakeChatModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    async def acreate_structured_completion(self, *args, **kwargs):
+        self.calls += 1
+        return await super().acreate_structured_completion(*args, **kwargs)
+
+
+def test_normalize_replaces_volatile_tokens():
+    assert normalize('Order  42 on 2024-01-02 ') == normalize('order 7 on 2025-12-31')
+
+
+def test_near_duplicate_cache_matches_similar_contents_only():
+    cache = NearDuplicateCache(threshold=.8)
+    source = cache.add(TEMPLATE.format(id=1, date='2024-01-01'), {'key': Reused(source='', similarity=0)})
+
+    exact = cache.lookup(TEMPLATE.format(id=2, date='2024-02-02'))
+    near = cache.lookup(TEMPLATE.format(id=1, date='2024-01-01').replace('word100', 'other'))
+
+    assert exact.source == source and exact.similarity == 1
+    assert near.source == source and .8 <= near.similarity < 1
+    assert cache.lookup('an unrelated content') is None
+    assert cache.hit_rate == 2 / 3
+
+
+async def test_graph_reuses_results_of_near_duplicates_with_provenance():
+    model = CountingChatModel(pass_=True, reason='fake')
+    cache = NearDuplicateCache()
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion 1')],
+        model=model,
+        result_cache=cache
+    )
+    await graph.eval(TEMPLATE.format(id=1, date='2024-01-01'))
+    assert graph.provenance == [None]
+
+    # a graph sharing the cache reuses the known criterion and evaluates the new one
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion 1'), AsyncBinaryNode(criterion='fake criterion 2')],
+        model=model,
+        result_cache=cache
+    )
+    res = await graph.eval(TEMPLATE.format(id=2, date='2024-02-02'))
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')] * 2
+    assert model.calls == 2
+    assert graph.provenance[0].similarity == 1 and graph.provenance[1] is None
+
+
+async def test_graphs_sharing_a_cache_do_not_reuse_results_of_other_models():
+    class NamedChatModel(CountingChatModel):
+        def __init__(self, model: str, **kwargs):
+            super().__init__(**kwargs)
+            self.model = model
+
+    cache = NearDuplicateCache()
+    cheap = NamedChatModel('cheap', pass_=False, reason='cheap')
+    strong = NamedChatModel('strong', pass_=True, reason='strong')
+    for model in (cheap, strong):
+        graph = AsyncBinaryStarGraph(
+            children=[AsyncBinaryNode(criterion='fake criterion')],
+            model=model,
+            result_cache=cache
+        )
+        res = await graph.eval(TEMPLATE.format(id=1, date='2024-01-01'))
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=True, reason='strong')]
+    assert cheap.calls == strong.calls == 1
+
+
+async def test_eval_many_reuses_results_of_near_duplicates():
+    model = CountingChatModel(pass_=True, reason='fake')
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion')],
+        model=model,
+        result_cache=NearDuplicateCache()
+    )
+    await graph.eval(TEMPLATE.format(id=1, date='2024-01-01'))
+
+    res = await graph.eval_many([TEMPLATE.format(id=i, date='2024-02-02') for i in range(3)])
+
+    assert res == [[AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')]] * 3
+    assert model.calls == 1
+
+
+async def test_graph_does_not_cache_parse_failures():
+    cache = NearDuplicateCache()
+    for model in (FakeChatModel(parsing_error=True), FakeChatModel(pass_=True, reason='fake')):
+        graph = AsyncBinaryStarGraph(
+            children=[AsyncBinaryNode(criterion='fake criterion')],
+            model=model,
+            result_cache=cache
+        )
+        res = await graph.eval(TEMPLATE.format(id=1, date='2024-01-01'))
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')]
+    assert graph.provenance == [None]
@@ -0,0 +1,77 @@
+import pytest
+
+from asgm.distributed import DistributedRunner, SharedRateLimiter, SQLiteWorkQueue, run_worker
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import AsyncBinaryNode
+
+
+def graph_factory() -> AsyncBinaryStarGraph:
+    return AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        model=FakeChatModel(pass_=True, reason='fake')
+    )
+
+
+def test_distributed_runner_returns_results_by_corpus_index(tmp_path):
+    runner = DistributedRunner(graph_factory, tmp_path / 'queue.sqlite', workers=2, batch_size=3, rpm=60_000)
+
+    res = runner.run(f'content {i}' for i in range(10))
+
+    assert sorted(res) == list(range(10))
+    assert res[0] == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')] * 2
+
+
+def test_worker_evaluates_tasks_of_crashed_workers_once_their_lease_expires(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path / 'queue.sqlite', lease=.2)
+    queue.put(f'content {i}' for i in range(5))
+    # a crashed worker claimed two tasks and never completed them
+    queue.claim('crashed worker', 2)
+
+    assert run_worker(graph_factory, tmp_path / 'queue.sqlite', batch_size=2, lease=.2, poll_interval=.05) == 5
+    assert queue.remaining() == 0
+
+
+def test_sqlite_work_queue_reclaims_expired_leases(tmp_path):
+    queue = SQLiteWorkQueue(tmp_path / 'queue.sqlite', lease=0)
+    queue.put(['a', 'b'])
+
+    assert queue.claim('worker 1', 1) == [(0, 'a')]
+    # the lease of the first worker expired, e.g. it crashed
+    assert queue.claim('worker 2', 2) == [(0, 'a'), (1, 'b')]
+
+    queue.complete([(0, 'result')])
+    assert queue.results() == [(0, 'result')]
+    assert queue.remaining() == 1
+
+
+def test_shared_rate_limiter_shares_budget_between_instances(tmp_path):
+    first = SharedRateLimiter(tmp_path / 'limits.sqlite', rpm=60)
+    second = SharedRateLimiter(tmp_path / 'limits.sqlite', rpm=60)
+
+    assert first.reserve() == 0
+    # the only request of the current second was taken by the other limiter
+    assert second.reserve() == pytest.approx(1, abs=.1)
+
+    second.on_rate_limit()
+    assert first.requests.rate == pytest.approx(.5)
+
+
+def test_shared_rate_limiter_takes_changed_limits_and_resets_adapted_rates(tmp_path):
+    SharedRateLimiter(tmp_path / 'limits.sqlite', rpm=60, tpm=60).on_rate_limit()
+
+    limiter = SharedRateLimiter(tmp_path / 'limits.sqlite', rpm=6000, tpm=60)
+    # the changed limit is taken, the unchanged one keeps its adapted rate until reset
+    assert limiter.requests.rate == limiter.requests.max_rate == 100
+    assert limiter.tokens.rate == pytest.approx(.5)
+
+    limiter.reset()
+    assert limiter.tokens.rate == 1
+
+
+def test_shared_rate_limiter_charges_reservations_above_capacity_in_full(tmp_path):
+    limiter = SharedRateLimiter(tmp_path / 'limits.sqlite', tpm=60_000)
+
+    delays = [limiter.reserve(tokens=10_000) for _ in range(10)]
+
+    assert delays[-1] == pytest.approx((10 * 10_000 - 1_000) / 1_000, abs=.1)
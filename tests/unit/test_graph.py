@@ -1,14 +1,19 @@
+import asyncio
+
 from asgm.nodes import (
     AsyncBinaryNode,
     AsyncNonBinaryNode,
-    AsyncNonBinaryToolCallNode
+    AsyncNonBinaryToolCallNode,
+    AsyncPackedBinaryNode
 )
 from asgm.graphs import (
     AsyncBinaryStarGraph,
-    AsyncNonBinaryStarGraph
+    AsyncNonBinaryStarGraph,
+    PartialScore
 )
 from asgm.models.fake import FakeChatModel
 from asgm.models.types import Tool
+from asgm.models.usage import Usage, record_usage
 
 
 async def test_async_binary_graph():
@@ -144,3 +149,365 @@ async def test_async_non_binary_graph_handles_parsing_errors_gracefully():
         AsyncNonBinaryNode.OutputFormat(score=0, reason='Unable to parse model response.'),
         AsyncNonBinaryNode.OutputFormat(score=0, reason='Unable to parse model response.')
     ]
+
+
+async def test_async_binary_graph_eval_many_preserves_order_and_bounds_concurrency():
+    class CountingFakeChatModel(FakeChatModel):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        async def acreate_structured_completion(self, input, text_format, **kwargs):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.001)
+            self.in_flight -= 1
+
+            # echo the content back to check the order of the results
+            return text_format(pass_=True, reason=input[-1]['content'])
+
+    fake_model = CountingFakeChatModel()
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion') for _ in range(3)],
+        model=fake_model
+    )
+
+    res = await graph.eval_many((f'content {i}' for i in range(20)), max_concurrency=4)
+
+    assert [[item.reason for item in evaluation] for evaluation in res] == [[f'content {i}'] * 3 for i in range(20)]
+    assert fake_model.max_in_flight == 4
+    assert graph.evaluation is None
+
+
+async def test_async_binary_graph_iter_eval_many_waits_for_cancelled_evaluations():
+    class SlowFakeChatModel(FakeChatModel):
+        cancelled = 0
+
+        async def acreate_structured_completion(self, input, text_format, **kwargs):
+            try:
+                await asyncio.sleep(0 if input[-1]['content'] == 'content 0' else 1)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+
+            return text_format(pass_=True, reason='fake')
+
+    fake_model = SlowFakeChatModel()
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=fake_model)
+
+    evaluations = graph.iter_eval_many([f'content {i}' for i in range(4)], max_concurrency=4)
+    async for _ in evaluations:
+        break
+    await evaluations.aclose()
+
+    # the outstanding evaluations are cancelled and finished once the consumer closed the iterator
+    assert fake_model.cancelled == 3
+
+
+async def test_async_binary_graph_packed_mode_splits_results_per_criterion():
+    class CountingFakeChatModel(FakeChatModel):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.calls = 0
+
+        async def acreate_structured_completion(self, input, text_format, **kwargs):
+            self.calls += 1
+            return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+    fake_model = CountingFakeChatModel(
+        # resembles OutputFormat of AsyncPackedBinaryNode with two criteria
+        criterion_1={'pass_': True, 'reason': 'fake 1'},
+        criterion_2={'pass_': False, 'reason': 'fake 2'}
+    )
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion') for _ in range(4)],
+        model=fake_model,
+        packed=True,
+        pack_size=2
+    )
+
+    res = await graph.eval('fake content')
+
+    assert res == [
+        AsyncBinaryNode.OutputFormat(pass_=True, reason='fake 1'),
+        AsyncBinaryNode.OutputFormat(pass_=False, reason='fake 2'),
+    ] * 2
+    assert fake_model.calls == 2
+    assert graph.binary_score() is False
+    assert graph.score() == 0.5
+
+    # children appended later are packed as well, the unchanged packs are kept
+    first_pack = graph.packs[0]
+    graph.children += [AsyncBinaryNode(criterion='fake criterion') for _ in range(2)]
+    res = await graph.eval('fake content')
+
+    assert len(res) == 6
+    assert fake_model.calls == 5
+    assert graph.packs[0] is first_pack
+
+
+async def test_async_packed_binary_node_handles_parsing_errors_gracefully():
+    node = AsyncPackedBinaryNode([AsyncBinaryNode(criterion='fake criterion') for _ in range(2)])
+
+    res = await node.eval('fake content', model=FakeChatModel(parsing_error=True))
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=False, reason='Unable to parse model response.')] * 2
+
+
+async def test_async_binary_graph_content_first_layout_shares_prefix_and_reports_usage():
+    class PrefixCachingFakeChatModel(FakeChatModel):
+        """Records usage as if the provider cached the first two messages of every request."""
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.prefixes = set()
+
+        async def acreate_structured_completion(self, input, text_format, **kwargs):
+            prefix = tuple(message['content'] for message in input[:2])
+            record_usage(input_tokens=10, cached_tokens=8 if prefix in self.prefixes else 0, output_tokens=1)
+            self.prefixes.add(prefix)
+
+            return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+    children = [AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(3)]
+    graph = AsyncBinaryStarGraph(
+        children=children,
+        model=PrefixCachingFakeChatModel(pass_=True, reason='fake'),
+        layout='content_first'
+    )
+
+    await graph.eval('fake content')
+
+    assert children[0]._messages('fake content')[1] == {'role': 'user', 'content': 'fake content'}
+    assert graph.usage == Usage(requests=3, input_tokens=30, cached_tokens=16, output_tokens=3)
+
+
+class CriterionFakeChatModel(FakeChatModel):
+    """Fails criteria containing 'fail' and sleeps for criteria containing 'slow'."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        self.cancelled = 0
+
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        criterion = input[1]['content']
+        self.calls.append(criterion)
+        try:
+            await asyncio.sleep(1 if 'slow' in criterion else .01 if 'late' in criterion else 0)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+        return text_format(pass_='fail' not in criterion, reason='fake')
+
+
+async def test_async_binary_graph_short_circuit_cancels_outstanding_calls():
+    fake_model = CriterionFakeChatModel()
+    graph = AsyncBinaryStarGraph(
+        children=[
+            AsyncBinaryNode(criterion='slow criterion'),
+            AsyncBinaryNode(criterion='fail criterion'),
+            AsyncBinaryNode(criterion='criterion'),
+        ],
+        model=fake_model
+    )
+
+    res = await asyncio.wait_for(graph.eval_short_circuit('fake content'), timeout=.5)
+
+    assert res is False
+    assert graph.binary_score() is False
+    assert fake_model.cancelled == 1
+
+
+async def test_async_binary_graph_sequential_short_circuit_orders_by_failure_rate():
+    fake_model = CriterionFakeChatModel()
+    graph = AsyncBinaryStarGraph(
+        children=[
+            AsyncBinaryNode(criterion='criterion'),
+            AsyncBinaryNode(criterion='fail criterion'),
+        ],
+        model=fake_model
+    )
+
+    await graph.eval('fake content')
+    fake_model.calls.clear()
+
+    res = await graph.eval_short_circuit('fake content', mode='sequential')
+
+    # the failing criterion goes first and stops the evaluation
+    assert res is False
+    assert fake_model.calls == ['Evaluation critieria: fail criterion']
+    assert graph.evaluation == [AsyncBinaryNode.OutputFormat(pass_=False, reason='fake')]
+
+
+async def test_async_binary_graph_short_circuit_counts_children_appended_later():
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='criterion')], model=CriterionFakeChatModel())
+    graph.children.append(AsyncBinaryNode(criterion='fail criterion'))
+
+    assert await graph.eval_short_circuit('fake content', mode='sequential') is False
+    assert await graph.eval_short_circuit('fake content') is False
+    assert graph.failure_rate(1) == 1
+
+
+async def test_async_binary_graph_eval_stream_yields_results_as_they_arrive():
+    children = [
+        AsyncBinaryNode(criterion='late criterion'),
+        AsyncBinaryNode(criterion='criterion'),
+    ]
+    graph = AsyncBinaryStarGraph(children=children, model=CriterionFakeChatModel())
+
+    stream = graph.eval_stream('fake content')
+    node, res = await anext(stream)
+
+    assert node is children[1]
+    assert res == AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')
+    assert graph.partial_binary_score() is None
+    assert graph.partial_score() == PartialScore(estimate=1, lower=.5, upper=1, evaluated=1, total=2)
+
+    assert [node async for node, _ in stream] == [children[0]]
+    assert graph.partial_binary_score() is True
+    assert graph.binary_score() is True
+
+
+async def test_async_non_binary_graph_eval_stream_bounds_partial_score():
+    class SlowFirstFakeChatModel(FakeChatModel):
+        async def acreate_structured_completion(self, input, text_format, **kwargs):
+            await asyncio.sleep(.01 if 'late' in input[1]['content'] else 0)
+            return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+    graph = AsyncNonBinaryStarGraph(
+        children=[
+            AsyncNonBinaryNode(criterion='late criterion', verdicts=['fake verdict'], weight=3),
+            AsyncNonBinaryNode(criterion='criterion', verdicts=['fake verdict']),
+        ],
+        model=SlowFirstFakeChatModel(score=1, reason='fake')
+    )
+
+    async for _ in graph.eval_stream('fake content'):
+        break
+
+    assert graph.partial_score(max_node_score=2) == PartialScore(estimate=4, lower=1, upper=7, evaluated=1, total=2)
+    assert graph.partial_score().upper is None
+
+
+class SampledFakeChatModel(FakeChatModel):
+    """Returns the scripted ``outputs`` one after another, one per sample."""
+
+    def __init__(self, outputs):
+        super().__init__()
+        self.outputs = iter(outputs)
+        self.requests = []
+
+    async def acreate_structured_samples(self, input, text_format, n, **kwargs):
+        self.requests.append(n)
+        return [text_format(**next(self.outputs)) for _ in range(n)]
+
+
+async def test_binary_node_sampling_stops_once_samples_agree():
+    model = SampledFakeChatModel([{'pass_': True, 'reason': 'fake'}] * 3)
+    node = AsyncBinaryNode(criterion='fake criterion', samples=9, initial_samples=3)
+
+    res = await node.eval('fake content', model)
+
+    assert res == AsyncBinaryNode.OutputFormat(pass_=True, reason='fake (3 of 3 samples agree)')
+    assert model.requests == [3]
+
+
+async def test_binary_node_sampling_draws_more_samples_on_disagreement():
+    outputs = [{'pass_': pass_, 'reason': str(pass_)} for pass_ in (True, False, True, False, False, False)]
+    model = SampledFakeChatModel(outputs)
+    node = AsyncBinaryNode(criterion='fake criterion', samples=5, initial_samples=3)
+
+    res = await node.eval('fake content', model)
+
+    assert res == AsyncBinaryNode.OutputFormat(pass_=False, reason='False (3 of 5 samples agree)')
+    assert model.requests == [3, 2]
+
+
+async def test_non_binary_node_sampling_aggregates_weighted_median():
+    outputs = [{'score': score, 'reason': str(score)} for score in (1, 3, 2)]
+    model = SampledFakeChatModel(outputs)
+    node = AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict'], weight=2, samples=3)
+
+    res = await node.eval('fake content', model)
+
+    assert res == AsyncNonBinaryNode.OutputFormat(score=4, reason='2 (median of 3 samples)')
+
+
+def test_sync_graph_eval_matches_async_eval():
+    fake_model = FakeChatModel(score=1, reason='fake')
+    children = [
+        AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict', 'fake verdict'], weight=2),
+        AsyncNonBinaryToolCallNode(
+            criterion='fake criterion',
+            tools=[Tool(name='fake', schema=dict(), func=lambda score, reason: score)]
+        )
+    ]
+    graph = AsyncNonBinaryStarGraph(children=children, model=fake_model)
+
+    res = graph.eval_sync('fake content')
+
+    assert res == asyncio.run(graph.eval('fake content'))
+    assert graph.evaluation == res
+    assert graph.score() == 3
+
+
+def test_sync_graph_eval_many_preserves_order_and_bounds_concurrency():
+    import threading
+    import time
+
+    class CountingFakeChatModel(FakeChatModel):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.lock = threading.Lock()
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+        def create_structured_completion(self, input, text_format, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.002)
+            with self.lock:
+                self.in_flight -= 1
+
+            record_usage(input_tokens=10)
+            return text_format(pass_=True, reason=input[-1]['content'])
+
+    fake_model = CountingFakeChatModel()
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion') for _ in range(3)],
+        model=fake_model
+    )
+
+    res = graph.eval_many_sync((f'content {i}' for i in range(20)), max_concurrency=4)
+
+    assert [[item.reason for item in evaluation] for evaluation in res] == [[f'content {i}'] * 3 for i in range(20)]
+    assert 1 < fake_model.max_in_flight <= 4
+    assert graph.usage.requests == 60
+    assert graph.usage.input_tokens == 600
+
+
+def test_compiled_nodes_reuse_messages_until_the_layout_changes():
+    class CompilingFakeChatModel(FakeChatModel):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.formats = []
+
+        def compile_format(self, text_format):
+            self.formats.append(text_format)
+
+    model = CompilingFakeChatModel(pass_=True, reason='fake')
+    node = AsyncBinaryNode(criterion='fake criterion')
+    expected = node._messages('fake content')
+
+    AsyncBinaryStarGraph(children=[node], model=model).compile()
+
+    assert model.formats == [AsyncBinaryNode.OutputFormat]
+    assert node._messages('fake content') == expected
+    assert node._messages('fake content')[0] is node._messages('other content')[0]
+
+    node.layout = 'content_first'
+    assert node._messages('fake content')[1] == {'role': 'user', 'content': 'fake content'}
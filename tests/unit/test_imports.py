@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+
+def run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+
+
+HEAVY_MODULES = ('openai', 'httpx', 'tiktoken', 'numpy', 'pyarrow', 'http.server')
+# modules ``asgm.graphs`` imports on use
+GRAPHS_DEFERRED_MODULES = ('asgm.nodes', 'asgm.dedup', 'asgm.instrumentation', 'asgm.models.cache', 'asgm.models.tools')
+
+
+def loaded_modules(imports: str, modules: tuple[str, ...] = HEAVY_MODULES) -> list[str]:
+    res = run(f'import sys\n{imports}\nprint(*sorted(name for name in {modules!r} if name in sys.modules))')
+    return res.stdout.split()
+
+
+def test_package_import_does_not_load_heavy_dependencies():
+    assert loaded_modules('import asgm') == []
+
+
+def test_graphs_import_does_not_load_heavy_dependencies():
+    imports = (
+        'import asgm.graphs, asgm.jobs\n'
+        'from asgm import AsyncBinaryStarGraph\n'
+        'from asgm.models import FakeChatModel'
+    )
+
+    assert loaded_modules(imports) == []
+
+
+def test_package_exports_are_imported_on_access():
+    res = run(
+        'import sys, asgm.models\n'
+        'before = "asgm.models.openai" in sys.modules\n'
+        'from asgm.models import OpenAIModel\n'
+        'print(before, OpenAIModel.__module__)'
+    )
+
+    assert res.stdout.split() == ['False', 'asgm.models.openai']
+
+
+def test_graphs_import_defers_nodes_and_optional_features():
+    assert loaded_modules('import asgm.graphs', GRAPHS_DEFERRED_MODULES) == []
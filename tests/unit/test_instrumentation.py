@@ -0,0 +1,51 @@
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.instrumentation import EventLog, PrometheusExporter, SpanExporter
+from asgm.models.fake import FakeChatModel
+from asgm.models.usage import record_usage
+from asgm.nodes import AsyncBinaryNode
+
+
+class UsageFakeChatModel(FakeChatModel):
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        record_usage(input_tokens=10, cached_tokens=2, output_tokens=3)
+        return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+
+async def test_graph_emits_node_call_events_to_instruments():
+    log = EventLog()
+    spans = SpanExporter()
+    prometheus = PrometheusExporter()
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion 1'), AsyncBinaryNode(criterion='fake criterion 2')],
+        model=UsageFakeChatModel(pass_=True, reason='fake'),
+        instruments=[log, spans, prometheus]
+    )
+
+    await graph.eval_many(['fake content'] * 3, max_concurrency=2)
+
+    assert len(log.events) == 6
+    event = log.events[0]
+    assert (event.graph, event.node, event.criterion) == ('AsyncBinaryStarGraph', 'AsyncBinaryNode', 'fake criterion 1')
+    assert (event.input_tokens, event.cached_tokens, event.output_tokens) == (10, 2, 3)
+    assert event.wall_time >= 0 and event.queue_wait >= 0
+
+    assert spans.spans[0]['attributes']['gen_ai.usage.input_tokens'] == 10
+
+    metrics = prometheus.render()
+    labels = 'graph="AsyncBinaryStarGraph",node="AsyncBinaryNode",criterion="fake criterion 1"'
+    assert f'asgm_node_calls_total{{{labels}}} 3' in metrics
+    assert f'asgm_node_tokens_total{{{labels},type="input"}} 30' in metrics
+    assert f'asgm_node_wall_seconds_count{{{labels}}} 3' in metrics
+
+
+async def test_graph_records_parse_failures():
+    log = EventLog()
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion')],
+        model=FakeChatModel(parsing_error=True),
+        instruments=[log]
+    )
+
+    await graph.eval('fake content')
+
+    assert log.events[0].parse_failures == 1
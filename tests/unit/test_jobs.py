@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.jobs import EvaluationJob, JSONLResultStore, SQLiteResultStore
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import PARSE_FAILURE, AsyncBinaryNode
+
+
+class CountingChatModel(FakeChatModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    async def acreate_structured_completion(self, *args, **kwargs):
+        self.calls += 1
+        return await super().acreate_structured_completion(*args, **kwargs)
+
+
+def build_job(store) -> EvaluationJob:
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        model=CountingChatModel(pass_=True, reason='fake')
+    )
+    return EvaluationJob(graph, store)
+
+
+@pytest.mark.parametrize(
+    'store_cls, name',
+    [(JSONLResultStore, 'results.jsonl'), (SQLiteResultStore, 'results.sqlite')]
+)
+def test_evaluation_job_resumes_and_scores_from_store(tmp_path, store_cls, name):
+    job = build_job(store_cls(tmp_path / name))
+    assert asyncio.run(job.run([('doc 0', 'content 0')])) == 2
+    job.store.close()
+
+    # a new process resumes the run with the same store
+    job = build_job(store_cls(tmp_path / name))
+    assert asyncio.run(job.run([('doc 0', 'content 0'), ('doc 1', 'content 1')])) == 2
+    assert job.graph.model.calls == 2
+
+    assert job.scores() == {'doc 0': 1., 'doc 1': 1.}
+    assert job.evaluations()['doc 1'] == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')] * 2
+
+
+def test_jsonl_result_store_drops_truncated_line(tmp_path):
+    job = build_job(JSONLResultStore(tmp_path / 'results.jsonl'))
+    asyncio.run(job.run([('doc 0', 'content 0')]))
+    job.store.close()
+
+    with open(tmp_path / 'results.jsonl', 'a') as file:
+        file.write('{"document_id": "doc 1", "crit')
+
+    job = build_job(JSONLResultStore(tmp_path / 'results.jsonl'))
+    assert len(list(job.store.records())) == 2
+    assert asyncio.run(job.run([('doc 0', 'content 0')])) == 0
+
+
+def test_evaluation_job_does_not_store_parse_failures(tmp_path):
+    job = build_job(SQLiteResultStore(tmp_path / 'results.sqlite'))
+    # e.g. a non-retryable provider error
+    job.graph.model.kwargs['parsing_error'] = True
+    assert asyncio.run(job.run([('doc 0', 'content 0')])) == 0
+    assert job.evaluations() == {}
+
+    # the next run retries them
+    del job.graph.model.kwargs['parsing_error']
+    assert asyncio.run(job.run([('doc 0', 'content 0')])) == 2
+    assert PARSE_FAILURE not in [item.reason for item in job.evaluations()['doc 0']]
+
+
+def test_evaluation_job_counts_rows_written_for_packed_units(tmp_path):
+    store = SQLiteResultStore(tmp_path / 'results.sqlite')
+    single = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion 0')],
+        model=FakeChatModel(pass_=True, reason='fake')
+    )
+    assert asyncio.run(EvaluationJob(single, store).run([('doc 0', 'content 0')])) == 1
+
+    packed = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion=f'fake criterion {i}') for i in range(2)],
+        # resembles OutputFormat of AsyncPackedBinaryNode with two criteria
+        model=FakeChatModel(
+            criterion_1={'pass_': True, 'reason': 'fake'},
+            criterion_2={'pass_': False, 'reason': 'fake'}
+        ),
+        packed=True
+    )
+    # the pack re-evaluates the stored criterion, only the other one is written
+    assert asyncio.run(EvaluationJob(packed, store).run([('doc 0', 'content 0')])) == 1
+
+
+def test_evaluation_job_appends_results_without_blocking_the_event_loop(tmp_path):
+    class SlowStore(JSONLResultStore):
+        threads = set()
+
+        def append(self, records):
+            # e.g. an fsync on a slow disk
+            time.sleep(.05)
+            self.threads.add(threading.current_thread())
+            super().append(records)
+
+    job = build_job(SlowStore(tmp_path / 'results.jsonl'))
+    start = time.perf_counter()
+
+    assert asyncio.run(job.run([(f'doc {i}', f'content {i}') for i in range(8)])) == 16
+    assert threading.main_thread() not in job.store.threads
+    # the 16 appends overlap instead of running one after the other on the event loop
+    assert time.perf_counter() - start < 16 * .05
@@ -0,0 +1,109 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+from openai import AsyncOpenAI
+
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.openai import OpenAIModel, _text_formats, response_format_param, text_format_param
+from asgm.models.usage import track_usage
+from asgm.nodes import AsyncBinaryNode
+
+
+def test_openai_model_shares_pooled_clients_across_instances():
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    other_model = OpenAIModel(model='gpt-4.1-nano', api_key='fake key')
+
+    assert model.pool is other_model.pool
+    assert model.sync_client is other_model.sync_client
+    assert model.pool is not OpenAIModel(model='gpt-4.1-mini', api_key='fake key', http2=False, max_connections=1).pool
+
+
+def test_openai_model_creates_async_client_per_event_loop():
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+
+    async def get_clients():
+        return model.async_client, model.async_client
+
+    first_loop_clients = asyncio.run(get_clients())
+    second_loop_clients = asyncio.run(get_clients())
+
+    assert first_loop_clients[0] is first_loop_clients[1]
+    assert first_loop_clients[0] is not second_loop_clients[0]
+
+
+async def test_openai_model_uses_provided_async_client_for_async_calls_only():
+    client = AsyncOpenAI(api_key='fake key')
+    model = OpenAIModel(client, 'gpt-4.1-mini')
+
+    assert model.async_client is client
+    assert model.sync_client.api_key == 'fake key'
+
+
+async def test_openai_model_pools_clients_with_the_provided_client_configuration():
+    client = AsyncOpenAI(
+        api_key='fake key',
+        organization='fake organization',
+        base_url='http://localhost:8000/v1',
+        default_headers={'X-Fake': 'fake'}
+    )
+    sync_client = OpenAIModel(client, 'gpt-4.1-mini').sync_client
+
+    assert sync_client.organization == 'fake organization'
+    assert str(sync_client.base_url) == 'http://localhost:8000/v1/'
+    assert sync_client.default_headers['X-Fake'] == 'fake'
+    # the SDK headers are those of a sync client
+    assert sync_client.default_headers['X-Stainless-Async'] == 'false'
+
+
+async def test_openai_model_closes_the_pooled_async_client_of_the_running_loop():
+    async with OpenAIModel(model='gpt-4.1-mini', api_key='fake key') as model:
+        client = model.async_client
+
+    assert client.is_closed()
+    assert model.async_client is not client
+    await model.aclose()
+
+
+def test_openai_model_resolves_its_pool_again_after_a_fork(monkeypatch):
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    pool = model.pool
+    assert model.pool is pool
+
+    # a child process drops the pools of its parent
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert model.pool is not pool
+
+
+async def test_openai_model_reuses_compiled_text_format_and_validates_output(monkeypatch):
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        output_text = '{"pass_": true, "reason": "fake"}' if len(requests) == 1 else 'not json'
+        return SimpleNamespace(headers={}, parse=lambda: SimpleNamespace(output_text=output_text, usage=None))
+
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    monkeypatch.setattr(model.pool, 'async_client', lambda: client)
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model).compile()
+
+    assert AsyncBinaryNode.OutputFormat in _text_formats
+
+    with track_usage() as usage:
+        assert await graph.eval('fake content') == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')]
+        assert (await graph.eval('fake content'))[0].reason == 'Unable to parse model response.'
+
+    assert usage.parse_failures == 1
+    assert requests[0]['text']['format'] is requests[1]['text']['format']
+    assert requests[0]['text']['format']['strict'] is True
+
+
+def test_format_params_share_one_strict_schema():
+    text_format = text_format_param(AsyncBinaryNode.OutputFormat)
+    response_format = response_format_param(AsyncBinaryNode.OutputFormat)
+
+    assert text_format['name'] == response_format['json_schema']['name'] == 'OutputFormat'
+    assert text_format['schema'] is response_format['json_schema']['schema']
+    assert text_format['schema']['additionalProperties'] is False
+    assert text_format['schema']['required'] == ['pass_', 'reason']
@@ -0,0 +1,164 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai.types.responses.response_output_item import ResponseFunctionToolCall
+
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.models.openai import OpenAIModel
+from asgm.models.ratelimit import RateLimitedChatModel, RateLimiter, TokenBucket, parse_duration
+from asgm.nodes import AsyncBinaryNode
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    class response:
+        headers = {'retry-after-ms': '1'}
+
+
+class FlakyFakeChatModel(FakeChatModel):
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.calls = 0
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return isinstance(exc, FakeRateLimitError)
+
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise FakeRateLimitError()
+
+        return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+
+def test_parse_duration():
+    assert parse_duration('1.5') == 1.5
+    assert parse_duration('6m0s') == 360
+    assert parse_duration('20ms') == pytest.approx(.02)
+    assert parse_duration('fake') is None
+
+
+def test_token_bucket_returns_delay_once_exhausted():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == pytest.approx(.1, abs=.01)
+
+
+def test_token_bucket_charges_reservations_above_capacity_in_full():
+    limiter = RateLimiter(tpm=60_000)
+
+    delays = [limiter.reserve(tokens=10_000) for _ in range(10)]
+
+    # 100k tokens at 1k tokens per second, the first 1k tokens are the initial burst
+    assert delays[-1] == pytest.approx((10 * 10_000 - 1_000) / 1_000, abs=.1)
+    assert delays == sorted(delays)
+
+
+async def test_rate_limited_model_retries_rate_limit_errors_and_slows_down():
+    fake_model = FlakyFakeChatModel(failures=2, pass_=True, reason='fake')
+    model = RateLimitedChatModel(fake_model, rpm=6000, base_delay=.001)
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model)
+
+    res = await graph.eval('fake content')
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=True, reason='fake')]
+    assert model.retries == 2
+    assert model.limiter.requests.rate < model.limiter.requests.max_rate
+
+
+async def test_rate_limited_model_raises_once_retries_are_exhausted():
+    model = RateLimitedChatModel(FlakyFakeChatModel(failures=10), max_retries=1, base_delay=.001)
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model)
+
+    # a rate limit does not turn into a failed verdict
+    with pytest.raises(FakeRateLimitError):
+        await graph.eval('fake content')
+
+
+async def test_rate_limiter_enforces_requests_per_minute():
+    limiter = RateLimiter(rpm=600)
+
+    start = time.monotonic()
+    for _ in range(4):
+        await limiter.acquire()
+
+    # capacity allows a burst of 10 requests per second, the rest are spaced by 0.1 second
+    assert time.monotonic() - start < .1
+    for _ in range(8):
+        await limiter.acquire()
+    assert time.monotonic() - start >= .1
+
+
+async def test_rate_limited_model_slows_down_on_headers_of_successful_responses(monkeypatch):
+    headers = {
+        'x-ratelimit-remaining-requests': '0',
+        'x-ratelimit-reset-requests': '2s',
+        'x-ratelimit-remaining-tokens': '10',
+        'x-ratelimit-reset-tokens': '1s',
+    }
+
+    async def create(**kwargs):
+        res = SimpleNamespace(output_text='{"pass_": true, "reason": "fake"}', usage=None)
+        return SimpleNamespace(headers=headers, parse=lambda: res)
+
+    openai_model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_model.pool, 'async_client', lambda: client)
+    model = RateLimitedChatModel(openai_model, rpm=6000, tpm=60_000)
+
+    res = await model.acreate_structured_completion(input=[], text_format=AsyncBinaryNode.OutputFormat)
+
+    assert res.pass_ is True
+    # no request is left until the provider resets its limits, and 10 tokens are left before refilling at 1k/s
+    assert model.limiter.requests.reserve(1) == pytest.approx(2, abs=.1)
+    assert model.limiter.tokens.reserve(1_010) == pytest.approx(1, abs=.1)
+
+
+async def test_rate_limited_model_limits_and_retries_tool_loop_turns_separately(monkeypatch):
+    class FlakyResponses:
+        def __init__(self):
+            self.requests = []
+
+        async def create(self, **kwargs):
+            self.requests.append(kwargs)
+            if len(self.requests) == 2:
+                raise FakeRateLimitError()
+
+            name, arguments = ('lookup', '{"query": "a"}') if len(self.requests) == 1 else ('score', '{"value": 4}')
+            call = ResponseFunctionToolCall(type='function_call', call_id='1', name=name, arguments=arguments)
+            return SimpleNamespace(headers={}, parse=lambda: SimpleNamespace(output=[call], usage=None))
+
+    class CountingRateLimiter(RateLimiter):
+        acquisitions = 0
+
+        async def acquire(self, tokens: int = 0) -> None:
+            self.acquisitions += 1
+            await super().acquire(tokens)
+
+    responses = FlakyResponses()
+    openai_model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=responses))
+    monkeypatch.setattr(openai_model.pool, 'async_client', lambda: client)
+    monkeypatch.setattr(openai_model, 'is_retryable', lambda exc: isinstance(exc, FakeRateLimitError))
+    model = RateLimitedChatModel(openai_model, limiter=CountingRateLimiter(rpm=6000), base_delay=.001)
+
+    res = await model.arun_tool_loop(
+        input=[],
+        tools=[
+            {'name': 'lookup', 'schema': {}, 'func': lambda query: query},
+            {'name': 'score', 'schema': {}, 'func': lambda value: value, 'scoring': True},
+        ],
+        max_turns=3
+    )
+
+    assert res == [4]
+    # the first turn, the second turn and its retry, without running the first turn again
+    assert len(responses.requests) == 3
+    assert model.limiter.acquisitions == 3
+    assert model.retries == 1
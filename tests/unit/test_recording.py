@@ -0,0 +1,103 @@
+import json
+import time
+import urllib.request
+
+import pytest
+
+from asgm.graphs import AsyncBinaryStarGraph, AsyncNonBinaryStarGraph
+from asgm.models.openai import OpenAIModel
+from asgm.models.recording import RecordingChatModel, ReplayChatModel, load_recordings
+from asgm.models.replay_server import ReplayServer
+from asgm.models.simulated import SimulatedChatModel, constant
+from asgm.models.types import Tool
+from asgm.models.usage import track_usage
+from asgm.nodes import AsyncBinaryNode, AsyncNonBinaryNode, AsyncNonBinaryToolCallNode
+
+
+def binary_graph(model) -> AsyncBinaryStarGraph:
+    return AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='first'), AsyncBinaryNode(criterion='second')],
+        model=model
+    )
+
+
+async def record(tmp_path) -> tuple[list, list]:
+    recorder = RecordingChatModel(SimulatedChatModel(latency=constant(.02), seed=0), path=tmp_path / 'rec.jsonl')
+    evaluations = await binary_graph(recorder).eval_many(['first content', 'second content'])
+
+    return evaluations, recorder.recordings
+
+
+async def test_replay_serves_recorded_outputs_latency_and_usage(tmp_path):
+    evaluations, recordings = await record(tmp_path)
+
+    assert load_recordings(tmp_path / 'rec.jsonl') == recordings
+    assert all(recording.latency >= .02 and recording.input_tokens for recording in recordings)
+
+    graph = binary_graph(ReplayChatModel(tmp_path / 'rec.jsonl'))
+    start = time.perf_counter()
+    with track_usage() as usage:
+        assert await graph.eval_many(['first content', 'second content']) == evaluations
+
+    assert time.perf_counter() - start >= .02
+    assert usage.requests == 4
+    assert usage.input_tokens == sum(recording.input_tokens for recording in recordings)
+
+
+async def test_replay_serves_new_content_unless_strict(tmp_path):
+    evaluations, recordings = await record(tmp_path)
+
+    res = await binary_graph(ReplayChatModel(recordings, latency_scale=0)).eval('new content')
+    assert all(item in evaluations[0] + evaluations[1] for item in res)
+
+    with pytest.raises(KeyError):
+        await binary_graph(ReplayChatModel(recordings, strict=True, latency_scale=0)).eval('new content')
+
+
+async def test_replay_server_serves_openai_model_requests(tmp_path):
+    evaluations, recordings = await record(tmp_path)
+
+    with ReplayServer(recordings, latency_scale=0) as server:
+        graph = binary_graph(OpenAIModel(model='gpt-4.1-mini', base_url=server.url, api_key='replay'))
+        with track_usage() as usage:
+            res = await graph.eval_many(['first content', 'second content'])
+        with urllib.request.urlopen(server.url.removesuffix('/v1') + '/stats') as stats:
+            stats = json.load(stats)
+
+    assert res == evaluations
+    assert stats == {'requests': 4, 'in_flight': 0, 'max_in_flight': stats['max_in_flight']}
+    assert 1 <= stats['max_in_flight'] <= 4
+    assert usage.output_tokens == sum(recording.output_tokens for recording in recordings)
+
+
+async def test_replay_server_serves_tool_calls_and_samples():
+    tool_recorder = RecordingChatModel(SimulatedChatModel(value=3))
+    tool_graph = AsyncNonBinaryStarGraph(
+        children=[
+            AsyncNonBinaryToolCallNode(
+                criterion='fake criterion',
+                tools=[Tool(name='score', schema={'type': 'function', 'name': 'score'}, func=lambda value: value * 2)]
+            )
+        ],
+        model=tool_recorder
+    )
+    sample_recorder = RecordingChatModel(SimulatedChatModel(seed=0))
+    sampled_graph = AsyncNonBinaryStarGraph(
+        children=[AsyncNonBinaryNode(criterion='fake criterion', verdicts=['0', '10'], samples=3)],
+        model=sample_recorder
+    )
+    tool_expected = await tool_graph.eval('fake content')
+    sampled_expected = await sampled_graph.eval('fake content')
+
+    assert tool_recorder.recordings[0].calls == [('score', {'value': 3})]
+
+    with ReplayServer(tool_recorder.recordings + sample_recorder.recordings, latency_scale=0) as server:
+        tool_graph.model = sampled_graph.model = OpenAIModel(
+            model='gpt-4.1-mini',
+            base_url=server.url,
+            api_key='replay'
+        )
+
+        # the client runs the recorded tool call
+        assert await tool_graph.eval('fake content') == tool_expected
+        assert await sampled_graph.eval('fake content') == sampled_expected
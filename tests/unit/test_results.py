@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from asgm.graphs import AsyncBinaryStarGraph, AsyncNonBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.nodes import AsyncBinaryNode, AsyncNonBinaryNode
+from asgm.results import ResultsTable, concat
+
+
+def binary_table() -> tuple[AsyncBinaryStarGraph, ResultsTable]:
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='first'), AsyncBinaryNode(criterion='second')],
+        model=FakeChatModel()
+    )
+    ok = AsyncBinaryNode.OutputFormat(pass_=True, reason='ok')
+    ko = AsyncBinaryNode.OutputFormat(pass_=False, reason='ko')
+
+    return graph, ResultsTable.from_evaluations(graph, {'a': [ok, ok], 'b': [ok, ko], 'c': [ko, None]})
+
+
+def test_binary_table_aggregations_match_graph_scores():
+    graph, table = binary_table()
+
+    assert len(table) == 5
+    assert table.pass_rates() == {'first': 2 / 3, 'second': .5}
+    assert table.binary_scores() == {'a': True, 'b': False, 'c': False}
+    assert table.scores(norm=True)['b'] == graph.score(evaluation=[
+        AsyncBinaryNode.OutputFormat(pass_=True, reason='ok'),
+        AsyncBinaryNode.OutputFormat(pass_=False, reason='ko')
+    ])
+
+
+def test_numeric_table_scores_are_weighted_and_groupable():
+    graph = AsyncNonBinaryStarGraph(
+        children=[
+            AsyncNonBinaryNode(criterion='first', verdicts=['0', '10'], weight=1),
+            AsyncNonBinaryNode(criterion='second', verdicts=['0', '10'], weight=3),
+        ],
+        model=FakeChatModel()
+    )
+    # node scores are already weighted
+    evaluations = [
+        [AsyncNonBinaryNode.OutputFormat(score=10, reason='r'), AsyncNonBinaryNode.OutputFormat(score=0, reason='r')],
+        [AsyncNonBinaryNode.OutputFormat(score=0, reason='r'), AsyncNonBinaryNode.OutputFormat(score=30, reason='r')],
+    ]
+    table = ResultsTable.from_evaluations(graph, evaluations)
+    table['split'] = ['train', 'train', 'test', 'test']
+
+    assert table.scores() == {'0': 10, '1': 30}
+    assert table.scores(max_score=40) == {'0': graph.score(max_score=40, evaluation=evaluations[0]), '1': .75}
+    assert table.scores(norm=True) == {'0': 2.5, '1': 7.5}
+    assert table.scores(by='split') == {'test': 30, 'train': 10}
+    assert table.pass_rates() == {}
+    assert list(table.groupby('criterion')['second']['score']) == [0, 30]
+
+
+def test_table_rejects_columns_of_other_lengths():
+    _, table = binary_table()
+
+    with pytest.raises(ValueError):
+        table['split'] = ['train']
+
+
+def test_table_round_trips_through_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    _, table = binary_table()
+    numeric = ResultsTable({**table.columns, 'passed': [np.nan] * len(table)})
+
+    merged = concat([table, numeric])
+    merged.to_parquet(tmp_path / 'results.parquet')
+    loaded = ResultsTable.from_parquet(tmp_path / 'results.parquet')
+
+    assert list(loaded.columns) == list(merged.columns)
+    assert list(loaded['reason']) == list(merged['reason'])
+    assert loaded.pass_rates() == table.pass_rates()
+    assert math.isnan(loaded['passed'][-1])
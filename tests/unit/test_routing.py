@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+from openai.types.responses.response_output_item import ResponseFunctionToolCall
+
+from asgm.graphs import AsyncBinaryStarGraph, AsyncNonBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.models.openai import OpenAIModel
+from asgm.models.routing import CascadeChatModel
+from asgm.nodes import AsyncBinaryNode, AsyncNonBinaryNode, AsyncNonBinaryToolCallNode
+
+
+async def test_cascade_model_keeps_confident_cheap_responses():
+    model = CascadeChatModel(
+        cheap=FakeChatModel(pass_=True, reason='cheap', confidence=.9),
+        strong=FakeChatModel(pass_=False, reason='strong')
+    )
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model)
+
+    assert await graph.eval('fake content') == [AsyncBinaryNode.OutputFormat(pass_=True, reason='cheap')]
+    assert model.escalation_rate() == 0
+
+
+async def test_cascade_model_escalates_per_route():
+    model = CascadeChatModel(
+        cheap=FakeChatModel(pass_=True, score=1, reason='cheap', confidence=.8),
+        strong=FakeChatModel(pass_=False, score=5, reason='strong'),
+        routes={AsyncBinaryNode: .5, AsyncNonBinaryNode: .95}
+    )
+    binary = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model)
+    non_binary = AsyncNonBinaryStarGraph(
+        children=[AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict'])],
+        model=model
+    )
+
+    assert (await binary.eval('fake content'))[0].reason == 'cheap'
+    assert (await non_binary.eval('fake content'))[0].reason == 'strong'
+    assert model.escalation_rate(AsyncNonBinaryNode.OutputFormat) == 1
+    assert model.escalation_rate() == .5
+
+
+async def test_cascade_model_escalates_parse_failures():
+    model = CascadeChatModel(
+        cheap=FakeChatModel(parsing_error=True),
+        strong=FakeChatModel(pass_=True, reason='strong')
+    )
+    graph = AsyncBinaryStarGraph(children=[AsyncBinaryNode(criterion='fake criterion')], model=model)
+
+    assert (await graph.eval('fake content'))[0].reason == 'strong'
+    assert model.escalation_rate('AsyncBinaryNode.OutputFormat') == 1
+
+
+async def test_cascade_model_routes_samples_per_sample():
+    class SampledFakeChatModel(FakeChatModel):
+        async def acreate_structured_samples(self, input, text_format, n, **kwargs):
+            return [text_format(pass_=True, reason='cheap', confidence=confidence) for confidence in (.9, .1, .9)][:n]
+
+    model = CascadeChatModel(
+        cheap=SampledFakeChatModel(),
+        strong=FakeChatModel(pass_=False, reason='strong'),
+        threshold=.5
+    )
+
+    res = await model.acreate_structured_samples(input=[], text_format=AsyncBinaryNode.OutputFormat, n=3)
+
+    assert [item.reason for item in res] == ['cheap', 'strong', 'cheap']
+    assert model.escalation_rate() == 1 / 3
+
+
+async def test_cascade_model_runs_tool_loops_on_strong_model(monkeypatch):
+    class ScriptedResponses:
+        def __init__(self, outputs):
+            self.outputs = outputs
+            self.requests = []
+
+        async def create(self, **kwargs):
+            self.requests.append(kwargs)
+            res = SimpleNamespace(output=self.outputs[len(self.requests) - 1], usage=None)
+            return SimpleNamespace(headers={}, parse=lambda: res)
+
+    responses = ScriptedResponses([
+        [ResponseFunctionToolCall(type='function_call', call_id='1', name='lookup', arguments='{"query": "a"}')],
+        [ResponseFunctionToolCall(type='function_call', call_id='2', name='score', arguments='{"value": 4}')],
+    ])
+    strong = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=responses))
+    monkeypatch.setattr(strong.pool, 'async_client', lambda: client)
+    node = AsyncNonBinaryToolCallNode(
+        criterion='fake criterion',
+        tools=[
+            {'name': name, 'schema': {'type': 'function', 'name': name}, 'func': func, 'scoring': name == 'score'}
+            for name, func in (('lookup', lambda query: query), ('score', lambda value: value))
+        ],
+        max_turns=3
+    )
+    graph = AsyncNonBinaryStarGraph(children=[node], model=CascadeChatModel(cheap=FakeChatModel(), strong=strong))
+
+    assert graph.score(evaluation=await graph.eval('fake content')) == 4
+    assert len(responses.requests) == 2
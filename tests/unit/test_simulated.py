@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from asgm.graphs import AsyncBinaryStarGraph
+from asgm.models.ratelimit import RateLimitedChatModel
+from asgm.models.simulated import SimulatedChatModel, SimulatedRateLimitError, constant
+from asgm.nodes import AsyncBinaryNode, AsyncPackedBinaryNode
+
+
+async def test_simulated_model_synthesizes_structured_outputs():
+    model = SimulatedChatModel(pass_rate=1, seed=0)
+    node = AsyncPackedBinaryNode([AsyncBinaryNode(criterion='fake criterion') for _ in range(2)])
+
+    res = await node.eval('fake content', model=model)
+
+    assert res == [AsyncBinaryNode.OutputFormat(pass_=True, reason='simulated')] * 2
+
+
+async def test_simulated_model_enforces_concurrency_limit():
+    model = SimulatedChatModel(latency=constant(.01), max_concurrency=2)
+    input = [{'role': 'user', 'content': 'fake content'}]
+
+    res = await asyncio.gather(*[model.acreate_completion(input=input) for _ in range(3)], return_exceptions=True)
+
+    assert isinstance(res[2], SimulatedRateLimitError)
+    assert model.in_flight == 0
+
+
+async def test_simulated_rate_limits_are_retried_by_rate_limited_model():
+    simulated = SimulatedChatModel(latency=constant(.001), max_concurrency=2, pass_rate=1)
+    graph = AsyncBinaryStarGraph(
+        children=[AsyncBinaryNode(criterion='fake criterion') for _ in range(4)],
+        model=RateLimitedChatModel(simulated, base_delay=.001, max_retries=20)
+    )
+
+    res = await graph.eval('fake content')
+
+    assert graph.binary_score(res) is True
+    assert simulated.errors > 0
+
+
+def test_simulated_model_is_reproducible_with_seed():
+    def run(seed: int) -> list[bool]:
+        model = SimulatedChatModel(seed=seed)
+        return [
+            model.create_structured_completion([], text_format=AsyncBinaryNode.OutputFormat).pass_
+            for _ in range(10)
+        ]
+
+    assert run(1) == run(1)
+
+
+async def test_simulated_model_injects_errors():
+    model = SimulatedChatModel(error_rate=1)
+
+    with pytest.raises(Exception, match='Simulated server error'):
+        await model.acreate_completion(input=[])
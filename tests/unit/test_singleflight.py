@@ -0,0 +1,72 @@
+import asyncio
+
+from asgm.graphs import AsyncNonBinaryStarGraph
+from asgm.models.fake import FakeChatModel
+from asgm.models.singleflight import SingleFlightChatModel
+from asgm.nodes import AsyncNonBinaryNode
+
+
+class SlowFakeChatModel(FakeChatModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    async def acreate_structured_completion(self, input, text_format, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return await super().acreate_structured_completion(input, text_format, **kwargs)
+
+
+async def test_single_flight_model_merges_identical_requests_and_copies_results():
+    fake_model = SlowFakeChatModel(score=1, reason='fake')
+    model = SingleFlightChatModel(fake_model)
+    graphs = [
+        AsyncNonBinaryStarGraph(
+            children=[AsyncNonBinaryNode(criterion='fake criterion', verdicts=['fake verdict'], weight=weight)],
+            model=model
+        )
+        for weight in (2, 3)
+    ]
+
+    res = await asyncio.gather(*[graph.eval('fake content') for graph in graphs])
+
+    # each graph applied its own weight to its own copy of the shared result
+    assert res == [
+        [AsyncNonBinaryNode.OutputFormat(score=2, reason='fake')],
+        [AsyncNonBinaryNode.OutputFormat(score=3, reason='fake')]
+    ]
+    assert fake_model.calls == 1
+    assert model.merged == 1
+
+
+async def test_single_flight_model_propagates_exceptions_to_all_callers():
+    class FailingFakeChatModel(FakeChatModel):
+        async def acreate_completion(self, input, **kwargs):
+            await asyncio.sleep(0.01)
+            raise RuntimeError('fake')
+
+    model = SingleFlightChatModel(FailingFakeChatModel())
+    input = [{'role': 'user', 'content': 'fake content'}]
+
+    res = await asyncio.gather(
+        model.acreate_completion(input=input),
+        model.acreate_completion(input=input),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(item, RuntimeError) for item in res)
+
+
+async def test_single_flight_model_keeps_the_call_running_for_other_callers():
+    fake_model = SlowFakeChatModel(score=1, reason='fake')
+    model = SingleFlightChatModel(fake_model)
+    kwargs = {'input': [{'role': 'user', 'content': 'fake content'}], 'text_format': AsyncNonBinaryNode.OutputFormat}
+
+    leader = asyncio.create_task(model.acreate_structured_completion(**kwargs))
+    follower = asyncio.create_task(model.acreate_structured_completion(**kwargs))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == AsyncNonBinaryNode.OutputFormat(score=1, reason='fake')
+    assert leader.cancelled()
+    assert fake_model.calls == 1
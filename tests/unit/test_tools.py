@@ -0,0 +1,118 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai.types.responses.response_output_item import ResponseFunctionToolCall
+
+from asgm.graphs import AsyncNonBinaryStarGraph
+from asgm.models.openai import OpenAIModel, _tool_calls
+from asgm.models.tools import ToolKit
+from asgm.nodes import AsyncNonBinaryToolCallNode
+
+
+async def slow_lookup(query: str) -> str:
+    await asyncio.sleep(.1)
+    return query
+
+
+def blocking_lookup(query: str) -> str:
+    time.sleep(.1)
+    return query
+
+
+def tool(name, func, **kwargs):
+    return {'name': name, 'schema': {'type': 'function', 'name': name}, 'func': func, **kwargs}
+
+
+async def test_toolkit_runs_coroutine_and_blocking_tools_concurrently():
+    toolkit = ToolKit([tool('slow', slow_lookup), tool('blocking', blocking_lookup)])
+
+    start = time.perf_counter()
+    res = await toolkit.acall_many([('slow', {'query': 'a'}), ('blocking', {'query': 'b'}), ('slow', {'query': 'c'})])
+
+    assert res == ['a', 'b', 'c']
+    assert time.perf_counter() - start < .25
+
+
+async def test_toolkit_applies_tool_timeout_over_toolkit_timeout():
+    toolkit = ToolKit([tool('slow', slow_lookup, timeout=.01), tool('blocking', blocking_lookup)], timeout=1)
+
+    with pytest.raises(TimeoutError):
+        await toolkit.acall('slow', {'query': 'a'})
+
+    assert await toolkit.acall('blocking', {'query': 'b'}) == 'b'
+
+
+def test_tool_calls_skip_unknown_tools():
+    toolkit = ToolKit.of([tool('slow', slow_lookup)])
+    res = SimpleNamespace(output=[
+        ResponseFunctionToolCall(type='function_call', call_id='1', name='slow', arguments='{"query": "a"}'),
+        ResponseFunctionToolCall(type='function_call', call_id='2', name='unknown', arguments='{}'),
+    ])
+
+    assert ToolKit.of(toolkit) is toolkit
+    assert _tool_calls(res, toolkit) == [('slow', {'query': 'a'})]
+
+
+def function_call(call_id, name, arguments):
+    return ResponseFunctionToolCall(type='function_call', call_id=call_id, name=name, arguments=arguments)
+
+
+class ScriptedResponses:
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        res = SimpleNamespace(output=self.outputs[len(self.requests) - 1], usage=None)
+        return SimpleNamespace(headers={}, parse=lambda: res)
+
+
+async def test_tool_call_node_loops_until_scoring_calls_and_aggregates(monkeypatch):
+    lookups = []
+
+    def lookup(query: str) -> str:
+        lookups.append(query)
+        return f'evidence for {query}'
+
+    responses = ScriptedResponses([
+        [function_call('1', 'lookup', '{"query": "a"}'), function_call('2', 'lookup', '{"query": "a"}')],
+        [function_call('3', 'score', '{"value": 4}'), function_call('4', 'score', '{"value": 8}')],
+    ])
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=responses))
+    monkeypatch.setattr(model.pool, 'async_client', lambda: client)
+
+    node = AsyncNonBinaryToolCallNode(
+        criterion='fake criterion',
+        tools=[tool('lookup', lookup), tool('score', lambda value: value, scoring=True)],
+        max_turns=3,
+        aggregate='mean'
+    )
+    graph = AsyncNonBinaryStarGraph(children=[node], model=model)
+
+    assert graph.score(evaluation=await graph.eval('fake content')) == 6
+    # identical calls within a graph run share one execution
+    assert lookups == ['a']
+    assert responses.requests[1]['input'][-1] == {
+        'type': 'function_call_output', 'call_id': '2', 'output': '"evidence for a"'
+    }
+
+
+async def test_tool_loop_last_turn_offers_scoring_tools_only(monkeypatch):
+    responses = ScriptedResponses([[function_call('1', 'lookup', '{"query": "a"}')], []])
+    model = OpenAIModel(model='gpt-4.1-mini', api_key='fake key')
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=responses))
+    monkeypatch.setattr(model.pool, 'async_client', lambda: client)
+
+    res = await model.arun_tool_loop(
+        input=[],
+        tools=[tool('lookup', lambda query: query), tool('score', lambda value: value, scoring=True)],
+        max_turns=2
+    )
+
+    assert res == []
+    assert [schema['name'] for schema in responses.requests[1]['tools']] == ['score']
+    assert responses.requests[1]['tool_choice'] == 'required'